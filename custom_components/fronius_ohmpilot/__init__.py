@@ -2,22 +2,68 @@
 
 from __future__ import annotations
 
+import asyncio
 from datetime import timedelta
 import logging
+from pathlib import Path
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import CONF_HOST, Platform
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers import config_validation as cv, device_registry as dr, entity_registry as er
+from homeassistant.helpers.event import async_call_later, async_track_time_interval
+from homeassistant.helpers.typing import ConfigType
 
 from .api import FroniusOhmpilotApiClient
-from .const import CONFIG_KEY_HTTP_PORT, CONFIG_KEY_MODBUS_PORT, DEFAULT_HTTP_PORT, DEFAULT_MODBUS_PORT, DOMAIN
+from .const import (
+    CONFIG_KEY_GRID_POWER_ENTITY,
+    CONFIG_KEY_HEATER1_MAX_POWER,
+    CONFIG_KEY_HTTP_PORT,
+    CONFIG_KEY_IDENTITY,
+    CONFIG_KEY_MAX_IN_FLIGHT,
+    CONFIG_KEY_MAX_TEMPERATURE,
+    CONFIG_KEY_MIN_HEATER_POWER,
+    CONFIG_KEY_MODBUS_PORT,
+    CONFIG_KEY_POWER_KEEPALIVE,
+    CONFIG_KEY_RESERVED_POWER,
+    CONFIG_KEY_TELEMETRY,
+    CONFIG_KEY_TEMPERATURE_CALIBRATION_GAIN,
+    CONFIG_KEY_TEMPERATURE_CALIBRATION_OFFSET,
+    CONFIG_KEY_UNIT_ID,
+    DEFAULT_HEATER1_MAX_POWER,
+    DEFAULT_HTTP_PORT,
+    DEFAULT_MAX_IN_FLIGHT,
+    DEFAULT_MAX_TEMPERATURE,
+    DEFAULT_MIN_HEATER_POWER,
+    DEFAULT_MODBUS_PORT,
+    DEFAULT_POWER_KEEPALIVE,
+    DEFAULT_RESERVED_POWER,
+    DEFAULT_TEMPERATURE_CALIBRATION_GAIN,
+    DEFAULT_TEMPERATURE_CALIBRATION_OFFSET,
+    DEFAULT_UNIT_ID,
+    DOMAIN,
+    SETUP_IDENTITY_TIMEOUT,
+    UPDATE_INTERVAL_FAST,
+)
+from .controller import SurplusController
 from .coordinator import FroniusOhmpilotDataUpdateCoordinator
+from .gateway import async_get_gateway_pool
+from .services import async_setup_services
+from .telemetry import TelemetryLogger
+from .timesync import TimeSyncManager
 
 _LOGGER = logging.getLogger(__name__)
 
 _PLATFORMS: list[Platform] = [Platform.SENSOR, Platform.NUMBER, Platform.SWITCH]
 
+CONFIG_SCHEMA = cv.config_entry_only_config_schema(DOMAIN)
+
+
+async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
+    """Set up the Fronius Ohmpilot services."""
+    async_setup_services(hass)
+    return True
+
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Fronius Ohmpilot from a config entry."""
@@ -26,42 +72,96 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     host = entry.data[CONF_HOST]
     modbus_port = entry.data.get(CONFIG_KEY_MODBUS_PORT, DEFAULT_MODBUS_PORT)
     http_port = entry.data.get(CONFIG_KEY_HTTP_PORT, DEFAULT_HTTP_PORT)
-
-    api_client = FroniusOhmpilotApiClient(hass, host, modbus_port, http_port)
-    coordinator = FroniusOhmpilotDataUpdateCoordinator(hass, api_client, entry.entry_id)
-
-    await coordinator.async_config_entry_first_refresh()
-
-    try:
-        device_info = await api_client.async_get_device_info()
-        coordinator.serial_number = device_info.get("serial_number", "")
-        coordinator.manufacturer = device_info.get("manufacturer", "Fronius") or "Fronius"
-        coordinator.model = device_info.get("model", "Ohmpilot") or "Ohmpilot"
-    except Exception as err:  # noqa: BLE001
-        _LOGGER.warning("Could not read device info from Ohmpilot; serial number unavailable: %s", err)
+    unit_id = entry.data.get(CONFIG_KEY_UNIT_ID, DEFAULT_UNIT_ID)
+    max_in_flight = entry.data.get(CONFIG_KEY_MAX_IN_FLIGHT, DEFAULT_MAX_IN_FLIGHT)
+    power_keepalive = entry.data.get(CONFIG_KEY_POWER_KEEPALIVE, DEFAULT_POWER_KEEPALIVE)
+
+    pool = async_get_gateway_pool(hass)
+    gateway = pool.acquire(host, modbus_port, max_in_flight)
+    api_client = FroniusOhmpilotApiClient(hass, host, modbus_port, http_port, unit_id=unit_id, gateway=gateway)
+    coordinator = FroniusOhmpilotDataUpdateCoordinator(hass, api_client, entry.entry_id, power_keepalive)
+
+    # Entities start from the cached identity and their restored state, and the first
+    # poll and identity check run in the background. Only an entry without a cached
+    # identity waits, briefly, for the device so its unique IDs start out serial based.
+    if (identity := entry.data.get(CONFIG_KEY_IDENTITY)) is None:
+        try:
+            async with asyncio.timeout(SETUP_IDENTITY_TIMEOUT):
+                identity = await api_client.async_get_device_info()
+        except Exception as err:  # noqa: BLE001
+            _LOGGER.warning("Could not read device info from Ohmpilot; serial number unavailable: %s", err)
+        else:
+            # Entities registered by an earlier setup that could not read it move along
+            _async_adopt_identity(hass, entry, identity)
+    if identity is not None:
+        coordinator.apply_identity(identity)
+    entry.async_create_background_task(hass, _async_first_contact(hass, entry, coordinator), f"{DOMAIN} first contact")
+
+    controller = None
+    if grid_power_entity := entry.data.get(CONFIG_KEY_GRID_POWER_ENTITY):
+        controller = SurplusController(
+            hass,
+            coordinator,
+            grid_power_entity,
+            entry.data.get(CONFIG_KEY_HEATER1_MAX_POWER, DEFAULT_HEATER1_MAX_POWER),
+            reserved_power=entry.data.get(CONFIG_KEY_RESERVED_POWER, DEFAULT_RESERVED_POWER),
+            min_heater_power=entry.data.get(CONFIG_KEY_MIN_HEATER_POWER, DEFAULT_MIN_HEATER_POWER),
+            max_temperature=entry.data.get(CONFIG_KEY_MAX_TEMPERATURE, DEFAULT_MAX_TEMPERATURE),
+            calibration_gain=entry.data.get(
+                CONFIG_KEY_TEMPERATURE_CALIBRATION_GAIN, DEFAULT_TEMPERATURE_CALIBRATION_GAIN
+            ),
+            calibration_offset=entry.data.get(
+                CONFIG_KEY_TEMPERATURE_CALIBRATION_OFFSET, DEFAULT_TEMPERATURE_CALIBRATION_OFFSET
+            ),
+        )
+
+    time_sync = TimeSyncManager(hass, api_client)
 
     hass.data[DOMAIN][entry.entry_id] = {
         "api": api_client,
         "coordinator": coordinator,
+        "controller": controller,
+        "telemetry": None,
+        "time_sync": time_sync,
     }
 
     await hass.config_entries.async_forward_entry_setups(entry, _PLATFORMS)
 
-    async def update_time(_):
-        await api_client.async_set_time()
+    if controller is not None:
+        entry.async_on_unload(controller.async_start())
+
+    if entry.data.get(CONFIG_KEY_TELEMETRY, False):
+        telemetry = TelemetryLogger(
+            hass, coordinator, Path(hass.config.path(DOMAIN, coordinator.serial_number or entry.entry_id))
+        )
+        hass.data[DOMAIN][entry.entry_id]["telemetry"] = telemetry
+        # Unload callbacks run last in, first out: recording stops before the final flush
+        entry.async_on_unload(telemetry.async_flush)
+        entry.async_on_unload(telemetry.async_start())
 
-    unsub = async_track_time_interval(hass, update_time, timedelta(minutes=30))
-    entry.async_on_unload(unsub)
+    # Shift this device's poll phase so devices sharing the host do not poll in the same second
+    async def shift_poll_phase(_):
+        await coordinator.async_refresh()
+
+    if phase := pool.next_poll_phase(UPDATE_INTERVAL_FAST):
+        entry.async_on_unload(async_call_later(hass, phase, shift_poll_phase))
+
+    entry.async_on_unload(time_sync.async_start())
 
     async def update_power(_):
         if not coordinator.active:
             return
+        if controller is not None:
+            # The controller writes every change itself; this keeps its limit alive,
+            # including a limit of 0 that holds the heater off
+            await coordinator.power_writer.async_write(controller.setpoint)
+            return
         power_entity = hass.data[DOMAIN][entry.entry_id].get("power_number")
         if power_entity is None or power_entity.native_value is None:
             return
         power_limit = int(power_entity.native_value)
         if power_limit > 1:
-            await api_client.async_set_power_limit(power_limit)
+            await coordinator.power_writer.async_write(power_limit)
 
     unsub2 = async_track_time_interval(hass, update_power, timedelta(seconds=1))
     entry.async_on_unload(unsub2)
@@ -69,6 +169,87 @@ async def update_power(_):
     return True
 
 
+async def _async_first_contact(
+    hass: HomeAssistant, entry: ConfigEntry, coordinator: FroniusOhmpilotDataUpdateCoordinator
+) -> None:
+    """Poll the device for the first time, then check the cached identity."""
+    await coordinator.async_refresh()
+    await _async_revalidate_identity(hass, entry, coordinator.api)
+
+
+async def _async_revalidate_identity(
+    hass: HomeAssistant, entry: ConfigEntry, api_client: FroniusOhmpilotApiClient
+) -> None:
+    """Re-read the device identity and refresh the cached copy if it changed.
+
+    An entry set up without an identity has its entities moved to the serial
+    number as soon as it is read, and is reloaded to use it.
+    """
+    try:
+        identity = await api_client.async_get_device_info()
+    except Exception as err:  # noqa: BLE001
+        _LOGGER.debug("Could not revalidate Ohmpilot device info, keeping cached identity: %s", err)
+        return
+    cached = entry.data.get(CONFIG_KEY_IDENTITY)
+    if identity == cached:
+        return
+    if cached is None and identity.get("serial_number"):
+        _async_adopt_identity(hass, entry, identity)
+        hass.config_entries.async_schedule_reload(entry.entry_id)
+        return
+    _LOGGER.info("Ohmpilot device info changed to %s; it takes effect on the next reload", identity)
+    _async_store_identity(hass, entry, identity)
+
+
+@callback
+def _async_adopt_identity(hass: HomeAssistant, entry: ConfigEntry, identity: dict[str, str]) -> None:
+    """Cache the first identity read for an entry and move its entities to the serial number."""
+    if serial_number := identity.get("serial_number"):
+        _async_migrate_unique_ids(hass, entry, serial_number)
+    _async_store_identity(hass, entry, identity)
+
+
+@callback
+def _async_migrate_unique_ids(hass: HomeAssistant, entry: ConfigEntry, serial_number: str) -> None:
+    """Move the entry's entities and device from entry ID based identifiers to the serial number.
+
+    Entities keep their entity IDs and history. An identifier the serial number
+    already uses, such as one left from an earlier entry for the same device, is
+    not taken over.
+    """
+    entity_registry = er.async_get(hass)
+    prefix = f"{entry.entry_id}_"
+    moved = False
+    for entity in er.async_entries_for_config_entry(entity_registry, entry.entry_id):
+        if not entity.unique_id.startswith(prefix):
+            continue
+        if not moved:
+            _LOGGER.info("Moving the Ohmpilot entities from the config entry ID to the serial number")
+            moved = True
+        unique_id = f"{serial_number}_{entity.unique_id.removeprefix(prefix)}"
+        if entity_registry.async_get_entity_id(entity.domain, DOMAIN, unique_id) is not None:
+            _LOGGER.warning("Not moving %s, unique ID %s is already in use", entity.entity_id, unique_id)
+            continue
+        entity_registry.async_update_entity(entity.entity_id, new_unique_id=unique_id)
+
+    device_registry = dr.async_get(hass)
+    device = device_registry.async_get_device(identifiers={(DOMAIN, entry.entry_id)})
+    if device is not None and device_registry.async_get_device(identifiers={(DOMAIN, serial_number)}) is None:
+        device_registry.async_update_device(device.id, new_identifiers={(DOMAIN, serial_number)})
+
+
+@callback
+def _async_store_identity(hass: HomeAssistant, entry: ConfigEntry, identity: dict[str, str]) -> None:
+    """Cache the device identity in the config entry, unless the serial number could not be read."""
+    if identity.get("serial_number"):
+        hass.config_entries.async_update_entry(entry, data={**entry.data, CONFIG_KEY_IDENTITY: identity})
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
-    return await hass.config_entries.async_unload_platforms(entry, _PLATFORMS)
+    unload_ok = await hass.config_entries.async_unload_platforms(entry, _PLATFORMS)
+    if unload_ok:
+        entry_data = hass.data[DOMAIN].pop(entry.entry_id)
+        await entry_data["api"].async_close()
+        async_get_gateway_pool(hass).release(entry_data["api"].gateway)
+    return unload_ok
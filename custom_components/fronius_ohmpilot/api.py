@@ -1,187 +1,406 @@
 """Fronius Ohmpilot API Client."""
 
-from datetime import datetime
+import asyncio
 import logging
-import threading
 import time
 from typing import Any
 
-from pymodbus.client import ModbusTcpClient
-from pymodbus.exceptions import ConnectionException
+from yarl import URL
 
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.helpers.debounce import Debouncer
+
+from .connection import ModbusTransportError
+from .const import (
+    BURST_REQUEST_TIMEOUT,
+    DEFAULT_OPERATION_TIMEOUTS,
+    DEFAULT_UNIT_ID,
+    HTTP_FALLBACK_CONFIG,
+    HTTP_WRITE_COOLDOWN,
+    POLL_REQUEST_TIMEOUT,
+)
+from .gateway import ModbusGateway
+from .metrics import MODBUS_SHORT_FRAME_SIZE, ApiMetrics, modbus_read_size, modbus_write_size
+from .registers import BURST_BLOCK, IDENTITY_BLOCKS, POLL_BLOCKS, SET_POWER_BLOCK, TIME_BLOCK
+from .scheduler import IoPriority, RequestExpired
 
 _LOGGER = logging.getLogger(__package__)
 
+# Modbus exception code returned for function codes the device does not implement
+_ILLEGAL_FUNCTION = 0x01
+
 
 class FroniusOhmpilotApiClient:
     """API client for communicating with the Fronius Ohmpilot."""
 
-    def __init__(self, hass: HomeAssistant, host: str, modbus_port: int, http_port: int) -> None:
-        """Initialize the API client."""
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        host: str,
+        modbus_port: int,
+        http_port: int,
+        *,
+        unit_id: int = DEFAULT_UNIT_ID,
+        gateway: ModbusGateway | None = None,
+        timeouts: dict[str, float] | None = None,
+    ) -> None:
+        """Initialize the API client.
+
+        Clients for devices behind the same Modbus TCP gateway share one gateway, and
+        with it one connection and one in-flight request budget. Requests get that
+        budget by priority: power limit writes first, then time synchronisation,
+        polls and diagnostic reads.
+
+        timeouts overrides the seconds each operation may take, by operation name,
+        from DEFAULT_OPERATION_TIMEOUTS. An operation running out of time counts as a
+        transport failure for the connection's circuit breaker, which stops
+        contacting an unreachable device until a probe succeeds.
+        """
         self.hass = hass
         self.host = host
         self.modbus_port = modbus_port
         self.http_port = http_port
-        self.client = ModbusTcpClient(host, port=modbus_port)
+        self.unit_id = unit_id
+        self._owns_gateway = gateway is None
+        self.gateway = gateway or ModbusGateway(host, modbus_port)
+        self.client = self.gateway.client
+        self.connection = self.gateway.connection
         self.session = async_get_clientsession(hass)
-        self._modbus_lock = threading.Lock()
+        self._scheduler = self.gateway.scheduler
+        self._supports_read_write = True
+        self.timeouts = {**DEFAULT_OPERATION_TIMEOUTS, **(timeouts or {})}
+        self.metrics = ApiMetrics()
+        self.http_config: dict[str, str] | None = None
+        self.http_writes_sent = 0
+        self.http_writes_coalesced = 0
+        self.http_writes_skipped = 0
+        self._pending_http_config: dict[str, str] = {}
+        self._http_config_debouncer = Debouncer(
+            hass,
+            _LOGGER,
+            cooldown=HTTP_WRITE_COOLDOWN,
+            immediate=True,
+            function=self._async_write_http_config,
+        )
+
+    async def _async_request(self, action, *args, **kwargs):
+        """Send one request to the device; any answer, even a Modbus exception, closes the circuit."""
+        result = await action(*args, device_id=self.unit_id, **kwargs)
+        self.connection.record_success()
+        return result
+
+    def _log_transport_error(self, err: Exception) -> None:
+        """Log a failed request, quietly while the circuit breaker has already reported the outage."""
+        log = _LOGGER.error if self.connection.circuit_state == "closed" else _LOGGER.debug
+        log("Failed to connect to Ohmpilot at %s:%s - %s", self.host, self.modbus_port, err)
 
-    def _execute_modbus_sync(self, action, *args):
-        """Execute a synchronous pymodbus action in an executor."""
-        _LOGGER.debug("_execute_modbus_sync")
-        with self._modbus_lock:
+    async def _async_execute(self, operation: str, priority: IoPriority, traffic: tuple[int, int], action, *args):
+        """Execute a Modbus client coroutine on the shared connection.
+
+        traffic gives the request and response frame sizes recorded for the operation.
+        """
+        _LOGGER.debug("_async_execute")
+        async with self.metrics.async_track(operation, self._scheduler.request(priority)) as metrics:
             try:
-                self.client.connect()
-                result = action(*args)
-                if result.isError():
-                    _LOGGER.error("Modbus error: %s", result)
-                    return None
-            except ConnectionException as e:
-                _LOGGER.error(
-                    "Failed to connect to Ohmpilot at %s:%s - %s",
-                    self.host,
-                    self.modbus_port,
-                    e,
-                )
+                async with asyncio.timeout(self.timeouts[operation]):
+                    await self.connection.async_ensure_connected()
+                    metrics.record_traffic(*traffic)
+                    result = await self._async_request(action, *args)
+                    if result.isError():
+                        metrics.record_error()
+                        _LOGGER.error("Modbus error: %s", result)
+                        return None
+            except (ModbusTransportError, TimeoutError) as e:
+                metrics.record_error(e)
+                self.connection.mark_failed(e)
+                self._log_transport_error(e)
                 return None
             except Exception as e:  # noqa: BLE001
-                _LOGGER.error("_execute_modbus_sync exception %s", e)
+                metrics.record_error(e)
+                _LOGGER.error("_async_execute exception %s", e)
                 return None
             else:
                 return result
-            finally:
-                self.client.close()
+
+    async def async_close(self) -> None:
+        """Close the persistent Modbus connection unless it is shared with other devices."""
+        self._http_config_debouncer.async_shutdown()
+        if not self._owns_gateway:
+            return
+        async with self._scheduler.request(IoPriority.CONTROL):
+            self.gateway.close()
 
     async def test_connection(self) -> bool:
         """Test the connection to the Ohmpilot."""
         # Use a simple read to test connection
-        result = await self.hass.async_add_executor_job(
-            self._execute_modbus_sync, self.client.read_holding_registers, 40799
+        result = await self._async_execute(
+            "test",
+            IoPriority.POLL,
+            (MODBUS_SHORT_FRAME_SIZE, modbus_read_size(1)),
+            self.client.read_holding_registers,
+            40799,
         )
         # _LOGGER.warning("Test_connection: %s", result)
         return result is not None
 
     async def async_get_data(self) -> dict[str, Any]:
-        """Fetch data from the Ohmpilot via Modbus."""
+        """Fetch data from the Ohmpilot via Modbus.
+
+        Raises RequestExpired if more urgent requests kept the connection busy
+        for a whole poll interval.
+        """
         data = {}
+        request = self._scheduler.request(IoPriority.POLL, POLL_REQUEST_TIMEOUT)
 
-        def _sync_get_data():
-            """Synchronous data fetching logic."""
-            with self._modbus_lock:
-                try:
-                    self.client.connect()
-
-                    # Status
-                    status_reg = self.client.read_holding_registers(40799, count=1)
-                    data["status"] = status_reg.registers[0] if not status_reg.isError() else None
-
-                    # Temperature
-                    temp_reg = self.client.read_holding_registers(40808, count=1)
-                    data["temperature"] = temp_reg.registers[0] / 10 if not temp_reg.isError() else None
-
-                    # Power (32-bit)
-                    power_regs = self.client.read_holding_registers(40800, count=2)
-                    if not power_regs.isError():
-                        data["power"] = (power_regs.registers[0] << 16) | power_regs.registers[1]
-                    else:
-                        data["power"] = None
-
-                    # Energy (64-bit)
-                    energy_regs = self.client.read_holding_registers(40804, count=4)
-                    if not energy_regs.isError():
-                        data["energy"] = (
-                            (energy_regs.registers[0] << 48)
-                            | (energy_regs.registers[1] << 32)
-                            | (energy_regs.registers[2] << 16)
-                            | energy_regs.registers[3]
+        async with self.metrics.async_track("poll", request) as metrics:
+            try:
+                async with asyncio.timeout(self.timeouts["poll"]):
+                    await self.connection.async_ensure_connected()
+
+                    # Status, power, energy and temperature share one register window
+                    for block in POLL_BLOCKS:
+                        await request.async_yield()
+                        metrics.record_traffic(MODBUS_SHORT_FRAME_SIZE, modbus_read_size(block.count))
+                        regs = await self._async_request(
+                            self.client.read_holding_registers, block.address, count=block.count
                         )
-                    else:
-                        data["energy"] = None
-                finally:
-                    self.client.close()
+                        if not regs.isError():
+                            data.update(block.decode(regs.registers))
+                        else:
+                            metrics.record_error()
+                            data.update(dict.fromkeys(block.keys))
+            except (ModbusTransportError, TimeoutError) as e:
+                self.connection.mark_failed(e)
+                raise
 
-            _LOGGER.debug("_sync_get_data %s", data)
-            return data
+        _LOGGER.debug("async_get_data %s", data)
+        return data
 
-        return await self.hass.async_add_executor_job(_sync_get_data)
+    async def async_read_burst_sample(self) -> dict[str, Any] | None:
+        """Read only status and power, for sampling the power ramp as fast as the device answers.
 
-    async def async_set_power_limit(self, power: int) -> None:
-        """Set the power limit via Modbus."""
+        Every sample is a diagnostic request of its own, so polls and power writes
+        go ahead of a running burst. A sample that cannot start within
+        BURST_REQUEST_TIMEOUT is dropped.
+        """
+        request = self._scheduler.request(IoPriority.DIAGNOSTIC, BURST_REQUEST_TIMEOUT)
+        try:
+            async with self.metrics.async_track("burst", request) as metrics:
+                try:
+                    async with asyncio.timeout(self.timeouts["burst"]):
+                        await self.connection.async_ensure_connected()
+                        metrics.record_traffic(MODBUS_SHORT_FRAME_SIZE, modbus_read_size(BURST_BLOCK.count))
+                        regs = await self._async_request(
+                            self.client.read_holding_registers, BURST_BLOCK.address, count=BURST_BLOCK.count
+                        )
+                except (ModbusTransportError, TimeoutError) as e:
+                    metrics.record_error(e)
+                    self.connection.mark_failed(e)
+                    return None
+                if regs.isError():
+                    metrics.record_error()
+                    return None
+                return BURST_BLOCK.decode(regs.registers)
+        except RequestExpired:
+            return None
+
+    async def async_set_power_limit(self, power: int) -> int | None:
+        """Set the power limit via Modbus and return the value the device applied.
+
+        Uses a single read/write-multiple request (FC23) where the device supports it,
+        otherwise the write and the readback are sent back to back on the held connection.
+        """
         # _LOGGER.warning("Set power limit to %s W", power)
-        payload = [0, power]
-        await self.hass.async_add_executor_job(self._execute_modbus_sync, self.client.write_registers, 40599, payload)
+        block = SET_POWER_BLOCK
+        payload = block.encode({"set_power": power})
+
+        async with self.metrics.async_track("set_power", self._scheduler.request(IoPriority.CONTROL)) as metrics:
+            try:
+                async with asyncio.timeout(self.timeouts["set_power"]):
+                    await self.connection.async_ensure_connected()
+                    if self._supports_read_write:
+                        # Read/write request: write header and payload plus read address and count
+                        metrics.record_traffic(modbus_write_size(block.count) + 4, modbus_read_size(block.count))
+                        result = await self._async_request(
+                            self.client.readwrite_registers,
+                            read_address=block.address,
+                            read_count=block.count,
+                            write_address=block.address,
+                            values=payload,
+                        )
+                        if not result.isError():
+                            return block.decode(result.registers)["set_power"]
+                        if getattr(result, "exception_code", None) != _ILLEGAL_FUNCTION:
+                            metrics.record_error()
+                            _LOGGER.error("Modbus error: %s", result)
+                            return None
+                        _LOGGER.debug("Ohmpilot does not support FC23, using write and readback")
+                        self._supports_read_write = False
+
+                    metrics.record_traffic(modbus_write_size(block.count), MODBUS_SHORT_FRAME_SIZE)
+                    result = await self._async_request(self.client.write_registers, block.address, payload)
+                    if result.isError():
+                        metrics.record_error()
+                        _LOGGER.error("Modbus error: %s", result)
+                        return None
+                    metrics.record_traffic(MODBUS_SHORT_FRAME_SIZE, modbus_read_size(block.count))
+                    result = await self._async_request(
+                        self.client.read_holding_registers, block.address, count=block.count
+                    )
+                    if result.isError():
+                        # The write itself was acknowledged
+                        return power
+                    return block.decode(result.registers)["set_power"]
+            except (ModbusTransportError, TimeoutError) as e:
+                metrics.record_error(e)
+                self.connection.mark_failed(e)
+                self._log_transport_error(e)
+                return None
 
     async def async_set_target_temperature(self, temp: int) -> None:
-        """Set the target temperature via HTTP GET request."""
-        # This uses the logic from your rest_command
-        url = (
-            f"http://{self.host}:{self.http_port}/set.cgi?name=Ohmpilot&H1Auto=manually&H1Ph=3+phasig"
-            f"&H1Power=3709&tempInst=on&legCyc=0&maxTempUsed=on&maxTempCyc={temp}"
-            f"&H2Ph=aus&H2Power=0&H2ThModeOn=Einspeisung&H2ThOn=4000"
-            f"&H2ThModeOff=Einspeisung&H2ThOff=0"
-        )
-        try:
-            response = await self.session.get(url)
-            response.raise_for_status()
-            # _LOGGER.warning("Set target temperature to %s °C", temp)
-            # _LOGGER.warning("Set target temperature to %s °C", url)
-        except Exception as e:  # noqa: BLE001
-            _LOGGER.error("Failed to set target temperature: %s", e)
+        """Set the target temperature via the device's web interface.
+
+        The first value goes out immediately. Values set during the following cooldown
+        replace each other and only the latest one is sent when the cooldown ends.
+        """
+        await self._async_update_http_config({"maxTempUsed": "on", "maxTempCyc": str(temp)})
+
+    async def _async_update_http_config(self, changes: dict[str, str]) -> None:
+        """Queue configuration parameters to be sent with the next set.cgi request."""
+        if self._pending_http_config:
+            self.http_writes_coalesced += 1
+        self._pending_http_config.update(changes)
+        await self._http_config_debouncer.async_call()
+
+    async def async_get_http_config(self) -> dict[str, str] | None:
+        """Read the device's web interface configuration, or return None if it cannot be read.
+
+        It is read again before every write rather than cached, since it can also be
+        changed in the device's own web interface; the write cooldown bounds how often.
+        """
+        url = URL.build(scheme="http", host=self.host, port=self.http_port, path="/get.cgi")
+        async with self.metrics.async_track("get_http_config") as metrics:
+            try:
+                response = await self.session.get(url)
+                response.raise_for_status()
+                config = await response.json(content_type=None)
+                metrics.record_traffic(len(str(url)), response.content_length or 0)
+            except Exception as e:  # noqa: BLE001
+                metrics.record_error(e)
+                _LOGGER.debug("Could not read the Ohmpilot configuration, sending the complete defaults: %s", e)
+                self.http_config = None
+                return None
+        if not isinstance(config, dict):
+            metrics.record_error()
+            self.http_config = None
+            return None
+        self.http_config = {key: str(value) for key, value in config.items()}
+        return self.http_config
+
+    async def _async_write_http_config(self) -> None:
+        """Send the device's configuration with the queued parameters, unless it already has them.
+
+        set.cgi may reset parameters left out of a request, so the complete
+        configuration read from get.cgi is sent along, not just the changes.
+        """
+        if not self._pending_http_config:
+            return
+        pending, self._pending_http_config = self._pending_http_config, {}
+        config = await self.async_get_http_config()
+        if config is None:
+            params = {**HTTP_FALLBACK_CONFIG, **pending}
+        elif all(config.get(key) == value for key, value in pending.items()):
+            self.http_writes_skipped += 1
+            return
+        else:
+            params = {**config, **pending}
+        self.http_writes_sent += 1
+        url = URL.build(scheme="http", host=self.host, port=self.http_port, path="/set.cgi", query=params)
+        async with self.metrics.async_track("set_http_config") as metrics:
+            try:
+                response = await self.session.get(url)
+                # Request line only; headers are added by aiohttp and not counted
+                metrics.record_traffic(len(str(url)), response.content_length or 0)
+                response.raise_for_status()
+            except Exception as e:  # noqa: BLE001
+                metrics.record_error(e)
+                _LOGGER.error("Failed to set Ohmpilot configuration %s: %s", pending, e)
+                return
+        if self.http_config is not None:
+            self.http_config.update(pending)
 
     async def async_get_device_info(self) -> dict[str, str]:
-        """Read device identification registers (manufacturer, model, serial number)."""
+        """Read device identification registers (manufacturer, model, serial number, firmware)."""
 
-        def _sync_read() -> dict[str, str]:
-            with self._modbus_lock:
-                try:
-                    self.client.connect()
+        request = self._scheduler.request(IoPriority.POLL)
+        async with self.metrics.async_track("identity", request) as metrics:
+            try:
+                async with asyncio.timeout(self.timeouts["identity"]):
+                    await self.connection.async_ensure_connected()
                     result: dict[str, str] = {}
-                    for key, address, count in (
-                        ("manufacturer", 40004, 5),
-                        ("model", 40009, 14),
-                        ("serial_number", 40023, 16),
-                    ):
-                        regs = self.client.read_holding_registers(address, count=count)
+                    for block in IDENTITY_BLOCKS:
+                        await request.async_yield()
+                        metrics.record_traffic(MODBUS_SHORT_FRAME_SIZE, modbus_read_size(block.count))
+                        regs = await self._async_request(
+                            self.client.read_holding_registers, block.address, count=block.count
+                        )
                         if not regs.isError():
-                            raw = bytes(b for reg in regs.registers for b in reg.to_bytes(2, "big"))
-                            decoded = raw.rstrip(b"\x00").decode("ascii", errors="ignore").strip()
-                            result[key] = (
-                                "".join(c for c in decoded if c.isalnum()) if key == "serial_number" else decoded
-                            )
+                            result.update(block.decode(regs.registers))
                         else:
-                            result[key] = ""
-                    return result
-                finally:
-                    self.client.close()
+                            metrics.record_error()
+                            result.update(dict.fromkeys(block.keys, ""))
+            except (ModbusTransportError, TimeoutError) as e:
+                self.connection.mark_failed(e)
+                raise
+            else:
+                result["serial_number"] = "".join(c for c in result["serial_number"] if c.isalnum())
+                return result
 
-        return await self.hass.async_add_executor_job(_sync_read)
+    async def async_read_time(self) -> tuple[float, float, dict[str, int]] | None:
+        """Read the device clock and UTC offset.
 
-    async def async_set_time(self) -> None:
-        """Set the system time on the Ohmpilot via Modbus."""
-        _LOGGER.debug("Ohmpilot system time synchronized.")
+        Returns the local times just before the request was sent and just after the
+        response arrived, with the decoded registers, or None if the read failed.
+        """
+        async with self.metrics.async_track("get_time", self._scheduler.request(IoPriority.TIME_SYNC)) as metrics:
+            try:
+                async with asyncio.timeout(self.timeouts["get_time"]):
+                    await self.connection.async_ensure_connected()
+                    metrics.record_traffic(MODBUS_SHORT_FRAME_SIZE, modbus_read_size(TIME_BLOCK.count))
+                    sent = time.time()
+                    regs = await self._async_request(
+                        self.client.read_holding_registers, TIME_BLOCK.address, count=TIME_BLOCK.count
+                    )
+                    received = time.time()
+            except (ModbusTransportError, TimeoutError) as e:
+                metrics.record_error(e)
+                self.connection.mark_failed(e)
+                self._log_transport_error(e)
+                return None
+            if regs.isError():
+                metrics.record_error()
+                _LOGGER.error("Modbus error: %s", regs)
+                return None
+            return sent, received, TIME_BLOCK.decode(regs.registers)
+
+    async def async_set_time(self, utc_offset: int, latency: float = 0.0) -> bool:
+        """Set the system time on the Ohmpilot via Modbus.
 
-        def get_local_utc_offset_minutes_robust() -> int:
-            """Calculates the current system's local time offset from UTC in a robust way.
-
-            This method is generally more reliable across different platforms and
-            configurations than using the `time` module.
-
-            Returns:
-                int: The time zone offset in minutes.
-            """
-            # Create a timezone-aware datetime object for the current local time
-            local_aware_time = datetime.now().astimezone()
-            utc_offset = local_aware_time.utcoffset()
-            if utc_offset is None:
-                return 0
-            return int(utc_offset.total_seconds() / 60)
-
-        now = int(time.time())
-        high_word = (now >> 16) & 0xFFFF
-        low_word = now & 0xFFFF
-        mins_offset = get_local_utc_offset_minutes_robust()
-        payload = [0, 0, high_word, low_word, mins_offset]
-
-        await self.hass.async_add_executor_job(self._execute_modbus_sync, self.client.write_registers, 40399, payload)
+        utc_offset is the local offset from UTC in minutes, and latency the
+        seconds the request takes to reach the device, added to the time sent.
+        """
+        payload = TIME_BLOCK.encode({"time": round(time.time() + latency), "utc_offset": utc_offset})
+
+        result = await self._async_execute(
+            "set_time",
+            IoPriority.TIME_SYNC,
+            (modbus_write_size(TIME_BLOCK.count), MODBUS_SHORT_FRAME_SIZE),
+            self.client.write_registers,
+            TIME_BLOCK.address,
+            payload,
+        )
+        if result is None:
+            return False
+        _LOGGER.debug("Ohmpilot system time synchronized.")
+        return True
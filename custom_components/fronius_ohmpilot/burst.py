@@ -0,0 +1,105 @@
+"""High-rate burst capture of the Ohmpilot power ramp."""
+
+from __future__ import annotations
+
+from array import array
+import asyncio
+import contextlib
+import time
+from typing import TYPE_CHECKING, Any
+
+from .const import BURST_MAX_SAMPLES
+
+if TYPE_CHECKING:
+    from .api import FroniusOhmpilotApiClient
+    from .power_limit import PowerLimitWriter
+
+# Seconds to wait after a failed sample before trying again
+_ERROR_PAUSE = 0.1
+
+
+class BurstBuffer:
+    """Preallocated ring buffer of timestamped power and status samples."""
+
+    __slots__ = ("capacity", "count", "power", "status", "times")
+
+    def __init__(self, capacity: int = BURST_MAX_SAMPLES) -> None:
+        """Allocate room for capacity samples."""
+        self.capacity = capacity
+        self.count = 0
+        self.times = array("d", [0.0]) * capacity
+        self.power = array("i", [0]) * capacity
+        self.status = array("h", [0]) * capacity
+
+    @property
+    def overwritten(self) -> int:
+        """Return how many of the oldest samples were overwritten."""
+        return max(0, self.count - self.capacity)
+
+    def append(self, elapsed: float, power: int, status: int) -> None:
+        """Store a sample, overwriting the oldest once the buffer is full."""
+        index = self.count % self.capacity
+        self.times[index] = elapsed
+        self.power[index] = power
+        self.status[index] = status
+        self.count += 1
+
+    def _ordered(self, values: array) -> array:
+        """Return the stored values of one column from oldest to newest."""
+        if self.count <= self.capacity:
+            return values[: self.count]
+        start = self.count % self.capacity
+        return values[start:] + values[:start]
+
+    def as_response(self) -> dict[str, Any]:
+        """Return the samples as compact parallel lists."""
+        return {
+            "t_ms": [round(elapsed * 1000, 1) for elapsed in self._ordered(self.times)],
+            "power": self._ordered(self.power).tolist(),
+            "status": self._ordered(self.status).tolist(),
+        }
+
+
+async def async_capture_burst(
+    api: FroniusOhmpilotApiClient,
+    power_writer: PowerLimitWriter,
+    duration: float,
+    power: int | None = None,
+) -> dict[str, Any]:
+    """Sample power and status back to back for duration seconds.
+
+    When power is given it is written as a step at the start of the window and
+    held until the end, so the capture shows the heater's response to it and
+    neither the power loop nor the surplus controller changes it meanwhile. The
+    previous limit is restored afterwards.
+    """
+    buffer = BurstBuffer()
+    errors = 0
+    write_ms = None
+    start = time.monotonic()
+    async with contextlib.AsyncExitStack() as stack:
+        if power is not None:
+            await stack.enter_async_context(power_writer.async_hold(power))
+            write_ms = round((time.monotonic() - start) * 1000, 1)
+
+        end = start + duration
+        while (now := time.monotonic()) < end:
+            sample = await api.async_read_burst_sample()
+            if sample is None or sample["power"] is None:
+                errors += 1
+                # Failures can return without any I/O; give the event loop a chance to run
+                await asyncio.sleep(_ERROR_PAUSE)
+                continue
+            # Timestamp at the midpoint of the request, the best estimate of when it was read
+            buffer.append((now + time.monotonic()) / 2 - start, sample["power"], sample["status"])
+        elapsed = time.monotonic() - start
+
+    return {
+        "duration_s": round(elapsed, 3),
+        "samples": min(buffer.count, buffer.capacity),
+        "rate_hz": round(buffer.count / elapsed, 1) if elapsed else 0.0,
+        "overwritten": buffer.overwritten,
+        "errors": errors,
+        "write_ms": write_ms,
+        **buffer.as_response(),
+    }
@@ -12,42 +12,120 @@
 from homeassistant.const import CONF_HOST
 from homeassistant.core import HomeAssistant, callback
 from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.selector import EntitySelector, EntitySelectorConfig
 
 from .api import FroniusOhmpilotApiClient
 from .const import (
+    CONFIG_KEY_ENERGY_THRESHOLD,
+    CONFIG_KEY_GRID_POWER_ENTITY,
     CONFIG_KEY_HEATER1_MAX_POWER,
     CONFIG_KEY_HTTP_PORT,
+    CONFIG_KEY_IDENTITY,
+    CONFIG_KEY_MAX_IN_FLIGHT,
+    CONFIG_KEY_MAX_TEMPERATURE,
+    CONFIG_KEY_MIN_HEATER_POWER,
     CONFIG_KEY_MODBUS_PORT,
+    CONFIG_KEY_POWER_KEEPALIVE,
+    CONFIG_KEY_POWER_THRESHOLD,
+    CONFIG_KEY_RESERVED_POWER,
+    CONFIG_KEY_TELEMETRY,
+    CONFIG_KEY_TEMPERATURE_CALIBRATION_GAIN,
+    CONFIG_KEY_TEMPERATURE_CALIBRATION_OFFSET,
+    CONFIG_KEY_TEMPERATURE_THRESHOLD,
+    CONFIG_KEY_UNIT_ID,
+    DEFAULT_ENERGY_THRESHOLD,
     DEFAULT_HEATER1_MAX_POWER,
     DEFAULT_HTTP_PORT,
+    DEFAULT_MAX_IN_FLIGHT,
+    DEFAULT_MAX_TEMPERATURE,
+    DEFAULT_MIN_HEATER_POWER,
     DEFAULT_MODBUS_PORT,
+    DEFAULT_POWER_KEEPALIVE,
+    DEFAULT_POWER_THRESHOLD,
+    DEFAULT_RESERVED_POWER,
+    DEFAULT_TEMPERATURE_CALIBRATION_GAIN,
+    DEFAULT_TEMPERATURE_CALIBRATION_OFFSET,
+    DEFAULT_TEMPERATURE_THRESHOLD,
+    DEFAULT_UNIT_ID,
     DOMAIN,
+    MAX_IN_FLIGHT_LIMIT,
 )
 
 _LOGGER = logging.getLogger(__name__)
 
+GRID_POWER_SELECTOR = EntitySelector(EntitySelectorConfig(domain="sensor", device_class="power"))
+THRESHOLD = vol.All(vol.Coerce(float), vol.Range(min=0))
+MAX_IN_FLIGHT = vol.All(int, vol.Range(min=1, max=MAX_IN_FLIGHT_LIMIT))
+CALIBRATION_GAIN = vol.All(vol.Coerce(float), vol.Range(min=0.5, max=2))
+CALIBRATION_OFFSET = vol.All(vol.Coerce(float), vol.Range(min=-20, max=20))
+
 STEP_USER_DATA_SCHEMA = vol.Schema(
     {
         vol.Required(CONF_HOST, default="192.168.1.5"): str,
         vol.Required(CONFIG_KEY_MODBUS_PORT, default=DEFAULT_MODBUS_PORT): int,
+        vol.Required(CONFIG_KEY_UNIT_ID, default=DEFAULT_UNIT_ID): vol.All(int, vol.Range(min=0, max=255)),
+        vol.Required(CONFIG_KEY_MAX_IN_FLIGHT, default=DEFAULT_MAX_IN_FLIGHT): MAX_IN_FLIGHT,
         vol.Required(CONFIG_KEY_HTTP_PORT, default=DEFAULT_HTTP_PORT): int,
         vol.Required(CONFIG_KEY_HEATER1_MAX_POWER, default=DEFAULT_HEATER1_MAX_POWER): int,
+        vol.Required(CONFIG_KEY_POWER_KEEPALIVE, default=DEFAULT_POWER_KEEPALIVE): vol.All(int, vol.Range(min=1)),
+        vol.Optional(CONFIG_KEY_GRID_POWER_ENTITY): GRID_POWER_SELECTOR,
+        vol.Required(CONFIG_KEY_RESERVED_POWER, default=DEFAULT_RESERVED_POWER): vol.All(int, vol.Range(min=0)),
+        vol.Required(CONFIG_KEY_MIN_HEATER_POWER, default=DEFAULT_MIN_HEATER_POWER): vol.All(int, vol.Range(min=0)),
+        vol.Required(CONFIG_KEY_MAX_TEMPERATURE, default=DEFAULT_MAX_TEMPERATURE): vol.Coerce(float),
+        vol.Required(
+            CONFIG_KEY_TEMPERATURE_CALIBRATION_GAIN, default=DEFAULT_TEMPERATURE_CALIBRATION_GAIN
+        ): CALIBRATION_GAIN,
+        vol.Required(
+            CONFIG_KEY_TEMPERATURE_CALIBRATION_OFFSET, default=DEFAULT_TEMPERATURE_CALIBRATION_OFFSET
+        ): CALIBRATION_OFFSET,
+        vol.Required(CONFIG_KEY_TELEMETRY, default=False): bool,
+        vol.Required(CONFIG_KEY_TEMPERATURE_THRESHOLD, default=DEFAULT_TEMPERATURE_THRESHOLD): THRESHOLD,
+        vol.Required(CONFIG_KEY_POWER_THRESHOLD, default=DEFAULT_POWER_THRESHOLD): THRESHOLD,
+        vol.Required(CONFIG_KEY_ENERGY_THRESHOLD, default=DEFAULT_ENERGY_THRESHOLD): THRESHOLD,
     }
 )
 
 
 async def validate_input(hass: HomeAssistant, data: dict[str, Any]) -> dict[str, Any]:
-    """Validate the user input allows us to connect."""
+    """Validate the user input allows us to connect.
+
+    Also reads the device identity, so the entry can be set up from it without
+    waiting for the device; it is None if the serial number could not be read.
+    """
     client = FroniusOhmpilotApiClient(
         hass=hass,
         host=data[CONF_HOST],
         modbus_port=data[CONFIG_KEY_MODBUS_PORT],
         http_port=data[CONFIG_KEY_HTTP_PORT],
+        unit_id=data.get(CONFIG_KEY_UNIT_ID, DEFAULT_UNIT_ID),
     )
-    if not await client.test_connection():
+    identity = None
+    try:
+        connected = await client.test_connection()
+        if connected:
+            try:
+                identity = await client.async_get_device_info()
+            except Exception as err:  # noqa: BLE001
+                _LOGGER.debug("Could not read device info from Ohmpilot: %s", err)
+    finally:
+        await client.async_close()
+    if not connected:
         _LOGGER.error("validate_input ConnectionError")
         raise CannotConnect
-    return {"title": f"Fronius Ohmpilot ({data[CONF_HOST]})"}
+    if identity is not None and not identity.get("serial_number"):
+        identity = None
+    unit_id = data.get(CONFIG_KEY_UNIT_ID, DEFAULT_UNIT_ID)
+    if unit_id != DEFAULT_UNIT_ID:
+        return {"title": f"Fronius Ohmpilot ({data[CONF_HOST]} unit {unit_id})", "identity": identity}
+    return {"title": f"Fronius Ohmpilot ({data[CONF_HOST]})", "identity": identity}
+
+
+def unique_id_for(data: dict[str, Any]) -> str:
+    """Return the unique ID of the Ohmpilot addressed by the given connection settings."""
+    return (
+        f"{data[CONF_HOST]}:{data.get(CONFIG_KEY_MODBUS_PORT, DEFAULT_MODBUS_PORT)}"
+        f":{data.get(CONFIG_KEY_UNIT_ID, DEFAULT_UNIT_ID)}"
+    )
 
 
 class ConfigFlow(HomeAssistantConfigFlow, domain=DOMAIN):
@@ -70,6 +148,8 @@ async def async_step_user(
         """Handle the initial step."""
         errors: dict[str, str] = {}
         if user_input is not None:
+            await self.async_set_unique_id(unique_id_for(user_input))
+            self._abort_if_unique_id_configured()
             try:
                 info = await validate_input(self.hass, user_input)
             except CannotConnect:
@@ -80,7 +160,10 @@ async def async_step_user(
                 _LOGGER.exception("Unexpected exception")
                 errors["base"] = "unknown"
             else:
-                return self.async_create_entry(title=info["title"], data=user_input)
+                data = dict(user_input)
+                if info["identity"] is not None:
+                    data[CONFIG_KEY_IDENTITY] = info["identity"]
+                return self.async_create_entry(title=info["title"], data=data)
 
         return self.async_show_form(
             step_id="user", data_schema=STEP_USER_DATA_SCHEMA, errors=errors
@@ -103,17 +186,33 @@ async def async_step_init(self, user_input: dict[str, Any] | None = None) -> Con
         errors: dict[str, str] = {}
 
         if user_input is not None:
-            try:
-                await validate_input(self.hass, user_input)
-                self.hass.config_entries.async_update_entry(
-                    self.config_entry, data=user_input
-                )
-                await self.hass.config_entries.async_reload(self.config_entry.entry_id)
-                return self.async_create_entry(title="", data={})
-            except ConnectionError:
-                errors["base"] = "cannot_connect"
-            except Exception:
-                errors["base"] = "unknown"
+            owner = self.hass.config_entries.async_entry_for_domain_unique_id(DOMAIN, unique_id_for(user_input))
+            if owner is not None and owner.entry_id != self.config_entry.entry_id:
+                # Another entry already talks to the device at this address and unit ID
+                errors["base"] = "already_configured"
+            else:
+                try:
+                    info = await validate_input(self.hass, user_input)
+                    data = {**self.config_entry.data, **user_input}
+                    if CONFIG_KEY_GRID_POWER_ENTITY not in user_input:
+                        # A cleared optional field is missing from the input rather than empty
+                        data.pop(CONFIG_KEY_GRID_POWER_ENTITY, None)
+                    if unique_id_for(user_input) != unique_id_for(self.config_entry.data):
+                        # A different device may answer at the new address
+                        data.pop(CONFIG_KEY_IDENTITY, None)
+                        if info["identity"] is not None:
+                            data[CONFIG_KEY_IDENTITY] = info["identity"]
+                    self.hass.config_entries.async_update_entry(
+                        self.config_entry,
+                        data=data,
+                        unique_id=unique_id_for(user_input),
+                    )
+                    await self.hass.config_entries.async_reload(self.config_entry.entry_id)
+                    return self.async_create_entry(title="", data={})
+                except ConnectionError:
+                    errors["base"] = "cannot_connect"
+                except Exception:
+                    errors["base"] = "unknown"
 
         options_schema = vol.Schema(
             {
@@ -125,6 +224,14 @@ async def async_step_init(self, user_input: dict[str, Any] | None = None) -> Con
                     CONFIG_KEY_MODBUS_PORT,
                     default=self.config_entry.data.get(CONFIG_KEY_MODBUS_PORT, DEFAULT_MODBUS_PORT),
                 ): int,
+                vol.Required(
+                    CONFIG_KEY_UNIT_ID,
+                    default=self.config_entry.data.get(CONFIG_KEY_UNIT_ID, DEFAULT_UNIT_ID),
+                ): vol.All(int, vol.Range(min=0, max=255)),
+                vol.Required(
+                    CONFIG_KEY_MAX_IN_FLIGHT,
+                    default=self.config_entry.data.get(CONFIG_KEY_MAX_IN_FLIGHT, DEFAULT_MAX_IN_FLIGHT),
+                ): MAX_IN_FLIGHT,
                 vol.Required(
                     CONFIG_KEY_HTTP_PORT,
                     default=self.config_entry.data.get(CONFIG_KEY_HTTP_PORT, DEFAULT_HTTP_PORT),
@@ -133,6 +240,54 @@ async def async_step_init(self, user_input: dict[str, Any] | None = None) -> Con
                     CONFIG_KEY_HEATER1_MAX_POWER,
                     default=self.config_entry.data.get(CONFIG_KEY_HEATER1_MAX_POWER, DEFAULT_HEATER1_MAX_POWER),
                 ): int,
+                vol.Required(
+                    CONFIG_KEY_POWER_KEEPALIVE,
+                    default=self.config_entry.data.get(CONFIG_KEY_POWER_KEEPALIVE, DEFAULT_POWER_KEEPALIVE),
+                ): vol.All(int, vol.Range(min=1)),
+                vol.Optional(
+                    CONFIG_KEY_GRID_POWER_ENTITY,
+                    description={"suggested_value": self.config_entry.data.get(CONFIG_KEY_GRID_POWER_ENTITY)},
+                ): GRID_POWER_SELECTOR,
+                vol.Required(
+                    CONFIG_KEY_RESERVED_POWER,
+                    default=self.config_entry.data.get(CONFIG_KEY_RESERVED_POWER, DEFAULT_RESERVED_POWER),
+                ): vol.All(int, vol.Range(min=0)),
+                vol.Required(
+                    CONFIG_KEY_MIN_HEATER_POWER,
+                    default=self.config_entry.data.get(CONFIG_KEY_MIN_HEATER_POWER, DEFAULT_MIN_HEATER_POWER),
+                ): vol.All(int, vol.Range(min=0)),
+                vol.Required(
+                    CONFIG_KEY_MAX_TEMPERATURE,
+                    default=self.config_entry.data.get(CONFIG_KEY_MAX_TEMPERATURE, DEFAULT_MAX_TEMPERATURE),
+                ): vol.Coerce(float),
+                vol.Required(
+                    CONFIG_KEY_TEMPERATURE_CALIBRATION_GAIN,
+                    default=self.config_entry.data.get(
+                        CONFIG_KEY_TEMPERATURE_CALIBRATION_GAIN, DEFAULT_TEMPERATURE_CALIBRATION_GAIN
+                    ),
+                ): CALIBRATION_GAIN,
+                vol.Required(
+                    CONFIG_KEY_TEMPERATURE_CALIBRATION_OFFSET,
+                    default=self.config_entry.data.get(
+                        CONFIG_KEY_TEMPERATURE_CALIBRATION_OFFSET, DEFAULT_TEMPERATURE_CALIBRATION_OFFSET
+                    ),
+                ): CALIBRATION_OFFSET,
+                vol.Required(
+                    CONFIG_KEY_TELEMETRY,
+                    default=self.config_entry.data.get(CONFIG_KEY_TELEMETRY, False),
+                ): bool,
+                vol.Required(
+                    CONFIG_KEY_TEMPERATURE_THRESHOLD,
+                    default=self.config_entry.data.get(CONFIG_KEY_TEMPERATURE_THRESHOLD, DEFAULT_TEMPERATURE_THRESHOLD),
+                ): THRESHOLD,
+                vol.Required(
+                    CONFIG_KEY_POWER_THRESHOLD,
+                    default=self.config_entry.data.get(CONFIG_KEY_POWER_THRESHOLD, DEFAULT_POWER_THRESHOLD),
+                ): THRESHOLD,
+                vol.Required(
+                    CONFIG_KEY_ENERGY_THRESHOLD,
+                    default=self.config_entry.data.get(CONFIG_KEY_ENERGY_THRESHOLD, DEFAULT_ENERGY_THRESHOLD),
+                ): THRESHOLD,
             }
         )
 
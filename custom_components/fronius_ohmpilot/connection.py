@@ -0,0 +1,226 @@
+"""Persistent Modbus TCP connection handling for the Fronius Ohmpilot."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .transport import PipelinedModbusTcpClient, PymodbusTcpClient
+
+_LOGGER = logging.getLogger(__package__)
+
+# Register read to confirm an idle socket still reaches the device.
+PROBE_ADDRESS = 40799
+
+# Idle time after which the socket is probed before it is used again.
+PROBE_INTERVAL = 30.0
+
+# Consecutive failed requests after which the device is no longer contacted,
+# and the initial and maximum seconds until a single probe request is let through.
+FAILURE_THRESHOLD = 3
+BACKOFF_INITIAL = 1.0
+BACKOFF_MAX = 60.0
+
+
+class ModbusTransportError(Exception):
+    """A request got no response because the connection failed.
+
+    A response that does not arrive in time raises TimeoutError instead.
+    """
+
+
+class ConnectionUnavailable(ModbusTransportError):
+    """No socket could be opened, or the circuit is open; the failure is already counted."""
+
+
+class UnitTimeout(TimeoutError):
+    """One unit did not answer a request on a pipelined socket that stays open.
+
+    Other units behind the same gateway may still be answering on the socket, so
+    the timeout is counted for the unit rather than against the connection.
+    socket_idle is the number of seconds since the socket last received anything.
+    """
+
+    def __init__(self, message: str, unit: int, socket_idle: float) -> None:
+        """Initialize the error."""
+        super().__init__(message)
+        self.unit = unit
+        self.socket_idle = socket_idle
+
+
+class ConnectionDropped(ModbusTransportError):
+    """The socket was closed while the request waited for its response.
+
+    Whatever closed it counts the failure: the request that failed first, or the
+    next connection check finding the socket gone.
+    """
+
+
+class ModbusConnectionManager:
+    """Keep one long-lived Modbus TCP socket open, with a circuit breaker for outages.
+
+    After FAILURE_THRESHOLD consecutive transport failures the circuit opens:
+    requests fail immediately without touching the network. Once the jittered
+    exponential backoff has passed, the circuit is half open and one request is
+    let through as a probe. Its success closes the circuit, and its failure opens
+    it again for twice as long.
+    """
+
+    def __init__(
+        self,
+        client: PymodbusTcpClient | PipelinedModbusTcpClient,
+        probe_interval: float = PROBE_INTERVAL,
+        backoff_initial: float = BACKOFF_INITIAL,
+        backoff_max: float = BACKOFF_MAX,
+        failure_threshold: int = FAILURE_THRESHOLD,
+    ) -> None:
+        """Initialize the connection manager."""
+        self.client = client
+        self.probe_interval = probe_interval
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.connects = 0
+        self.reconnects = 0
+        self.connect_failures = 0
+        self.probe_failures = 0
+        self.circuit_opens = 0
+        self.rejected = 0
+        self.unit_timeouts: dict[int, int] = {}
+        self._connected_at: float | None = None
+        self._last_used = 0.0
+        self._failures = 0
+        self._next_attempt = 0.0
+        self._probing = False
+        self._connect_lock = asyncio.Lock()
+
+    @property
+    def connection_age(self) -> float | None:
+        """Return the seconds since the current socket was opened, if any."""
+        if self._connected_at is None:
+            return None
+        return time.monotonic() - self._connected_at
+
+    @property
+    def circuit_state(self) -> str:
+        """Return closed, open or half_open."""
+        if self._failures < self.failure_threshold:
+            return "closed"
+        return "half_open" if self._probing else "open"
+
+    async def async_ensure_connected(self) -> None:
+        """Return with an open, healthy socket or raise ConnectionUnavailable."""
+        async with self._connect_lock:
+            await self._async_ensure_connected()
+
+    async def _async_ensure_connected(self) -> None:
+        """Connect or probe the socket; called with the connect lock held."""
+        now = time.monotonic()
+        if self._failures >= self.failure_threshold:
+            if now < self._next_attempt:
+                self.rejected += 1
+                raise ConnectionUnavailable(f"Ohmpilot unreachable, next attempt in {self._next_attempt - now:.1f}s")
+            # Half open: this request is the probe, and every other one fails until it
+            # completes. Should it never report back, another probe follows after backoff_max.
+            self._probing = True
+            self._next_attempt = now + self.backoff_max
+
+        if self._connected_at is not None and self.client.connected:
+            if now - self._last_used < self.probe_interval or await self._async_probe():
+                self._last_used = now
+                return
+        elif self._connected_at is not None:
+            self.mark_failed()
+            if self._failures >= self.failure_threshold:
+                raise ConnectionUnavailable("Modbus TCP connection lost")
+
+        if not await self.client.connect():
+            self.connect_failures += 1
+            self._record_failure()
+            raise ConnectionUnavailable("Unable to open Modbus TCP connection")
+
+        if self.connects:
+            self.reconnects += 1
+        self.connects += 1
+        self._connected_at = self._last_used = time.monotonic()
+
+    def record_success(self) -> None:
+        """Close the circuit after the device answered a request."""
+        if self._failures >= self.failure_threshold:
+            _LOGGER.info("Ohmpilot reachable again")
+        self._failures = 0
+        self._probing = False
+
+    def mark_failed(self, err: BaseException | None = None) -> None:
+        """Drop the socket after a transport error and count it toward opening the circuit.
+
+        Errors raised by async_ensure_connected itself are passed in unchanged;
+        they are already counted. So are ConnectionDropped errors of requests
+        pipelined on a socket that was closed under them. A unit that does not
+        answer on a pipelined socket only counts toward its own timeouts while the
+        socket received something within the probe interval; once it has been
+        silent that long, the socket itself is suspect.
+        """
+        if isinstance(err, (ConnectionUnavailable, ConnectionDropped)):
+            return
+        if isinstance(err, UnitTimeout) and err.socket_idle < self.probe_interval:
+            self.unit_timeouts[err.unit] = self.unit_timeouts.get(err.unit, 0) + 1
+            return
+        if self._connected_at is not None:
+            _LOGGER.debug("Dropping Modbus connection after %.0fs", self.connection_age)
+        self._connected_at = None
+        self.client.close()
+        self._record_failure()
+
+    def close(self) -> None:
+        """Close the socket and forget its state."""
+        self._connected_at = None
+        self._failures = 0
+        self._next_attempt = 0.0
+        self._probing = False
+        self.client.close()
+
+    async def _async_probe(self) -> bool:
+        """Read a single register to check the idle socket is still usable.
+
+        Any response counts, including a Modbus exception from a gateway that does
+        not know the unit: only a missing response means the socket is dead.
+        """
+        try:
+            await self.client.read_holding_registers(PROBE_ADDRESS, count=1)
+        except (ModbusTransportError, TimeoutError):
+            self.probe_failures += 1
+            self.mark_failed()
+            return False
+        return True
+
+    def _record_failure(self) -> None:
+        """Count a failure, and open the circuit with jittered exponential backoff at the threshold."""
+        self._failures += 1
+        self._probing = False
+        if self._failures < self.failure_threshold:
+            return
+        if self._failures == self.failure_threshold:
+            self.circuit_opens += 1
+            _LOGGER.warning("Ohmpilot unreachable after %s failed requests, backing off", self._failures)
+        delay = min(self.backoff_max, self.backoff_initial * 2 ** (self._failures - self.failure_threshold))
+        self._next_attempt = time.monotonic() + random.uniform(delay / 2, delay)
+        _LOGGER.debug("Next Modbus attempt in up to %.1fs", delay)
+
+    def as_dict(self) -> dict[str, float | int | str | dict[int, int] | None]:
+        """Return connection counters."""
+        return {
+            "connection_age": self.connection_age,
+            "connects": self.connects,
+            "reconnects": self.reconnects,
+            "connect_failures": self.connect_failures,
+            "probe_failures": self.probe_failures,
+            "circuit_state": self.circuit_state,
+            "circuit_opens": self.circuit_opens,
+            "rejected": self.rejected,
+            "unit_timeouts": dict(self.unit_timeouts),
+        }
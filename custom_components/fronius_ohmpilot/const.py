@@ -3,9 +3,161 @@
 DOMAIN = "fronius_ohmpilot"
 
 CONFIG_KEY_MODBUS_PORT = "modbus_port"
+CONFIG_KEY_UNIT_ID = "unit_id"
+CONFIG_KEY_MAX_IN_FLIGHT = "max_in_flight"
 CONFIG_KEY_HTTP_PORT = "http_port"
 CONFIG_KEY_HEATER1_MAX_POWER = "heater1_maximum_power"
+CONFIG_KEY_POWER_KEEPALIVE = "power_keepalive"
+CONFIG_KEY_GRID_POWER_ENTITY = "grid_power_entity"
+CONFIG_KEY_RESERVED_POWER = "reserved_power"
+CONFIG_KEY_MIN_HEATER_POWER = "min_heater_power"
+CONFIG_KEY_MAX_TEMPERATURE = "max_temperature"
+CONFIG_KEY_TEMPERATURE_CALIBRATION_GAIN = "temperature_calibration_gain"
+CONFIG_KEY_TEMPERATURE_CALIBRATION_OFFSET = "temperature_calibration_offset"
+CONFIG_KEY_TELEMETRY = "telemetry"
+CONFIG_KEY_TEMPERATURE_THRESHOLD = "temperature_threshold"
+CONFIG_KEY_POWER_THRESHOLD = "power_threshold"
+CONFIG_KEY_ENERGY_THRESHOLD = "energy_threshold"
+# Decoded device identification, cached in the config entry data
+CONFIG_KEY_IDENTITY = "identity"
 
 DEFAULT_MODBUS_PORT = 503
+DEFAULT_UNIT_ID = 1
+# Modbus requests allowed in flight at once on one gateway connection; above 1,
+# requests to different unit IDs are pipelined.
+DEFAULT_MAX_IN_FLIGHT = 1
+MAX_IN_FLIGHT_LIMIT = 16
 DEFAULT_HTTP_PORT = 81
 DEFAULT_HEATER1_MAX_POWER = 3700
+# Seconds after which an unchanged power limit is rewritten; the Ohmpilot drops
+# back to its own regulation when it stops receiving limits for about 30 s.
+DEFAULT_POWER_KEEPALIVE = 20
+# PV surplus controller, see misc/cohmpilot.py: surplus kept back for the house in W,
+# smallest power limit worth switching the heater on for in W, and the boiler
+# temperature in °C above which the heater is switched off.
+DEFAULT_RESERVED_POWER = 105
+DEFAULT_MIN_HEATER_POWER = 275
+DEFAULT_MAX_TEMPERATURE = 52.5
+# Linear calibration of the Ohmpilot temperature sensor, applied before the
+# controller's temperature cutoff (misc/cohmpilot.py used a gain of 1.03 and an
+# offset of 3.8 °C for its installation).
+DEFAULT_TEMPERATURE_CALIBRATION_GAIN = 1.0
+DEFAULT_TEMPERATURE_CALIBRATION_OFFSET = 0.0
+# Smallest change in °C, W and Wh that is written to a sensor's state; smaller
+# changes are dropped to save recorder rows and state change events.
+DEFAULT_TEMPERATURE_THRESHOLD = 0.2
+DEFAULT_POWER_THRESHOLD = 10
+DEFAULT_ENERGY_THRESHOLD = 10
+# The precise energy total resolves fractions of a Wh, so it has its own threshold.
+PRECISE_ENERGY_THRESHOLD = 0.1
+
+# Adaptive polling: poll every FAST seconds while power changes or after a command,
+# and double the interval up to SLOW seconds once readings have been stable.
+UPDATE_INTERVAL_FAST = 5
+UPDATE_INTERVAL_SLOW = 300
+STABLE_POLLS_BEFORE_BACKOFF = 3
+STABLE_POWER_DELTA = 50
+
+# Seconds a poll or a burst sample may wait for the gateway connection before it
+# is dropped; by then its data would be stale. Power limit writes and time
+# synchronisation wait as long as it takes.
+POLL_REQUEST_TIMEOUT = UPDATE_INTERVAL_FAST
+BURST_REQUEST_TIMEOUT = 1
+
+# Seconds pymodbus waits for a response before the request fails; it does not
+# retry by itself, the next poll or power loop tick is the retry.
+MODBUS_RESPONSE_TIMEOUT = 2
+# Seconds an API operation may take in total once it has the connection,
+# including connecting. A power limit write must finish before the next tick
+# of the one-second power loop needs the connection.
+DEFAULT_OPERATION_TIMEOUTS: dict[str, float] = {
+    "test": 5,
+    "poll": 4,
+    "burst": 1,
+    "set_power": 1,
+    "identity": 10,
+    "get_time": 3,
+    "set_time": 3,
+}
+
+# Seconds setup waits for the device identity when none is cached in the config
+# entry. If it cannot be read by then, entities start out with unique IDs based on
+# the entry ID and are moved to the serial number once it is known.
+SETUP_IDENTITY_TIMEOUT = 5
+
+# Clock synchronisation: the device clock is written once it is more than
+# MAX_ERROR seconds off. It is checked FIRST_CHECK seconds after setup and then
+# every MIN_INTERVAL to MAX_INTERVAL seconds depending on its drift, which is
+# estimated over at least MIN_DRIFT_BASELINE seconds between writes. A device
+# whose clock register does not advance between checks is written every
+# STALLED_INTERVAL seconds instead.
+TIME_SYNC_MAX_ERROR = 2.0
+TIME_SYNC_FIRST_CHECK = 30
+TIME_SYNC_MIN_INTERVAL = 900
+TIME_SYNC_MAX_INTERVAL = 86400
+TIME_SYNC_MIN_DRIFT_BASELINE = 21600
+TIME_SYNC_STALLED_INTERVAL = 1800
+
+# Minimum seconds between two configuration writes to the Ohmpilot's web server;
+# values set in between are coalesced and only the latest one is sent.
+HTTP_WRITE_COOLDOWN = 3
+
+# Complete set.cgi parameter set sent when the device's configuration cannot be
+# read from get.cgi, as the integration sent with every write before: one heater
+# on three phases at 3709 W with the temperature cutoff enabled, the second
+# heater off. Parameters left out of a set.cgi request may be reset by the device,
+# so every write otherwise sends the complete configuration read from get.cgi.
+HTTP_FALLBACK_CONFIG: dict[str, str] = {
+    "name": "Ohmpilot",
+    "H1Auto": "manually",
+    "H1Ph": "3 phasig",
+    "H1Power": "3709",
+    "tempInst": "on",
+    "legCyc": "0",
+    "maxTempUsed": "on",
+    "H2Ph": "aus",
+    "H2Power": "0",
+    "H2ThModeOn": "Einspeisung",
+    "H2ThOn": "4000",
+    "H2ThModeOff": "Einspeisung",
+    "H2ThOff": "0",
+}
+
+# PV surplus controller: power limit changes smaller than this many W are not written,
+# and grid power readings arriving within this many seconds of a write are coalesced
+# while the heater ramps to the new limit.
+CONTROLLER_MIN_POWER_CHANGE = 15
+CONTROLLER_SETTLE_TIME = 2
+
+# Thermal model of the boiler: readings are combined into samples at least this many
+# seconds apart, older samples fade with this weight per sample, and the model is
+# used once it has this many samples. The controller limits power so the predicted
+# temperature stays below the maximum for the next THERMAL_HORIZON seconds.
+THERMAL_MIN_SAMPLE_INTERVAL = 300
+THERMAL_FORGETTING = 0.99
+THERMAL_MIN_SAMPLES = 12
+THERMAL_HORIZON = 900
+
+# Telemetry recording: buffered samples are written every FLUSH_INTERVAL seconds,
+# at most MAX_BUFFER samples are held while writes fail, and daily files older than
+# RETENTION_DAYS are deleted.
+TELEMETRY_FLUSH_INTERVAL = 300
+TELEMETRY_MAX_BUFFER = 20000
+TELEMETRY_RETENTION_DAYS = 180
+
+# Burst capture: longest window in seconds, and ring buffer size in samples; a
+# longer capture keeps only the most recent samples.
+BURST_DEFAULT_DURATION = 5
+BURST_MAX_DURATION = 30
+BURST_MAX_SAMPLES = 4096
+
+# Rolling statistics windows: bucket length in seconds and number of buckets
+# (the last hour by minute, the last day by hour and the last 30 days by day).
+# A poll gap longer than STATISTICS_MAX_GAP seconds is not counted as heater
+# on-time.
+STATISTICS_WINDOWS: dict[str, tuple[int, int]] = {
+    "last_hour": (60, 60),
+    "last_day": (3600, 24),
+    "last_30_days": (86400, 30),
+}
+STATISTICS_MAX_GAP = 900
@@ -0,0 +1,194 @@
+"""Closed-loop PV surplus control of the Ohmpilot power limit."""
+
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any
+
+from homeassistant.const import STATE_UNAVAILABLE, STATE_UNKNOWN, UnitOfPower
+from homeassistant.core import CALLBACK_TYPE, Event, EventStateChangedData, HomeAssistant, callback
+from homeassistant.helpers.debounce import Debouncer
+from homeassistant.helpers.event import async_track_state_change_event
+
+from .const import (
+    CONTROLLER_MIN_POWER_CHANGE,
+    CONTROLLER_SETTLE_TIME,
+    DEFAULT_MAX_TEMPERATURE,
+    DEFAULT_MIN_HEATER_POWER,
+    DEFAULT_RESERVED_POWER,
+    DEFAULT_TEMPERATURE_CALIBRATION_GAIN,
+    DEFAULT_TEMPERATURE_CALIBRATION_OFFSET,
+    THERMAL_HORIZON,
+)
+from .coordinator import FroniusOhmpilotDataUpdateCoordinator
+from .thermal import ThermalModel
+
+_LOGGER = logging.getLogger(__package__)
+
+_POWER_FACTORS = {UnitOfPower.WATT: 1, UnitOfPower.KILO_WATT: 1000}
+
+
+class SurplusController:
+    """Drive the heater with the PV surplus reported by a grid power sensor.
+
+    The grid power sensor reads positive while importing and negative while
+    exporting. Every new reading moves the power limit by the measured surplus,
+    less a reserve kept back for the house, so the heater absorbs what would
+    otherwise be exported.
+
+    Once a thermal model of the boiler has been fitted from the polled temperature
+    and energy, the limit is also capped so the predicted temperature stays below
+    the maximum over the next THERMAL_HORIZON seconds. Power is ramped down while
+    the boiler approaches the maximum instead of being cut at it.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        coordinator: FroniusOhmpilotDataUpdateCoordinator,
+        grid_power_entity: str,
+        max_power: int,
+        *,
+        reserved_power: float = DEFAULT_RESERVED_POWER,
+        min_heater_power: float = DEFAULT_MIN_HEATER_POWER,
+        max_temperature: float = DEFAULT_MAX_TEMPERATURE,
+        calibration_gain: float = DEFAULT_TEMPERATURE_CALIBRATION_GAIN,
+        calibration_offset: float = DEFAULT_TEMPERATURE_CALIBRATION_OFFSET,
+    ) -> None:
+        """Initialize the controller."""
+        self.hass = hass
+        self.coordinator = coordinator
+        self.grid_power_entity = grid_power_entity
+        self.max_power = max_power
+        self.reserved_power = reserved_power
+        self.min_heater_power = min_heater_power
+        self.max_temperature = max_temperature
+        self.calibration_gain = calibration_gain
+        self.calibration_offset = calibration_offset
+        self.setpoint = 0
+        self.grid_power: float | None = None
+        self.regulations = 0
+        self._changed_at = 0.0
+        self._measured_power: float | None = None
+        self._measured_at = 0.0
+        self.thermal = ThermalModel()
+        self._debouncer = Debouncer(
+            hass,
+            _LOGGER,
+            cooldown=CONTROLLER_SETTLE_TIME,
+            immediate=True,
+            function=self._async_regulate,
+        )
+
+    def calibrate(self, temperature: float) -> float:
+        """Return the boiler temperature corrected by the sensor calibration."""
+        return temperature * self.calibration_gain + self.calibration_offset
+
+    @callback
+    def async_start(self) -> CALLBACK_TYPE:
+        """Follow the grid power sensor and the heater measurements until the returned callback is called."""
+        unsub_state = async_track_state_change_event(self.hass, [self.grid_power_entity], self._handle_grid_power)
+        unsub_coordinator = self.coordinator.async_add_listener(self._handle_measurement)
+
+        @callback
+        def stop() -> None:
+            unsub_state()
+            unsub_coordinator()
+            self._debouncer.async_shutdown()
+
+        return stop
+
+    @callback
+    def _handle_grid_power(self, event: Event[EventStateChangedData]) -> None:
+        """Regulate on every new grid power reading."""
+        state = event.data["new_state"]
+        if state is None or state.state in (STATE_UNAVAILABLE, STATE_UNKNOWN):
+            return
+        factor = _POWER_FACTORS.get(state.attributes.get("unit_of_measurement"), 1)
+        try:
+            self.grid_power = float(state.state) * factor
+        except ValueError:
+            _LOGGER.debug("Ignoring non-numeric grid power %s", state.state)
+            return
+        self.coordinator.statistics.grid_power = self.grid_power
+        # Readings arriving while the heater settles on a new limit are coalesced
+        self.hass.async_create_task(self._debouncer.async_call())
+
+    @callback
+    def _handle_measurement(self) -> None:
+        """Remember the heater power measured on the latest poll and train the thermal model."""
+        if (data := self.coordinator.data) is None:
+            return
+        now = time.monotonic()
+        if (power := data.get("power")) is not None:
+            self._measured_power = power
+            self._measured_at = now
+        if (temperature := data.get("temperature")) is not None and (energy := data.get("energy")) is not None:
+            self.thermal.update(now, self.calibrate(temperature), energy)
+
+    def _heater_power(self) -> float:
+        """Return the power the heater currently draws.
+
+        The limit last written is used while the heater is still ramping towards it.
+        Once a poll has seen the settled heater, its measurement is used instead, so
+        the limit does not wind up while the Ohmpilot's own thermostat has it off.
+        """
+        if self._measured_power is not None and self._measured_at - self._changed_at >= CONTROLLER_SETTLE_TIME:
+            return min(self.setpoint, self._measured_power)
+        return self.setpoint
+
+    def compute_setpoint(self, grid_power: float, temperature: float | None) -> int:
+        """Return the power limit for a grid power reading and the boiler temperature."""
+        limit = float(self.max_power)
+        if temperature is not None:
+            temperature = self.calibrate(temperature)
+            if temperature >= self.max_temperature:
+                return 0
+            if (safe := self.thermal.max_power(temperature, self.max_temperature, THERMAL_HORIZON)) is not None:
+                limit = min(limit, safe)
+
+        setpoint = round(min(limit, max(0.0, self._heater_power() - grid_power - self.reserved_power)))
+        if setpoint < self.min_heater_power:
+            return 0
+        if self.setpoint >= self.min_heater_power and abs(setpoint - self.setpoint) < CONTROLLER_MIN_POWER_CHANGE:
+            return self.setpoint
+        return setpoint
+
+    async def _async_regulate(self) -> None:
+        """Compute and write the power limit for the latest grid power reading."""
+        if not self.coordinator.active or self.grid_power is None:
+            return
+        if self.coordinator.power_writer.held:
+            # A burst capture holds its power step; regulate again on the next reading after it
+            return
+        data = self.coordinator.data or {}
+        setpoint = self.compute_setpoint(self.grid_power, data.get("temperature"))
+        self.regulations += 1
+        if setpoint == self.setpoint:
+            return
+
+        _LOGGER.debug(
+            "Surplus controller: grid %s W, power limit %s W -> %s W", self.grid_power, self.setpoint, setpoint
+        )
+        self.setpoint = setpoint
+        self._changed_at = time.monotonic()
+        await self.coordinator.power_writer.async_write(setpoint)
+        self.coordinator.async_notify_command()
+
+    def time_to_max_temperature(self) -> float | None:
+        """Return the predicted seconds until the boiler reaches the maximum temperature at the current limit."""
+        if self.coordinator.data is None or (temperature := self.coordinator.data.get("temperature")) is None:
+            return None
+        return self.thermal.time_to_target(self.calibrate(temperature), self.setpoint, self.max_temperature)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the controller state."""
+        return {
+            "grid_power_entity": self.grid_power_entity,
+            "grid_power": self.grid_power,
+            "setpoint": self.setpoint,
+            "measured_power": self._measured_power,
+            "regulations": self.regulations,
+            "thermal_model": self.thermal.as_dict(),
+        }
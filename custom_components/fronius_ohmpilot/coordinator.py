@@ -2,13 +2,25 @@
 
 from datetime import timedelta
 import logging
+import time
 
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.device_registry import DeviceInfo
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 
 from .api import FroniusOhmpilotApiClient
-from .const import DOMAIN
+from .const import (
+    DEFAULT_POWER_KEEPALIVE,
+    DOMAIN,
+    STABLE_POLLS_BEFORE_BACKOFF,
+    STABLE_POWER_DELTA,
+    UPDATE_INTERVAL_FAST,
+    UPDATE_INTERVAL_SLOW,
+)
+from .energy import EnergyAccumulator
+from .power_limit import PowerLimitWriter
+from .scheduler import RequestExpired
+from .statistics import PollStatistics
 
 _LOGGER = logging.getLogger(__package__)
 
@@ -16,21 +28,32 @@
 class FroniusOhmpilotDataUpdateCoordinator(DataUpdateCoordinator):
     """Class to manage fetching data from the Fronius Ohmpilot."""
 
-    def __init__(self, hass: HomeAssistant, api_client: FroniusOhmpilotApiClient, entry_id: str):
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        api_client: FroniusOhmpilotApiClient,
+        entry_id: str,
+        power_keepalive: float = DEFAULT_POWER_KEEPALIVE,
+    ):
         """Initialize the coordinator."""
         super().__init__(
             hass,
             _LOGGER,
             name=DOMAIN,
-            update_interval=timedelta(seconds=5),
+            update_interval=timedelta(seconds=UPDATE_INTERVAL_FAST),
             always_update=False,
         )
         self.api = api_client
+        self.power_writer = PowerLimitWriter(api_client, power_keepalive, self._handle_applied_power)
         self.entry_id = entry_id
         self.active: bool = True
         self.serial_number: str = ""
         self.manufacturer: str = "Fronius"
         self.model: str = "Ohmpilot"
+        self.firmware_version: str = ""
+        self.energy = EnergyAccumulator()
+        self.statistics = PollStatistics()
+        self._stable_polls = 0
 
     @property
     def device_info(self) -> DeviceInfo:
@@ -43,8 +66,53 @@ def device_info(self) -> DeviceInfo:
             manufacturer=self.manufacturer or "Fronius",
             model=self.model or "Ohmpilot",
             serial_number=self.serial_number or None,
+            sw_version=self.firmware_version or None,
         )
 
+    def apply_identity(self, identity: dict[str, str]) -> None:
+        """Take over manufacturer, model, serial number and firmware from the device identity."""
+        self.serial_number = identity.get("serial_number", "")
+        self.manufacturer = identity.get("manufacturer", "Fronius") or "Fronius"
+        self.model = identity.get("model", "Ohmpilot") or "Ohmpilot"
+        self.firmware_version = identity.get("firmware_version", "")
+
+    @callback
+    def _handle_applied_power(self, applied: int) -> None:
+        """Publish the power limit confirmed by a write without waiting for the next poll."""
+        if self.data is None or self.data.get("set_power") == applied:
+            return
+        self.data = {**self.data, "set_power": applied}
+        self.async_update_listeners()
+        self.async_notify_command()
+
+    @callback
+    def async_notify_command(self) -> None:
+        """Return to fast polling after a setpoint change so its effect is seen quickly."""
+        self._stable_polls = 0
+        if self.update_interval == timedelta(seconds=UPDATE_INTERVAL_FAST):
+            return
+        self.update_interval = timedelta(seconds=UPDATE_INTERVAL_FAST)
+        self.hass.async_create_task(self.async_request_refresh())
+
+    def _adapt_update_interval(self, data: dict) -> None:
+        """Back off polling while status and power are stable, poll fast while they change."""
+        previous = self.data
+        stable = (
+            previous is not None
+            and data.get("status") == previous.get("status")
+            and data.get("power") is not None
+            and previous.get("power") is not None
+            and abs(data["power"] - previous["power"]) <= STABLE_POWER_DELTA
+        )
+        if not stable:
+            self._stable_polls = 0
+            self.update_interval = timedelta(seconds=UPDATE_INTERVAL_FAST)
+            return
+
+        self._stable_polls += 1
+        if self._stable_polls >= STABLE_POLLS_BEFORE_BACKOFF and self.update_interval is not None:
+            self.update_interval = min(self.update_interval * 2, timedelta(seconds=UPDATE_INTERVAL_SLOW))
+
     async def _async_update_data(self):
         """Fetch data from API."""
         if not self.active:
@@ -53,7 +121,18 @@ async def _async_update_data(self):
             data = await self.api.async_get_data()
             if data is None or not any(v is not None for v in data.values()):
                 raise UpdateFailed("No data received from Ohmpilot")  # noqa: TRY301
+        except RequestExpired as err:
+            if self.data is None:
+                raise UpdateFailed(f"Ohmpilot connection busy: {err}") from err
+            # Power limit writes kept the connection busy; skip this poll rather than queue it
+            _LOGGER.debug("Skipping poll: %s", err)
+            return self.data
         except Exception as err:
             raise UpdateFailed(f"Error communicating with API: {err}") from err
         else:
+            data["set_power"] = self.power_writer.applied
+            now = time.monotonic()
+            data["energy_total"] = self.energy.update(now, data.get("power"), data.get("energy"))
+            self.statistics.update(now, data)
+            self._adapt_update_interval(data)
             return data
@@ -0,0 +1,48 @@
+"""Diagnostics support for the Fronius Ohmpilot."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_HOST
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+TO_REDACT = {CONF_HOST, "serial_number"}
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    entry_data = hass.data[DOMAIN][entry.entry_id]
+    api = entry_data["api"]
+    coordinator = entry_data["coordinator"]
+
+    return {
+        "entry": async_redact_data({"data": dict(entry.data), "options": dict(entry.options)}, TO_REDACT),
+        "coordinator": {
+            "active": coordinator.active,
+            "last_update_success": coordinator.last_update_success,
+            "update_interval": coordinator.update_interval.total_seconds() if coordinator.update_interval else None,
+            "data": coordinator.data,
+        },
+        "connection": api.connection.as_dict(),
+        "gateway_users": api.gateway.users,
+        "gateway_max_in_flight": api.gateway.max_in_flight,
+        "scheduler": api.gateway.scheduler.as_dict(),
+        "power_writer": coordinator.power_writer.as_dict(),
+        "energy": coordinator.energy.as_dict(),
+        "statistics": coordinator.statistics.as_dict(),
+        "http_writes": {
+            "sent": api.http_writes_sent,
+            "coalesced": api.http_writes_coalesced,
+            "skipped": api.http_writes_skipped,
+        },
+        "http_config_read": api.http_config is not None,
+        "operations": api.metrics.as_dict(),
+        "controller": controller.as_dict() if (controller := entry_data.get("controller")) else None,
+        "telemetry": telemetry.as_dict() if (telemetry := entry_data.get("telemetry")) else None,
+        "time_sync": time_sync.as_dict() if (time_sync := entry_data.get("time_sync")) else None,
+    }
@@ -0,0 +1,67 @@
+"""High-resolution energy total from the Ohmpilot's power readings and energy counter."""
+
+from __future__ import annotations
+
+# Largest fraction of a Wh the counter can hide before it ticks
+_MAX_PARTIAL = 0.999
+
+
+class EnergyAccumulator:
+    """Integrate polled power between energy counter readings.
+
+    The hardware counter only counts whole Wh. Between its ticks, power readings
+    are integrated with the trapezoid rule, and the integrated energy the counter
+    has not yet accounted for is added to it as a fraction of a Wh. A poll that
+    fails leaves a gap, which the next reading bridges by the same rule. If the
+    counter is missing, the integrated energy carries the total until it returns,
+    and a counter reset on the device continues from the previous total. The
+    total never decreases.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the accumulator."""
+        self.total: float | None = None
+        self.integrated = 0.0
+        self.counter_resets = 0
+        self._counter: float | None = None
+        self._offset = 0.0
+        self._partial = 0.0
+        self._last: tuple[float, float] | None = None
+
+    def update(self, now: float, power: float | None, counter: float | None) -> float | None:
+        """Add a reading taken at monotonic time now, in W and Wh, and return the total in Wh."""
+        if power is not None:
+            if self._last is not None:
+                last_time, last_power = self._last
+                energy = (last_power + power) / 2 * (now - last_time) / 3600
+                self._partial += energy
+                self.integrated += energy
+            self._last = (now, power)
+
+        if counter is not None:
+            if self._counter is None:
+                self._partial = 0.0
+            elif counter < self._counter:
+                self.counter_resets += 1
+                self._offset += self._counter
+                self._partial = 0.0
+            else:
+                # Integrated energy beyond what the counter now shows
+                self._partial -= counter - self._counter
+            self._counter = counter
+            self._partial = min(max(self._partial, 0.0), _MAX_PARTIAL)
+
+        if self._counter is None:
+            return self.total
+        total = self._offset + self._counter + self._partial
+        self.total = total if self.total is None else max(self.total, total)
+        return self.total
+
+    def as_dict(self) -> dict[str, float | int | None]:
+        """Return the accumulator state."""
+        return {
+            "total": self.total,
+            "integrated": self.integrated,
+            "counter": self._counter,
+            "counter_resets": self.counter_resets,
+        }
@@ -0,0 +1,91 @@
+"""Modbus TCP gateways shared by all Ohmpilots reached through the same host."""
+
+from __future__ import annotations
+
+import logging
+
+from homeassistant.core import HomeAssistant, callback
+
+from .connection import ModbusConnectionManager
+from .const import DEFAULT_MAX_IN_FLIGHT, DOMAIN, MODBUS_RESPONSE_TIMEOUT
+from .scheduler import IoScheduler
+from .transport import PipelinedModbusTcpClient, PymodbusTcpClient
+
+_LOGGER = logging.getLogger(__package__)
+
+DATA_GATEWAY_POOL = f"{DOMAIN}_gateways"
+
+# Successive poll phases step around the interval by the golden ratio, which keeps
+# any number of devices evenly spread without knowing how many will be added.
+_PHASE_STEP = 0.6180339887
+
+
+class ModbusGateway:
+    """One Modbus TCP connection and request budget for a host and port."""
+
+    def __init__(self, host: str, port: int, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT) -> None:
+        """Initialize the gateway.
+
+        With max_in_flight above 1, requests to different unit IDs are pipelined on
+        the connection. pymodbus waits for each response before sending the next
+        request, so the gateway then uses its own pipelined client instead.
+        """
+        self.host = host
+        self.port = port
+        self.max_in_flight = max_in_flight
+        if max_in_flight > 1:
+            self.client = PipelinedModbusTcpClient(
+                host, port, timeout=MODBUS_RESPONSE_TIMEOUT, max_in_flight=max_in_flight
+            )
+        else:
+            self.client = PymodbusTcpClient(host, port, timeout=MODBUS_RESPONSE_TIMEOUT)
+        self.connection = ModbusConnectionManager(self.client)
+        self.scheduler = IoScheduler(max_in_flight)
+        self.users = 0
+
+    def close(self) -> None:
+        """Close the connection to the gateway."""
+        self.connection.close()
+
+
+class ModbusGatewayPool:
+    """Hand out shared gateways and spread the poll phases of their devices."""
+
+    def __init__(self) -> None:
+        """Initialize the pool."""
+        self._gateways: dict[tuple[str, int], ModbusGateway] = {}
+        self._phase = 0.0
+
+    def acquire(self, host: str, port: int, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT) -> ModbusGateway:
+        """Return the gateway for host and port, creating it on first use.
+
+        The in-flight window of the first device to acquire a gateway applies to it
+        until every device has released it.
+        """
+        key = (host, port)
+        if (gateway := self._gateways.get(key)) is None:
+            gateway = self._gateways[key] = ModbusGateway(host, port, max_in_flight)
+        elif gateway.max_in_flight != max_in_flight:
+            _LOGGER.debug("Gateway %s:%s keeps its window of %s requests in flight", host, port, gateway.max_in_flight)
+        gateway.users += 1
+        return gateway
+
+    def release(self, gateway: ModbusGateway) -> None:
+        """Drop a device from its gateway and close the gateway once unused."""
+        gateway.users -= 1
+        if gateway.users > 0:
+            return
+        self._gateways.pop((gateway.host, gateway.port), None)
+        gateway.close()
+
+    def next_poll_phase(self, interval: float) -> float:
+        """Return the delay, within one poll interval, at which the next device should poll."""
+        phase = self._phase
+        self._phase = (self._phase + _PHASE_STEP) % 1
+        return phase * interval
+
+
+@callback
+def async_get_gateway_pool(hass: HomeAssistant) -> ModbusGatewayPool:
+    """Return the gateway pool shared by all config entries."""
+    return hass.data.setdefault(DATA_GATEWAY_POOL, ModbusGatewayPool())
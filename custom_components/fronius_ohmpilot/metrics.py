@@ -0,0 +1,172 @@
+"""Latency, error and traffic instrumentation for Ohmpilot I/O operations."""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+import time
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .scheduler import IoRequest
+
+# Upper bucket bounds in seconds, roughly logarithmic from LAN round trips to timeouts
+LATENCY_BUCKETS: tuple[float, ...] = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0)
+_BUCKET_LABELS = (*(f"le_{bound * 1000:g}" for bound in LATENCY_BUCKETS), "inf")
+
+# Modbus TCP application header (MBAP) in front of every PDU
+MBAP_HEADER_SIZE = 7
+
+
+def modbus_read_size(count: int) -> int:
+    """Return the response frame size of a holding register read."""
+    return MBAP_HEADER_SIZE + 2 + 2 * count
+
+
+def modbus_write_size(count: int) -> int:
+    """Return the request frame size of a multiple register write."""
+    return MBAP_HEADER_SIZE + 6 + 2 * count
+
+
+# Request of a read, and response of a write: function code, address and count
+MODBUS_SHORT_FRAME_SIZE = MBAP_HEADER_SIZE + 5
+
+
+class LatencyHistogram:
+    """Fixed-bucket histogram of durations in seconds."""
+
+    __slots__ = ("buckets", "count", "last", "max", "total")
+
+    def __init__(self) -> None:
+        """Initialize an empty histogram."""
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last: float | None = None
+
+    def record(self, seconds: float) -> None:
+        """Add one duration."""
+        self.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.last = seconds
+
+    def percentile(self, fraction: float) -> float | None:
+        """Return the upper bound of the bucket holding the given fraction of samples."""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for bound, hits in zip(LATENCY_BUCKETS, self.buckets, strict=False):
+            seen += hits
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the histogram with durations in milliseconds."""
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 2) if self.count else None,
+            "p50_ms": round(p50 * 1000, 2) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 2) if p95 is not None else None,
+            "max_ms": round(self.max * 1000, 2),
+            "last_ms": round(self.last * 1000, 2) if self.last is not None else None,
+            "buckets_ms": dict(zip(_BUCKET_LABELS, self.buckets, strict=True)),
+        }
+
+
+class OperationMetrics:
+    """Counters for one kind of operation, such as a poll or a power limit write."""
+
+    __slots__ = ("bytes_received", "bytes_sent", "calls", "errors", "latency", "lock_wait", "timeouts")
+
+    def __init__(self) -> None:
+        """Initialize the counters."""
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.latency = LatencyHistogram()
+        self.lock_wait = LatencyHistogram()
+
+    def record_error(self, err: BaseException | None = None) -> None:
+        """Count a failed operation, separating out requests that timed out."""
+        self.errors += 1
+        # Both Modbus clients report a request without a response as a TimeoutError
+        if isinstance(err, TimeoutError):
+            self.timeouts += 1
+
+    def record_traffic(self, sent: int, received: int) -> None:
+        """Count bytes written to and read from the wire."""
+        self.bytes_sent += sent
+        self.bytes_received += received
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the counters and histograms."""
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "latency": self.latency.as_dict(),
+            "lock_wait": self.lock_wait.as_dict(),
+        }
+
+
+class ApiMetrics:
+    """Instrumentation of every operation an API client performs."""
+
+    def __init__(self) -> None:
+        """Initialize the metrics."""
+        self.operations: dict[str, OperationMetrics] = {}
+
+    def operation(self, name: str) -> OperationMetrics:
+        """Return the metrics of an operation, creating them on first use."""
+        if (metrics := self.operations.get(name)) is None:
+            metrics = self.operations[name] = OperationMetrics()
+        return metrics
+
+    @asynccontextmanager
+    async def async_track(self, name: str, request: IoRequest | None = None) -> AsyncIterator[OperationMetrics]:
+        """Time an operation, and the wait for the scheduler slot it runs in if one is given.
+
+        Exceptions leaving the block, and a request that expired before it got a
+        slot, are counted as errors. Failures the caller handles itself are
+        reported with record_error.
+        """
+        metrics = self.operation(name)
+        metrics.calls += 1
+        start = time.perf_counter()
+        if request is not None:
+            try:
+                await request.acquire()
+            except Exception as err:
+                metrics.record_error(err)
+                raise
+        acquired = time.perf_counter()
+        metrics.lock_wait.record(acquired - start)
+        try:
+            yield metrics
+        except Exception as err:
+            metrics.record_error(err)
+            raise
+        finally:
+            metrics.latency.record(time.perf_counter() - acquired)
+            if request is not None:
+                request.release()
+
+    @property
+    def errors(self) -> int:
+        """Return the failed operations of all kinds."""
+        return sum(metrics.errors for metrics in self.operations.values())
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the metrics of all operations."""
+        return {name: metrics.as_dict() for name, metrics in self.operations.items()}
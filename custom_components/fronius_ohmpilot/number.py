@@ -18,7 +18,7 @@ async def async_setup_entry(
     data = hass.data[DOMAIN][entry.entry_id]
     coordinator: FroniusOhmpilotDataUpdateCoordinator = data["coordinator"]
 
-    power_entity = OhmpilotMaxPowerNumber(coordinator, entry)
+    power_entity = OhmpilotMaxPowerNumber(coordinator, entry, controlled=data["controller"] is not None)
     hass.data[DOMAIN][entry.entry_id]["power_number"] = power_entity
 
     async_add_entities([power_entity, OhmpilotMaxTempNumber(coordinator, entry)])
@@ -44,7 +44,11 @@ async def async_added_to_hass(self) -> None:
 
 
 class OhmpilotMaxPowerNumber(OhmpilotBaseNumber):
-    """Representation of the Maximum Power setting."""
+    """Representation of the Maximum Power setting.
+
+    The number is unavailable while the PV surplus controller sets the power limit,
+    so a value set here cannot be overridden by the controller a second later.
+    """
 
     _attr_name = "Output Power"
     _attr_icon = "mdi:lightning-bolt"
@@ -53,16 +57,20 @@ class OhmpilotMaxPowerNumber(OhmpilotBaseNumber):
     _attr_native_min_value = 0
     _attr_native_step = 100
 
-    def __init__(self, coordinator: FroniusOhmpilotDataUpdateCoordinator, entry: ConfigEntry) -> None:
+    def __init__(
+        self, coordinator: FroniusOhmpilotDataUpdateCoordinator, entry: ConfigEntry, *, controlled: bool = False
+    ) -> None:
         """Initialize with configurable max power."""
         super().__init__(coordinator, entry)
         serial = coordinator.serial_number or entry.entry_id
         self._attr_unique_id = f"{serial}_output_power"
+        self._attr_available = not controlled
         self._attr_native_max_value = float(entry.data.get(CONFIG_KEY_HEATER1_MAX_POWER, DEFAULT_HEATER1_MAX_POWER))
 
     async def async_set_native_value(self, value: float) -> None:
         """Update the current value."""
-        await self._coordinator.api.async_set_power_limit(int(value))
+        await self._coordinator.power_writer.async_write(int(value))
+        self._coordinator.async_notify_command()
         self._attr_native_value = value
         self.async_write_ha_state()
 
@@ -87,5 +95,6 @@ def __init__(self, coordinator: FroniusOhmpilotDataUpdateCoordinator, entry: Con
     async def async_set_native_value(self, value: float) -> None:
         """Update the current value."""
         await self._coordinator.api.async_set_target_temperature(int(value))
+        self._coordinator.async_notify_command()
         self._attr_native_value = value
         self.async_write_ha_state()
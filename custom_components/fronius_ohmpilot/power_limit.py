@@ -0,0 +1,108 @@
+"""Write-on-change scheduling of the Ohmpilot power limit."""
+
+from __future__ import annotations
+
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+import logging
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .api import FroniusOhmpilotApiClient
+
+_LOGGER = logging.getLogger(__package__)
+
+
+class PowerLimitWriter:
+    """Skip power limit writes the device has already acknowledged.
+
+    The value is still rewritten once the keep-alive interval has passed, so the
+    Ohmpilot never falls back to its own timeout while a limit is active.
+
+    A limit can be held for a while, as a burst capture does for its power step.
+    Unforced writes made meanwhile, by the power loop or the surplus controller,
+    only keep the held limit alive.
+    """
+
+    def __init__(
+        self,
+        api: FroniusOhmpilotApiClient,
+        keepalive: float,
+        on_applied: Callable[[int], None] | None = None,
+    ) -> None:
+        """Initialize the writer."""
+        self.api = api
+        self.keepalive = keepalive
+        self.sent = 0
+        self.skipped = 0
+        self.failed = 0
+        self.held_back = 0
+        self.applied: int | None = None
+        self._on_applied = on_applied
+        self._acknowledged: int | None = None
+        self._acknowledged_at = 0.0
+        self._held: int | None = None
+
+    @property
+    def acknowledged(self) -> int | None:
+        """Return the last power limit the device accepted."""
+        return self._acknowledged
+
+    @property
+    def held(self) -> bool:
+        """Return True while a limit is held."""
+        return self._held is not None
+
+    @asynccontextmanager
+    async def async_hold(self, power: int) -> AsyncIterator[bool]:
+        """Write power and hold it until the context exits, then restore the previous limit.
+
+        The context value tells whether the device accepted the limit. The previous
+        limit is not restored if a forced write replaced the held one meanwhile.
+        """
+        previous = self._acknowledged
+        self._held = power
+        try:
+            yield await self.async_write(power, force=True)
+        finally:
+            self._held = None
+            if previous is not None and self._acknowledged == power:
+                await self.async_write(previous, force=True)
+
+    async def async_write(self, power: int, force: bool = False) -> bool:
+        """Write the power limit unless it is unchanged and still fresh."""
+        if self._held is not None and not force and power != self._held:
+            self.held_back += 1
+            power = self._held
+        now = time.monotonic()
+        if not force and power == self._acknowledged and now - self._acknowledged_at < self.keepalive:
+            self.skipped += 1
+            return False
+
+        applied = await self.api.async_set_power_limit(power)
+        if applied is None:
+            self.failed += 1
+            self._acknowledged = None
+            return False
+
+        self.sent += 1
+        self._acknowledged = power
+        self._acknowledged_at = now
+        if applied != power:
+            _LOGGER.debug("Ohmpilot applied %s W for a requested limit of %s W", applied, power)
+        self.applied = applied
+        if self._on_applied is not None:
+            self._on_applied(applied)
+        return True
+
+    def as_dict(self) -> dict[str, int | None]:
+        """Return write counters."""
+        return {
+            "acknowledged": self._acknowledged,
+            "applied": self.applied,
+            "sent": self.sent,
+            "skipped": self.skipped,
+            "held_back": self.held_back,
+            "failed": self.failed,
+        }
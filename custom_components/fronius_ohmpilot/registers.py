@@ -0,0 +1,189 @@
+"""Declarative Modbus register map and block read planning for the Fronius Ohmpilot.
+
+Every value the integration reads is described once as a RegisterField. Fields are
+merged into as few read requests as possible, and each resulting block compiles
+its fields into struct formats once, so decoding a response is a single
+unpack_from over the raw register bytes.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from enum import StrEnum
+from struct import Struct, calcsize
+from typing import Any
+
+# Largest number of holding registers a single Modbus read request may return.
+MAX_READ_COUNT = 125
+
+# Unused registers tolerated between two fields before a new read is started.
+# Reading a few extra words is far cheaper than another round trip.
+MAX_READ_GAP = 8
+
+BIG_ENDIAN = ">"
+LITTLE_ENDIAN = "<"
+
+
+class RegisterType(StrEnum):
+    """Value types stored in holding registers, as struct format characters."""
+
+    UINT16 = "H"
+    INT16 = "h"
+    UINT32 = "I"
+    INT32 = "i"
+    UINT64 = "Q"
+    INT64 = "q"
+    STRING = "s"
+
+
+@dataclass(frozen=True, slots=True)
+class RegisterField:
+    """A value stored in consecutive holding registers.
+
+    length is only used for strings and gives their size in registers. scale is a
+    power of ten applied after decoding, so -1 turns tenths of a degree into degrees.
+    """
+
+    key: str
+    address: int
+    type: RegisterType = RegisterType.UINT16
+    length: int = 1
+    scale: int = 0
+    byteorder: str = BIG_ENDIAN
+
+    @property
+    def format(self) -> str:
+        """Return the struct format of the field without byte order."""
+        if self.type is RegisterType.STRING:
+            return f"{self.length * 2}s"
+        return self.type.value
+
+    @property
+    def count(self) -> int:
+        """Return the number of registers the field occupies."""
+        return calcsize(f"={self.format}") // 2
+
+    @property
+    def end(self) -> int:
+        """Return the address following the last register of the field."""
+        return self.address + self.count
+
+
+class ReadBlock:
+    """A single read request covering one or more register fields."""
+
+    __slots__ = ("_raw", "_scaled", "_strings", "_structs", "address", "count", "fields", "keys")
+
+    def __init__(self, address: int, count: int, fields: tuple[RegisterField, ...]) -> None:
+        """Initialize the block and compile its decoders."""
+        self.address = address
+        self.count = count
+        self.fields = fields
+        self.keys = tuple(field.key for field in fields)
+        self._raw = Struct(f">{count}H")
+        self._structs = tuple(self._compile(order) for order in sorted({field.byteorder for field in fields}))
+        self._strings = tuple(field.key for field in fields if field.type is RegisterType.STRING)
+        self._scaled = tuple((field.key, 10 ** abs(field.scale), field.scale < 0) for field in fields if field.scale)
+
+    def _compile(self, byteorder: str) -> tuple[Struct, tuple[str, ...]]:
+        """Build one struct covering every field of a byte order, skipping all other registers."""
+        parts = [byteorder]
+        keys: list[str] = []
+        position = self.address
+        for field in self.fields:
+            if field.byteorder != byteorder:
+                continue
+            if field.address < position:
+                raise ValueError(f"Register field {field.key} overlaps another field")
+            if field.address > position:
+                parts.append(f"{(field.address - position) * 2}x")
+            parts.append(field.format)
+            keys.append(field.key)
+            position = field.end
+        return Struct("".join(parts)), tuple(keys)
+
+    def decode(self, registers: Sequence[int]) -> dict[str, Any]:
+        """Decode all fields of the block from the registers it returned."""
+        view = memoryview(self._raw.pack(*registers))
+        data: dict[str, Any] = {}
+        for decoder, keys in self._structs:
+            data.update(zip(keys, decoder.unpack_from(view), strict=True))
+        for key in self._strings:
+            data[key] = data[key].rstrip(b"\x00").decode("ascii", errors="ignore").strip()
+        for key, factor, divide in self._scaled:
+            data[key] = data[key] / factor if divide else data[key] * factor
+        return data
+
+    def encode(self, values: dict[str, Any]) -> list[int]:
+        """Encode field values into the register words to write, zero-filling any gaps."""
+        if self._scaled:
+            values = dict(values)
+            for key, factor, divide in self._scaled:
+                values[key] = round(values[key] * factor) if divide else values[key] // factor
+        raw = bytearray(self.count * 2)
+        for encoder, keys in self._structs:
+            packed = encoder.pack(*(values[key] for key in keys))
+            for index, byte in enumerate(packed):
+                raw[index] |= byte
+        return list(self._raw.unpack(raw))
+
+    def __repr__(self) -> str:
+        """Return a readable representation of the block."""
+        return f"ReadBlock(address={self.address}, count={self.count}, keys={self.keys})"
+
+
+def plan_reads(
+    fields: Iterable[RegisterField],
+    max_gap: int = MAX_READ_GAP,
+    max_count: int = MAX_READ_COUNT,
+) -> tuple[ReadBlock, ...]:
+    """Merge adjacent and nearby register fields into the fewest read requests."""
+    blocks: list[ReadBlock] = []
+    start = end = 0
+    members: list[RegisterField] = []
+
+    for field in sorted(fields, key=lambda f: f.address):
+        if members and field.address - end <= max_gap and max(end, field.end) - start <= max_count:
+            members.append(field)
+            end = max(end, field.end)
+            continue
+        if members:
+            blocks.append(ReadBlock(start, end - start, tuple(members)))
+        start, end, members = field.address, field.end, [field]
+
+    if members:
+        blocks.append(ReadBlock(start, end - start, tuple(members)))
+    return tuple(blocks)
+
+
+POLL_FIELDS: tuple[RegisterField, ...] = (
+    RegisterField("status", 40799),
+    RegisterField("power", 40800, RegisterType.UINT32),
+    RegisterField("energy", 40804, RegisterType.UINT64),
+    RegisterField("temperature", 40808, scale=-1),
+)
+
+POLL_BLOCKS = plan_reads(POLL_FIELDS)
+
+# Status and power only, for burst captures of the power ramp
+(BURST_BLOCK,) = plan_reads(POLL_FIELDS[:2])
+
+SET_POWER_FIELD = RegisterField("set_power", 40599, RegisterType.UINT32)
+(SET_POWER_BLOCK,) = plan_reads((SET_POWER_FIELD,))
+
+TIME_FIELDS: tuple[RegisterField, ...] = (
+    RegisterField("time", 40399, RegisterType.UINT64),
+    RegisterField("utc_offset", 40403, RegisterType.INT16),
+)
+
+(TIME_BLOCK,) = plan_reads(TIME_FIELDS)
+
+IDENTITY_FIELDS: tuple[RegisterField, ...] = (
+    RegisterField("manufacturer", 40004, RegisterType.STRING, 5),
+    RegisterField("model", 40009, RegisterType.STRING, 14),
+    RegisterField("serial_number", 40023, RegisterType.STRING, 16),
+    RegisterField("firmware_version", 40041, RegisterType.STRING, 8),
+)
+
+IDENTITY_BLOCKS = plan_reads(IDENTITY_FIELDS)
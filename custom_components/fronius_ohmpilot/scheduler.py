@@ -0,0 +1,150 @@
+"""Priority scheduling of Modbus requests on a shared gateway connection."""
+
+from __future__ import annotations
+
+import asyncio
+from enum import IntEnum
+import heapq
+import itertools
+import time
+from typing import Any, Self
+
+
+class IoPriority(IntEnum):
+    """Request classes, most urgent first."""
+
+    CONTROL = 0
+    TIME_SYNC = 1
+    POLL = 2
+    DIAGNOSTIC = 3
+
+
+class RequestExpired(TimeoutError):
+    """A request passed its deadline while waiting for the connection and was dropped."""
+
+
+class IoScheduler:
+    """Hand out request slots on a connection by priority instead of arrival order.
+
+    A waiting request with a deadline is dropped once the deadline passes, so a
+    read that would only return stale data does not keep its place in the queue.
+    A request made of several PDUs can call IoRequest.async_yield between them to
+    let a more urgent request go first, which bounds the wait of a power limit
+    write to a single PDU round trip.
+    """
+
+    def __init__(self, slots: int) -> None:
+        """Initialize the scheduler with the number of requests allowed in flight."""
+        self._free = slots
+        self._waiters: list[tuple[int, int, asyncio.Future[None]]] = []
+        self._sequence = itertools.count()
+        self.granted = dict.fromkeys(IoPriority, 0)
+        self.expired = dict.fromkeys(IoPriority, 0)
+        self.preempted = dict.fromkeys(IoPriority, 0)
+
+    def request(self, priority: IoPriority, timeout: float | None = None) -> IoRequest:
+        """Return a request of the given class that is dropped if not started within timeout seconds."""
+        return IoRequest(self, priority, None if timeout is None else time.monotonic() + timeout)
+
+    @property
+    def waiting(self) -> int:
+        """Return the number of requests waiting for a slot."""
+        return sum(1 for *_, future in self._waiters if not future.done())
+
+    def _first_waiter(self) -> tuple[int, int, asyncio.Future[None]] | None:
+        """Return the most urgent live waiter, discarding abandoned ones."""
+        waiters = self._waiters
+        while waiters and waiters[0][2].done():
+            heapq.heappop(waiters)
+        return waiters[0] if waiters else None
+
+    def has_waiter_before(self, priority: IoPriority) -> bool:
+        """Return True if a request more urgent than priority is waiting."""
+        first = self._first_waiter()
+        return first is not None and first[0] < priority
+
+    async def _async_acquire(self, priority: IoPriority, deadline: float | None) -> None:
+        if self._free > 0 and self._first_waiter() is None:
+            self._free -= 1
+            self.granted[priority] += 1
+            return
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        try:
+            async with asyncio.timeout(None if deadline is None else deadline - time.monotonic()):
+                await future
+        except (TimeoutError, asyncio.CancelledError) as err:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just as the waiter gave up
+                self._release()
+            if not isinstance(err, TimeoutError):
+                raise
+            self.expired[priority] += 1
+            raise RequestExpired(f"{priority.name} request expired while waiting for the connection") from None
+        self.granted[priority] += 1
+
+    def _release(self) -> None:
+        if (first := self._first_waiter()) is not None:
+            heapq.heappop(self._waiters)
+            first[2].set_result(None)
+            return
+        self._free += 1
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the scheduling counters per request class."""
+        return {
+            "waiting": self.waiting,
+            **{
+                priority.name.lower(): {
+                    "granted": self.granted[priority],
+                    "expired": self.expired[priority],
+                    "preempted": self.preempted[priority],
+                }
+                for priority in IoPriority
+            },
+        }
+
+
+class IoRequest:
+    """One request's claim on a scheduler slot, usable like a lock."""
+
+    __slots__ = ("deadline", "held", "priority", "scheduler")
+
+    def __init__(self, scheduler: IoScheduler, priority: IoPriority, deadline: float | None) -> None:
+        """Initialize the request."""
+        self.scheduler = scheduler
+        self.priority = priority
+        self.deadline = deadline
+        self.held = False
+
+    async def acquire(self) -> None:
+        """Wait for a slot, raising RequestExpired if the deadline passes first."""
+        await self.scheduler._async_acquire(self.priority, self.deadline)  # noqa: SLF001
+        self.held = True
+
+    def release(self) -> None:
+        """Give the slot, if held, to the most urgent waiting request."""
+        if self.held:
+            self.held = False
+            self.scheduler._release()  # noqa: SLF001
+
+    async def async_yield(self) -> None:
+        """Let more urgent waiting requests go first, then take the slot back.
+
+        The deadline no longer applies, since the request has already started.
+        """
+        if not self.scheduler.has_waiter_before(self.priority):
+            return
+        self.scheduler.preempted[self.priority] += 1
+        self.release()
+        await self.scheduler._async_acquire(self.priority, None)  # noqa: SLF001
+        self.held = True
+
+    async def __aenter__(self) -> Self:
+        """Acquire a slot."""
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        """Release the slot."""
+        self.release()
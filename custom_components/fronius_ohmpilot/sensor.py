@@ -1,13 +1,25 @@
 """Sensor platform for Fronius Ohmpilot."""
 
-from homeassistant.components.sensor import SensorDeviceClass, SensorEntity, SensorStateClass
+from homeassistant.components.sensor import RestoreSensor, SensorDeviceClass, SensorEntity, SensorStateClass
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.const import PERCENTAGE, EntityCategory, UnitOfTime
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
-from .const import DOMAIN
+from .const import (
+    CONFIG_KEY_ENERGY_THRESHOLD,
+    CONFIG_KEY_POWER_THRESHOLD,
+    CONFIG_KEY_TEMPERATURE_THRESHOLD,
+    DEFAULT_ENERGY_THRESHOLD,
+    DEFAULT_POWER_THRESHOLD,
+    DEFAULT_TEMPERATURE_THRESHOLD,
+    DOMAIN,
+    PRECISE_ENERGY_THRESHOLD,
+)
+from .controller import SurplusController
 from .coordinator import FroniusOhmpilotDataUpdateCoordinator
+from .metrics import LatencyHistogram
 
 
 async def async_setup_entry(
@@ -17,33 +29,108 @@ async def async_setup_entry(
 ) -> None:
     """Set up the sensor platform."""
     coordinator: FroniusOhmpilotDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id]["coordinator"]
+    controller: SurplusController | None = hass.data[DOMAIN][entry.entry_id].get("controller")
+
+    if controller is not None:
+        async_add_entities(
+            [
+                OhmpilotTimeToMaxTemperatureSensor(coordinator, entry, controller),
+                OhmpilotPvShareSensor(coordinator, entry),
+            ]
+        )
 
     async_add_entities(
         [
             OhmpilotTemperatureSensor(coordinator, entry),
             OhmpilotPowerSensor(coordinator, entry),
             OhmpilotEnergySensor(coordinator, entry),
+            OhmpilotEnergyTotalSensor(coordinator, entry),
             OhmpilotStatusSensor(coordinator, entry),
+            OhmpilotAppliedPowerLimitSensor(coordinator, entry),
+            OhmpilotLatencySensor(coordinator, entry, "Poll Latency", "poll", "latency"),
+            OhmpilotLatencySensor(coordinator, entry, "Power Write Latency", "set_power", "latency"),
+            OhmpilotLatencySensor(coordinator, entry, "Power Write Lock Wait", "set_power", "lock_wait"),
+            OhmpilotErrorCountSensor(coordinator, entry),
+            OhmpilotDailyEnergySensor(coordinator, entry),
+            OhmpilotDutyCycleSensor(coordinator, entry),
+            OhmpilotTemperatureRiseSensor(coordinator, entry),
         ]
     )
 
 
 class OhmpilotBaseSensor(CoordinatorEntity[FroniusOhmpilotDataUpdateCoordinator], SensorEntity):
-    """Base class for Ohmpilot sensors."""
+    """Base class for Ohmpilot sensors.
+
+    A new value is only written to the state machine when it differs from the last
+    written one by at least the sensor's significance threshold. None writes every
+    change. Changes to or from zero and availability changes are always written.
+    """
 
     _attr_has_entity_name = True
+    _significance: float | None = None
 
     def __init__(self, coordinator: FroniusOhmpilotDataUpdateCoordinator, entry: ConfigEntry):
         """Initialize the sensor."""
         super().__init__(coordinator)
         self._entry = entry
         self._attr_device_info = coordinator.device_info
+        self._written_value = None
+        self._written_available: bool | None = None
+
+    def _is_significant(self, value) -> bool:
+        """Return True if value should replace the last written value."""
+        previous = self._written_value
+        if value == previous:
+            return False
+        if self._significance is None or value is None or previous is None or value == 0 or previous == 0:
+            return True
+        return abs(value - previous) >= self._significance
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write the state only if the value moved significantly or availability changed."""
+        value = self.native_value
+        available = self.available
+        if available == self._written_available and not self._is_significant(value):
+            return
+        self._written_value = value
+        self._written_available = available
+        self.async_write_ha_state()
+
+
+class OhmpilotPolledSensor(OhmpilotBaseSensor, RestoreSensor):
+    """A sensor showing one value of the coordinator data.
+
+    Until the first poll after startup has completed, the sensor shows its
+    state from before the restart, so setup does not have to wait for the device.
+    """
+
+    _key: str
+
+    def __init__(self, coordinator: FroniusOhmpilotDataUpdateCoordinator, entry: ConfigEntry):
+        """Initialize the sensor."""
+        super().__init__(coordinator, entry)
+        self._restored_value = None
+
+    async def async_added_to_hass(self) -> None:
+        """Restore the last known value while no poll has completed yet."""
+        await super().async_added_to_hass()
+        if self.coordinator.data is None and (last_data := await self.async_get_last_sensor_data()) is not None:
+            self._restored_value = last_data.native_value
+
+    @property
+    def native_value(self):
+        """Return the state of the sensor."""
+        if self.coordinator.data is None:
+            return self._restored_value
+        return self.coordinator.data.get(self._key)
 
 
-class OhmpilotTemperatureSensor(OhmpilotBaseSensor):
+class OhmpilotTemperatureSensor(OhmpilotPolledSensor):
     """Representation of the Ohmpilot Temperature sensor."""
 
     _attr_name = "Temperature"
+    _key = "temperature"
     _attr_device_class = SensorDeviceClass.TEMPERATURE
     _attr_state_class = SensorStateClass.MEASUREMENT
     _attr_native_unit_of_measurement = "°C"
@@ -54,17 +141,14 @@ def __init__(self, coordinator: FroniusOhmpilotDataUpdateCoordinator, entry: Con
         super().__init__(coordinator, entry)
         serial = coordinator.serial_number or entry.entry_id
         self._attr_unique_id = f"{serial}_temperature"
-
-    @property
-    def native_value(self):
-        """Return the state of the sensor."""
-        return self.coordinator.data.get("temperature")
+        self._significance = entry.data.get(CONFIG_KEY_TEMPERATURE_THRESHOLD, DEFAULT_TEMPERATURE_THRESHOLD)
 
 
-class OhmpilotPowerSensor(OhmpilotBaseSensor):
+class OhmpilotPowerSensor(OhmpilotPolledSensor):
     """Representation of the Ohmpilot Power sensor."""
 
     _attr_name = "Power"
+    _key = "power"
     _attr_device_class = SensorDeviceClass.POWER
     _attr_state_class = SensorStateClass.MEASUREMENT
     _attr_native_unit_of_measurement = "W"
@@ -75,17 +159,14 @@ def __init__(self, coordinator: FroniusOhmpilotDataUpdateCoordinator, entry: Con
         super().__init__(coordinator, entry)
         serial = coordinator.serial_number or entry.entry_id
         self._attr_unique_id = f"{serial}_power"
-
-    @property
-    def native_value(self):
-        """Return the state of the sensor."""
-        return self.coordinator.data.get("power")
+        self._significance = entry.data.get(CONFIG_KEY_POWER_THRESHOLD, DEFAULT_POWER_THRESHOLD)
 
 
-class OhmpilotEnergySensor(OhmpilotBaseSensor):
+class OhmpilotEnergySensor(OhmpilotPolledSensor):
     """Representation of the Ohmpilot Energy sensor."""
 
     _attr_name = "Energy Consumed"
+    _key = "energy"
     _attr_device_class = SensorDeviceClass.ENERGY
     _attr_state_class = SensorStateClass.TOTAL_INCREASING
     _attr_native_unit_of_measurement = "Wh"
@@ -96,17 +177,33 @@ def __init__(self, coordinator: FroniusOhmpilotDataUpdateCoordinator, entry: Con
         super().__init__(coordinator, entry)
         serial = coordinator.serial_number or entry.entry_id
         self._attr_unique_id = f"{serial}_energy_consumed"
+        self._significance = entry.data.get(CONFIG_KEY_ENERGY_THRESHOLD, DEFAULT_ENERGY_THRESHOLD)
 
-    @property
-    def native_value(self):
-        """Return the state of the sensor."""
-        return self.coordinator.data.get("energy")
 
+class OhmpilotEnergyTotalSensor(OhmpilotPolledSensor):
+    """Energy counter refined with the integrated power readings, to a fraction of a Wh."""
 
-class OhmpilotStatusSensor(OhmpilotBaseSensor):
+    _attr_name = "Energy Consumed Precise"
+    _key = "energy_total"
+    _attr_device_class = SensorDeviceClass.ENERGY
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _attr_native_unit_of_measurement = "Wh"
+    _attr_suggested_display_precision = 2
+    _attr_icon = "mdi:flash"
+
+    def __init__(self, coordinator: FroniusOhmpilotDataUpdateCoordinator, entry: ConfigEntry) -> None:
+        """Initialize."""
+        super().__init__(coordinator, entry)
+        serial = coordinator.serial_number or entry.entry_id
+        self._attr_unique_id = f"{serial}_energy_consumed_precise"
+        self._significance = PRECISE_ENERGY_THRESHOLD
+
+
+class OhmpilotStatusSensor(OhmpilotPolledSensor):
     """Representation of the Ohmpilot Status Code sensor."""
 
     _attr_name = "State Code"
+    _key = "status"
     _attr_icon = "mdi:information-outline"
 
     def __init__(self, coordinator: FroniusOhmpilotDataUpdateCoordinator, entry: ConfigEntry) -> None:
@@ -115,7 +212,183 @@ def __init__(self, coordinator: FroniusOhmpilotDataUpdateCoordinator, entry: Con
         serial = coordinator.serial_number or entry.entry_id
         self._attr_unique_id = f"{serial}_state_code"
 
+
+class OhmpilotAppliedPowerLimitSensor(OhmpilotPolledSensor):
+    """Representation of the power limit the Ohmpilot confirmed on the last write."""
+
+    _attr_name = "Applied Power Limit"
+    _key = "set_power"
+    _attr_device_class = SensorDeviceClass.POWER
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = "W"
+    _attr_icon = "mdi:lightning-bolt-outline"
+
+    def __init__(self, coordinator: FroniusOhmpilotDataUpdateCoordinator, entry: ConfigEntry) -> None:
+        """Initialize."""
+        super().__init__(coordinator, entry)
+        serial = coordinator.serial_number or entry.entry_id
+        self._attr_unique_id = f"{serial}_applied_power_limit"
+        self._significance = entry.data.get(CONFIG_KEY_POWER_THRESHOLD, DEFAULT_POWER_THRESHOLD)
+
+
+class OhmpilotLatencySensor(OhmpilotBaseSensor):
+    """Duration of the most recent call of an API operation, or of its wait for the Modbus lock."""
+
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = UnitOfTime.MILLISECONDS
+    _attr_suggested_display_precision = 1
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+    _attr_icon = "mdi:timer-outline"
+
+    def __init__(
+        self,
+        coordinator: FroniusOhmpilotDataUpdateCoordinator,
+        entry: ConfigEntry,
+        name: str,
+        operation: str,
+        histogram: str,
+    ) -> None:
+        """Initialize."""
+        super().__init__(coordinator, entry)
+        self._attr_name = name
+        self._operation = operation
+        self._histogram = histogram
+        serial = coordinator.serial_number or entry.entry_id
+        self._attr_unique_id = f"{serial}_{operation}_{histogram}"
+
     @property
     def native_value(self):
         """Return the state of the sensor."""
-        return self.coordinator.data.get("status")
+        histogram: LatencyHistogram = getattr(self.coordinator.api.metrics.operation(self._operation), self._histogram)
+        return histogram.last * 1000 if histogram.last is not None else None
+
+
+class OhmpilotErrorCountSensor(OhmpilotBaseSensor):
+    """Number of failed Modbus and HTTP operations since the integration was loaded."""
+
+    _attr_name = "Communication Errors"
+    _attr_state_class = SensorStateClass.TOTAL_INCREASING
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
+    _attr_icon = "mdi:alert-circle-outline"
+
+    def __init__(self, coordinator: FroniusOhmpilotDataUpdateCoordinator, entry: ConfigEntry) -> None:
+        """Initialize."""
+        super().__init__(coordinator, entry)
+        serial = coordinator.serial_number or entry.entry_id
+        self._attr_unique_id = f"{serial}_communication_errors"
+
+    @property
+    def native_value(self):
+        """Return the state of the sensor."""
+        return self.coordinator.api.metrics.errors
+
+
+class OhmpilotTimeToMaxTemperatureSensor(OhmpilotBaseSensor):
+    """Time until the boiler reaches the controller's maximum temperature, predicted by the thermal model."""
+
+    _attr_name = "Time to Maximum Temperature"
+    _significance = 1
+    _attr_device_class = SensorDeviceClass.DURATION
+    _attr_native_unit_of_measurement = UnitOfTime.MINUTES
+    _attr_suggested_display_precision = 0
+    _attr_icon = "mdi:timer-sand"
+
+    def __init__(
+        self,
+        coordinator: FroniusOhmpilotDataUpdateCoordinator,
+        entry: ConfigEntry,
+        controller: SurplusController,
+    ) -> None:
+        """Initialize."""
+        super().__init__(coordinator, entry)
+        self._controller = controller
+        serial = coordinator.serial_number or entry.entry_id
+        self._attr_unique_id = f"{serial}_time_to_max_temperature"
+
+    @property
+    def native_value(self):
+        """Return the state of the sensor."""
+        seconds = self._controller.time_to_max_temperature()
+        return seconds / 60 if seconds is not None else None
+
+
+class OhmpilotStatisticsSensor(OhmpilotBaseSensor):
+    """A rolling statistic over the last day, with the last hour and last 30 days as attributes."""
+
+    _statistic: str
+    _window = "last_day"
+
+    def __init__(self, coordinator: FroniusOhmpilotDataUpdateCoordinator, entry: ConfigEntry) -> None:
+        """Initialize."""
+        super().__init__(coordinator, entry)
+        serial = coordinator.serial_number or entry.entry_id
+        self._attr_unique_id = f"{serial}_{self._statistic}_{self._window}"
+
+    @property
+    def native_value(self):
+        """Return the state of the sensor."""
+        return self.coordinator.statistics.aggregates(self._window)[self._statistic]
+
+    @property
+    def extra_state_attributes(self):
+        """Return the statistic over the other windows."""
+        return {
+            window: self.coordinator.statistics.aggregates(window)[self._statistic]
+            for window in self.coordinator.statistics.windows
+            if window != self._window
+        }
+
+
+class OhmpilotDailyEnergySensor(OhmpilotStatisticsSensor):
+    """Heater energy over the last 24 hours."""
+
+    _attr_name = "Energy Last 24 Hours"
+    _attr_device_class = SensorDeviceClass.ENERGY
+    _attr_native_unit_of_measurement = "Wh"
+    _attr_suggested_display_precision = 0
+    _attr_icon = "mdi:water-boiler"
+    _statistic = "energy"
+
+    def __init__(self, coordinator: FroniusOhmpilotDataUpdateCoordinator, entry: ConfigEntry) -> None:
+        """Initialize."""
+        super().__init__(coordinator, entry)
+        self._significance = entry.data.get(CONFIG_KEY_ENERGY_THRESHOLD, DEFAULT_ENERGY_THRESHOLD)
+
+
+class OhmpilotDutyCycleSensor(OhmpilotStatisticsSensor):
+    """Share of the last 24 hours the heater was drawing power."""
+
+    _attr_name = "Duty Cycle Last 24 Hours"
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = PERCENTAGE
+    _attr_suggested_display_precision = 1
+    _attr_icon = "mdi:percent"
+    _significance = 0.5
+    _statistic = "duty_cycle"
+
+
+class OhmpilotTemperatureRiseSensor(OhmpilotStatisticsSensor):
+    """Boiler temperature rise per kWh heated over the last 24 hours."""
+
+    _attr_name = "Temperature Rise per kWh"
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = "°C/kWh"
+    _attr_suggested_display_precision = 2
+    _attr_icon = "mdi:thermometer-plus"
+    _significance = 0.05
+    _statistic = "temperature_rise_per_kwh"
+
+
+class OhmpilotPvShareSensor(OhmpilotStatisticsSensor):
+    """Share of the heater energy of the last 24 hours covered by PV surplus."""
+
+    _attr_name = "PV Share Last 24 Hours"
+    _attr_state_class = SensorStateClass.MEASUREMENT
+    _attr_native_unit_of_measurement = PERCENTAGE
+    _attr_suggested_display_precision = 0
+    _attr_icon = "mdi:solar-power"
+    _significance = 0.5
+    _statistic = "pv_share"
@@ -0,0 +1,62 @@
+"""Services of the Fronius Ohmpilot integration."""
+
+from __future__ import annotations
+
+import voluptuous as vol
+
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse, callback
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.helpers import config_validation as cv
+
+from .burst import async_capture_burst
+from .const import BURST_DEFAULT_DURATION, BURST_MAX_DURATION, DOMAIN
+
+SERVICE_CAPTURE_BURST = "capture_burst"
+
+ATTR_CONFIG_ENTRY_ID = "config_entry_id"
+ATTR_DURATION = "duration"
+ATTR_POWER = "power"
+
+CAPTURE_BURST_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_CONFIG_ENTRY_ID): cv.string,
+        vol.Optional(ATTR_DURATION, default=BURST_DEFAULT_DURATION): vol.All(
+            vol.Coerce(float), vol.Range(min=0.1, max=BURST_MAX_DURATION)
+        ),
+        vol.Optional(ATTR_POWER): vol.All(vol.Coerce(int), vol.Range(min=0)),
+    }
+)
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the integration's services."""
+
+    async def capture_burst(call: ServiceCall) -> ServiceResponse:
+        """Sample power and status at the highest rate the device sustains."""
+        entry_id = call.data[ATTR_CONFIG_ENTRY_ID]
+        if (entry_data := hass.data.get(DOMAIN, {}).get(entry_id)) is None:
+            raise ServiceValidationError(
+                translation_domain=DOMAIN,
+                translation_key="entry_not_loaded",
+                translation_placeholders={"entry_id": entry_id},
+            )
+        if entry_data.get("burst_running"):
+            raise ServiceValidationError(translation_domain=DOMAIN, translation_key="burst_running")
+
+        coordinator = entry_data["coordinator"]
+        entry_data["burst_running"] = True
+        try:
+            return await async_capture_burst(
+                entry_data["api"], coordinator.power_writer, call.data[ATTR_DURATION], call.data.get(ATTR_POWER)
+            )
+        finally:
+            entry_data["burst_running"] = False
+
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_CAPTURE_BURST,
+        capture_burst,
+        schema=CAPTURE_BURST_SCHEMA,
+        supports_response=SupportsResponse.ONLY,
+    )
@@ -0,0 +1,124 @@
+"""Rolling statistics over the Ohmpilot's own polled samples."""
+
+from __future__ import annotations
+
+from array import array
+from typing import Any
+
+from .const import STATISTICS_MAX_GAP, STATISTICS_WINDOWS
+
+# Sums kept per bucket, in this order within each bucket's slot of the array
+_FIELDS = ("duration", "on_time", "energy", "temperature_rise", "grid_known_energy", "pv_energy")
+_DURATION, _ON_TIME, _ENERGY, _TEMPERATURE_RISE, _GRID_KNOWN_ENERGY, _PV_ENERGY = range(len(_FIELDS))
+_WIDTH = len(_FIELDS)
+
+
+class RollingWindow:
+    """Fixed number of time buckets of per-field sums, kept in one flat array.
+
+    Adding a sample costs a few additions: the running window sums are updated
+    together with the current bucket, and a bucket falling out of the window is
+    subtracted when it is reused. The sums are recomputed from the buckets once
+    per rotation so rounding errors do not accumulate.
+    """
+
+    def __init__(self, bucket_seconds: int, buckets: int) -> None:
+        """Allocate the buckets."""
+        self.bucket_seconds = bucket_seconds
+        self.buckets = buckets
+        self.sums = array("d", [0.0]) * _WIDTH
+        self._data = array("d", [0.0]) * (buckets * _WIDTH)
+        self._bucket: int | None = None
+
+    def add(self, now: float, values: array) -> None:
+        """Add the per-field values of a sample taken at monotonic time now."""
+        bucket = int(now // self.bucket_seconds)
+        if self._bucket is None:
+            self._bucket = bucket
+        elif bucket > self._bucket:
+            # Clear every bucket passed since the last sample, at most the whole window
+            for passed in range(max(self._bucket + 1, bucket - self.buckets + 1), bucket + 1):
+                self._clear(passed % self.buckets)
+            self._bucket = bucket
+
+        start = (self._bucket % self.buckets) * _WIDTH
+        data, sums = self._data, self.sums
+        for field in range(_WIDTH):
+            data[start + field] += values[field]
+            sums[field] += values[field]
+
+    def _clear(self, slot: int) -> None:
+        data, sums = self._data, self.sums
+        start = slot * _WIDTH
+        for field in range(_WIDTH):
+            sums[field] -= data[start + field]
+            data[start + field] = 0.0
+        if slot == 0:
+            self.sums = array("d", (sum(data[field::_WIDTH]) for field in range(_WIDTH)))
+
+    def aggregates(self) -> dict[str, float | None]:
+        """Return the statistics derived from the window sums."""
+        sums = self.sums
+        energy = max(sums[_ENERGY], 0.0)
+        return {
+            "energy": energy,
+            "duty_cycle": sums[_ON_TIME] / sums[_DURATION] * 100 if sums[_DURATION] > 0 else None,
+            "temperature_rise_per_kwh": sums[_TEMPERATURE_RISE] / energy * 1000 if energy >= 1 else None,
+            "pv_share": sums[_PV_ENERGY] / sums[_GRID_KNOWN_ENERGY] * 100 if sums[_GRID_KNOWN_ENERGY] >= 1 else None,
+        }
+
+
+class PollStatistics:
+    """Heater energy, duty cycle, temperature rise per kWh and PV share over rolling windows.
+
+    Every poll adds the interval since the previous one to each window. The
+    heater energy comes from the coordinator's precise energy total, and the
+    part of it covered by PV is estimated from grid_power, the latest grid
+    reading (positive while importing) set by the surplus controller: whatever
+    the heater drew beyond the grid import came from the panels.
+    """
+
+    def __init__(self, windows: dict[str, tuple[int, int]] = STATISTICS_WINDOWS) -> None:
+        """Initialize empty windows."""
+        self.windows = {name: RollingWindow(*window) for name, window in windows.items()}
+        self.grid_power: float | None = None
+        self._values = array("d", [0.0]) * _WIDTH
+        self._last: tuple[float, dict[str, Any]] | None = None
+
+    def update(self, now: float, data: dict[str, Any]) -> None:
+        """Add the interval up to the poll taken at monotonic time now."""
+        last = self._last
+        self._last = (now, data)
+        if last is None:
+            return
+        last_time, last_data = last
+        elapsed = now - last_time
+
+        energy = 0.0
+        if data.get("energy_total") is not None and last_data.get("energy_total") is not None:
+            energy = max(data["energy_total"] - last_data["energy_total"], 0.0)
+        power = last_data.get("power")
+
+        values = self._values
+        values[_DURATION] = elapsed
+        values[_ON_TIME] = elapsed if power and elapsed <= STATISTICS_MAX_GAP else 0.0
+        values[_ENERGY] = energy
+        values[_TEMPERATURE_RISE] = 0.0
+        if energy > 0 and data.get("temperature") is not None and last_data.get("temperature") is not None:
+            values[_TEMPERATURE_RISE] = data["temperature"] - last_data["temperature"]
+        values[_GRID_KNOWN_ENERGY] = values[_PV_ENERGY] = 0.0
+        if self.grid_power is not None:
+            grid_energy = max(self.grid_power, 0.0) * elapsed / 3600
+            values[_GRID_KNOWN_ENERGY] = energy
+            values[_PV_ENERGY] = max(energy - grid_energy, 0.0)
+
+        for window in self.windows.values():
+            window.add(now, values)
+
+    def aggregates(self, window: str) -> dict[str, float | None]:
+        """Return the statistics of one window."""
+        return self.windows[window].aggregates()
+
+    def as_dict(self) -> dict[str, dict[str, float | None]]:
+        """Return the statistics of every window."""
+        return {name: window.aggregates() for name, window in self.windows.items()}
@@ -54,16 +54,18 @@ async def async_turn_on(self, **kwargs) -> None:
         self._coordinator.active = True
         self._attr_is_on = True
         power_entity = self.hass.data[DOMAIN][self._entry.entry_id].get("power_number")
-        if power_entity is not None and power_entity.native_value is not None:
+        # With the surplus controller, the power loop writes its limit on the next tick
+        if power_entity is not None and power_entity.available and power_entity.native_value is not None:
             power_limit = int(power_entity.native_value)
             if power_limit > 1:
-                await self._coordinator.api.async_set_power_limit(power_limit)
+                await self._coordinator.power_writer.async_write(power_limit, force=True)
+        self._coordinator.async_notify_command()
         await self._coordinator.async_request_refresh()
         self.async_write_ha_state()
 
     async def async_turn_off(self, **kwargs) -> None:
         """Stop the device and pause polling and power limit writes."""
-        await self._coordinator.api.async_set_power_limit(0)
+        await self._coordinator.power_writer.async_write(0, force=True)
         self._coordinator.active = False
         self._attr_is_on = False
         self.async_write_ha_state()
@@ -0,0 +1,170 @@
+"""Buffered telemetry recording of Ohmpilot samples to compressed columnar files.
+
+Samples are collected in typed column arrays and written in batches from the
+executor. Each batch is appended to the current day's file as one gzip member
+in the format of telemetry_format, so a day of 5 s samples is a few hundred
+kilobytes and recording costs one file write per flush instead of one per sample.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import date, timedelta
+import gzip
+import logging
+from pathlib import Path
+import time
+from typing import Any
+
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+from homeassistant.util import dt as dt_util
+
+from .const import TELEMETRY_FLUSH_INTERVAL, TELEMETRY_MAX_BUFFER, TELEMETRY_RETENTION_DAYS
+from .coordinator import FroniusOhmpilotDataUpdateCoordinator
+from .telemetry_format import COLUMNS, encode_batch, new_columns
+
+_LOGGER = logging.getLogger(__package__)
+
+_FILE_PREFIX = "telemetry_"
+_FILE_SUFFIX = ".bin.gz"
+
+
+def _write_batch(directory: Path, day: date, payload: bytes) -> None:
+    """Append a batch to the file of the given day; runs in the executor."""
+    directory.mkdir(parents=True, exist_ok=True)
+    with gzip.open(directory / f"{_FILE_PREFIX}{day.isoformat()}{_FILE_SUFFIX}", "ab") as file:
+        file.write(payload)
+
+
+def _remove_expired(directory: Path, oldest: date) -> None:
+    """Delete files of days before oldest; runs in the executor."""
+    for path in directory.glob(f"{_FILE_PREFIX}*{_FILE_SUFFIX}"):
+        try:
+            day = date.fromisoformat(path.name.removeprefix(_FILE_PREFIX).removesuffix(_FILE_SUFFIX))
+        except ValueError:
+            continue
+        if day < oldest:
+            path.unlink(missing_ok=True)
+
+
+class TelemetryLogger:
+    """Record every coordinator update to rotating daily telemetry files."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        coordinator: FroniusOhmpilotDataUpdateCoordinator,
+        directory: Path,
+        max_buffer: int = TELEMETRY_MAX_BUFFER,
+        retention_days: int = TELEMETRY_RETENTION_DAYS,
+    ) -> None:
+        """Initialize the logger."""
+        self.hass = hass
+        self.coordinator = coordinator
+        self.directory = directory
+        self.max_buffer = max_buffer
+        self.retention_days = retention_days
+        self.samples = 0
+        self.dropped = 0
+        self.batches = 0
+        self.bytes_encoded = 0
+        self.write_errors = 0
+        self._columns = new_columns()
+        self._flush_lock = asyncio.Lock()
+        self._expired_before: date | None = None
+
+    @property
+    def buffered(self) -> int:
+        """Return the number of samples waiting to be written."""
+        return len(self._columns["time"])
+
+    @callback
+    def async_start(self) -> CALLBACK_TYPE:
+        """Start recording until the returned callback is called."""
+        unsub_coordinator = self.coordinator.async_add_listener(self._handle_update)
+        unsub_interval = async_track_time_interval(
+            self.hass, self._async_flush_interval, timedelta(seconds=TELEMETRY_FLUSH_INTERVAL)
+        )
+        unsub_stop = self.hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, self._async_flush_on_stop)
+
+        @callback
+        def stop() -> None:
+            unsub_coordinator()
+            unsub_interval()
+            unsub_stop()
+
+        return stop
+
+    @callback
+    def _handle_update(self) -> None:
+        """Append the latest coordinator data as one sample."""
+        if (data := self.coordinator.data) is None:
+            return
+        if self.buffered >= self.max_buffer:
+            # Writes keep failing; keep what is buffered rather than growing without bound
+            self.dropped += 1
+            return
+        columns = self._columns
+        columns["time"].append(time.time())
+        for name, _, missing in COLUMNS[1:]:
+            value = data.get(name)
+            columns[name].append(missing if value is None else value)
+        self.samples += 1
+
+    async def _async_flush_interval(self, _now) -> None:
+        await self.async_flush()
+
+    async def _async_flush_on_stop(self, _event: Event) -> None:
+        await self.async_flush()
+
+    async def async_flush(self) -> None:
+        """Write all buffered samples to the current day's file.
+
+        A flush called while another is writing waits for it and then writes the
+        samples buffered since, so the final flush on unload loses nothing.
+        """
+        async with self._flush_lock:
+            await self._async_write_buffered()
+
+    async def _async_write_buffered(self) -> None:
+        if not self.buffered:
+            return
+        columns, self._columns = self._columns, new_columns()
+        payload = encode_batch(columns)
+        today = dt_util.now().date()
+        try:
+            await self.hass.async_add_executor_job(_write_batch, self.directory, today, payload)
+        except OSError as err:
+            self.write_errors += 1
+            _LOGGER.warning("Could not write Ohmpilot telemetry to %s: %s", self.directory, err)
+            # Keep the samples for the next flush, dropping the oldest beyond the buffer size
+            excess = max(0, len(columns["time"]) + self.buffered - self.max_buffer)
+            for name, values in columns.items():
+                values.extend(self._columns[name])
+                del values[:excess]
+            self.dropped += excess
+            self._columns = columns
+            return
+
+        self.batches += 1
+        self.bytes_encoded += len(payload)
+        oldest = today - timedelta(days=self.retention_days)
+        if self._expired_before != oldest:
+            self._expired_before = oldest
+            await self.hass.async_add_executor_job(_remove_expired, self.directory, oldest)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return recording counters.
+
+        The directory is left out, since it is named after the device's serial number.
+        """
+        return {
+            "samples": self.samples,
+            "buffered": self.buffered,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "bytes_encoded": self.bytes_encoded,
+            "write_errors": self.write_errors,
+        }
@@ -0,0 +1,82 @@
+"""Telemetry file format of the Fronius Ohmpilot integration.
+
+Each file is a sequence of gzip members, one per batch. A batch is a small
+header followed by every column as contiguous little-endian values. The module
+does not depend on Home Assistant, so files can be read by adding this directory
+to sys.path and importing it on its own.
+"""
+
+from __future__ import annotations
+
+from array import array
+from collections.abc import Iterator
+import gzip
+import math
+from pathlib import Path
+import struct
+import sys
+
+# Column name, array type code and the value stored when a reading is missing. The
+# status register is an unsigned 16-bit value; 0xFFFF marks a missing one, which
+# also reads back files written when the column was signed and used -1.
+COLUMNS: tuple[tuple[str, str, float], ...] = (
+    ("time", "d", math.nan),
+    ("temperature", "f", math.nan),
+    ("power", "f", math.nan),
+    ("energy", "d", math.nan),
+    ("status", "H", 0xFFFF),
+    ("set_power", "f", math.nan),
+)
+
+_MAGIC = b"OHMT"
+_VERSION = 1
+_HEADER = struct.Struct("<4sBI")
+_SWAP = sys.byteorder == "big"
+
+
+def new_columns() -> dict[str, array]:
+    """Return an empty array for every column."""
+    return {name: array(typecode) for name, typecode, _ in COLUMNS}
+
+
+def encode_batch(columns: dict[str, array]) -> bytes:
+    """Return one batch of samples in the telemetry file format."""
+    count = len(columns["time"])
+    parts = [_HEADER.pack(_MAGIC, _VERSION, count)]
+    for name, _, _ in COLUMNS:
+        values = columns[name]
+        if _SWAP:
+            values = array(values.typecode, values)
+            values.byteswap()
+        parts.append(values.tobytes())
+    return b"".join(parts)
+
+
+def read_telemetry(path: Path) -> dict[str, array]:
+    """Read every sample of a telemetry file into one array per column."""
+    columns = new_columns()
+    with gzip.open(path, "rb") as file:
+        data = file.read()
+    for batch in _iter_batches(data):
+        for name, values in batch.items():
+            columns[name].extend(values)
+    return columns
+
+
+def _iter_batches(data: bytes) -> Iterator[dict[str, array]]:
+    offset = 0
+    while offset < len(data):
+        magic, version, count = _HEADER.unpack_from(data, offset)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"Unsupported telemetry batch at byte {offset}")
+        offset += _HEADER.size
+        batch: dict[str, array] = {}
+        for name, typecode, _ in COLUMNS:
+            values = array(typecode)
+            size = values.itemsize * count
+            values.frombytes(data[offset : offset + size])
+            if _SWAP:
+                values.byteswap()
+            batch[name] = values
+            offset += size
+        yield batch
@@ -0,0 +1,107 @@
+"""First-order thermal model of the boiler heated by the Ohmpilot."""
+
+from __future__ import annotations
+
+import math
+
+from .const import THERMAL_FORGETTING, THERMAL_MIN_SAMPLE_INTERVAL, THERMAL_MIN_SAMPLES
+
+# Initial covariance of the parameter estimate; large means no prior knowledge
+_INITIAL_COVARIANCE = 1000.0
+
+
+class ThermalModel:
+    """Boiler temperature model dT/dt = a * P - b * T + c, fitted online.
+
+    a is the heating rate per kW, b the heat loss rate, and c / b the ambient
+    temperature. Time is in hours and power in kW so the parameters stay within a
+    few orders of magnitude of each other. Each update costs a fixed handful of
+    multiplications (recursive least squares with exponential forgetting), so it
+    can run on every poll.
+
+    Samples are accumulated until THERMAL_MIN_SAMPLE_INTERVAL has passed, because
+    the 0.1 °C resolution of the sensor hides the temperature change over a
+    single poll. The mean power over an interval is taken from the energy counter.
+    """
+
+    def __init__(self, forgetting: float = THERMAL_FORGETTING) -> None:
+        """Initialize an untrained model."""
+        self.forgetting = forgetting
+        self.theta = [0.0, 0.0, 0.0]
+        self.samples = 0
+        self._covariance = [[_INITIAL_COVARIANCE if i == j else 0.0 for j in range(3)] for i in range(3)]
+        self._anchor: tuple[float, float, float] | None = None
+
+    @property
+    def ready(self) -> bool:
+        """Return True once the fit is trained and physically plausible."""
+        a, b, _ = self.theta
+        return self.samples >= THERMAL_MIN_SAMPLES and a > 0 and b > 0
+
+    def update(self, now: float, temperature: float, energy: float) -> None:
+        """Add a reading: monotonic time in seconds, temperature in °C and the energy counter in Wh."""
+        if self._anchor is None:
+            self._anchor = (now, temperature, energy)
+            return
+        start, start_temperature, start_energy = self._anchor
+        elapsed = now - start
+        if elapsed < THERMAL_MIN_SAMPLE_INTERVAL:
+            return
+        self._anchor = (now, temperature, energy)
+        if energy < start_energy:
+            # Counter reset; the interval has no usable mean power
+            return
+
+        hours = elapsed / 3600
+        power = (energy - start_energy) / 1000 / hours
+        x = (power, -(temperature + start_temperature) / 2, 1.0)
+        self._fit(x, (temperature - start_temperature) / hours)
+
+    def _fit(self, x: tuple[float, float, float], y: float) -> None:
+        """Apply one recursive least squares step for regressors x and observed rate y."""
+        p = self._covariance
+        px = [sum(p[i][j] * x[j] for j in range(3)) for i in range(3)]
+        denominator = self.forgetting + sum(x[i] * px[i] for i in range(3))
+        gain = [value / denominator for value in px]
+        error = y - sum(self.theta[i] * x[i] for i in range(3))
+        self.theta = [self.theta[i] + gain[i] * error for i in range(3)]
+        self._covariance = [[(p[i][j] - gain[i] * px[j]) / self.forgetting for j in range(3)] for i in range(3)]
+        self.samples += 1
+
+    def predict(self, temperature: float, power: float, seconds: float) -> float:
+        """Return the temperature after heating with power W for the given seconds."""
+        a, b, c = self.theta
+        steady = (a * power / 1000 + c) / b
+        return steady + (temperature - steady) * math.exp(-b * seconds / 3600)
+
+    def max_power(self, temperature: float, target: float, seconds: float) -> float | None:
+        """Return the highest power in W that keeps the temperature below target for the given seconds."""
+        if not self.ready:
+            return None
+        a, b, c = self.theta
+        decay = math.exp(-b * seconds / 3600)
+        steady = (target - temperature * decay) / (1 - decay)
+        return max(0.0, (b * steady - c) / a * 1000)
+
+    def time_to_target(self, temperature: float, power: float, target: float) -> float | None:
+        """Return the seconds until target is reached at power W, or None if it never is."""
+        if not self.ready:
+            return None
+        if temperature >= target:
+            return 0.0
+        a, b, c = self.theta
+        steady = (a * power / 1000 + c) / b
+        if steady <= target:
+            return None
+        return -math.log((steady - target) / (steady - temperature)) / b * 3600
+
+    def as_dict(self) -> dict[str, float | int | bool]:
+        """Return the fitted parameters."""
+        a, b, c = self.theta
+        return {
+            "ready": self.ready,
+            "samples": self.samples,
+            "heating_rate": a,
+            "loss_rate": b,
+            "ambient": c / b if b else 0.0,
+        }
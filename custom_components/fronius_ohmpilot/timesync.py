@@ -0,0 +1,221 @@
+"""Drift-aware synchronisation of the Ohmpilot system clock."""
+
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta
+import logging
+from typing import Any
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.util import dt as dt_util
+
+from .api import FroniusOhmpilotApiClient
+from .const import (
+    TIME_SYNC_FIRST_CHECK,
+    TIME_SYNC_MAX_ERROR,
+    TIME_SYNC_MAX_INTERVAL,
+    TIME_SYNC_MIN_DRIFT_BASELINE,
+    TIME_SYNC_MIN_INTERVAL,
+    TIME_SYNC_STALLED_INTERVAL,
+)
+
+_LOGGER = logging.getLogger(__package__)
+
+# Seconds after an upcoming UTC offset change at which the clock is checked again
+_OFFSET_CHANGE_MARGIN = 5
+
+# Fewest local seconds between two readings for the device clock's progress to be judged
+_MIN_PROGRESS_INTERVAL = 10
+
+
+def utc_offset_minutes(when: datetime) -> int:
+    """Return the offset of Home Assistant's time zone from UTC at when, in minutes."""
+    offset = dt_util.as_local(when).utcoffset()
+    return int(offset.total_seconds() // 60) if offset is not None else 0
+
+
+def next_offset_change(start: datetime, end: datetime) -> datetime | None:
+    """Return the first minute at which the UTC offset differs from the one at start, if before end."""
+    offset = utc_offset_minutes(start)
+    if utc_offset_minutes(end) == offset:
+        return None
+    while end - start > timedelta(minutes=1):
+        middle = start + (end - start) / 2
+        if utc_offset_minutes(middle) == offset:
+            start = middle
+        else:
+            end = middle
+    return end
+
+
+class TimeSyncManager:
+    """Write the Ohmpilot clock only when it is off, and check it as often as its drift requires.
+
+    Each check reads the device clock and compares it with the local clock at
+    the midpoint of the request, so half the round trip is taken off the error.
+    The clock is written when the error exceeds TIME_SYNC_MAX_ERROR or the
+    device's UTC offset is not the current one. Between writes, the error
+    readings give the drift rate of the device clock. The next check is timed
+    so the error can reach at most half of TIME_SYNC_MAX_ERROR by then, or
+    falls just after the next daylight saving change.
+
+    This relies on register 40399 returning the running device clock rather
+    than the last time written to it. Each reading is therefore compared with
+    the previous one: a clock that advanced by less than half the local time
+    in between is taken as not running, and the time is then written every
+    TIME_SYNC_STALLED_INTERVAL seconds regardless of the reading.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        api: FroniusOhmpilotApiClient,
+        max_error: float = TIME_SYNC_MAX_ERROR,
+    ) -> None:
+        """Initialize the manager."""
+        self.hass = hass
+        self.api = api
+        self.max_error = max_error
+        self.checks = 0
+        self.writes = 0
+        self.failures = 0
+        self.error: float | None = None
+        self.round_trip: float | None = None
+        self.drift: float | None = None
+        self.clock_running: bool | None = None
+        self.interval = TIME_SYNC_MIN_INTERVAL
+        self.next_check: datetime | None = None
+        self._baseline: tuple[float, float] | None = None
+        self._last_reading: tuple[float, float] | None = None
+        self._unsub_check: CALLBACK_TYPE | None = None
+        self._check_task: asyncio.Task[None] | None = None
+        self._stopped = False
+
+    @callback
+    def async_start(self) -> CALLBACK_TYPE:
+        """Start checking the clock until the returned callback is called.
+
+        Stopping also cancels a check waiting for the device, which would
+        otherwise schedule the next one after the entry was unloaded.
+        """
+        self._stopped = False
+        self._schedule(TIME_SYNC_FIRST_CHECK)
+
+        @callback
+        def stop() -> None:
+            self._stopped = True
+            if self._unsub_check is not None:
+                self._unsub_check()
+                self._unsub_check = None
+            if self._check_task is not None:
+                self._check_task.cancel()
+
+        return stop
+
+    @callback
+    def _schedule(self, delay: float) -> None:
+        self.next_check = dt_util.utcnow() + timedelta(seconds=delay)
+        self._unsub_check = async_call_later(self.hass, delay, self._async_check)
+
+    async def _async_check(self, _now: datetime) -> None:
+        self._unsub_check = None
+        self._check_task = asyncio.current_task()
+        try:
+            await self.async_check()
+        finally:
+            self._check_task = None
+            if not self._stopped:
+                self._schedule(self._next_delay())
+
+    async def async_check(self) -> None:
+        """Read the device clock and write it if it is off."""
+        reading = await self.api.async_read_time()
+        if reading is None:
+            self.failures += 1
+            return
+        self.checks += 1
+        sent, received, values = reading
+        self.round_trip = received - sent
+        midpoint = (sent + received) / 2
+        # The device counts whole seconds; its clock is on average half a second ahead of the register
+        self.error = error = values["time"] + 0.5 - midpoint
+        offset = utc_offset_minutes(dt_util.utcnow())
+        self._update_clock_running(midpoint, values["time"])
+
+        if self.clock_running is False:
+            # The readings say nothing about drift; write the time on every check
+            self._baseline = None
+            self.drift = None
+        elif self._baseline is None:
+            self._baseline = (midpoint, error)
+        elif midpoint - self._baseline[0] >= TIME_SYNC_MIN_DRIFT_BASELINE:
+            self.drift = (error - self._baseline[1]) / (midpoint - self._baseline[0])
+
+        if self.clock_running is not False and abs(error) <= self.max_error and values["utc_offset"] == offset:
+            return
+        _LOGGER.debug(
+            "Ohmpilot clock off by %.1fs, UTC offset %s min instead of %s; setting it",
+            error,
+            values["utc_offset"],
+            offset,
+        )
+        if not await self.api.async_set_time(offset, latency=self.round_trip / 2):
+            # The clock was not corrected, so the drift baseline still holds
+            self.failures += 1
+            return
+        self.writes += 1
+        # The drift keeps its last estimate; a new baseline starts from the corrected clock
+        self._baseline = None
+        self._last_reading = (midpoint, midpoint)
+
+    def _update_clock_running(self, now: float, device_time: float) -> None:
+        """Judge from the previous reading or write whether the device clock advances."""
+        last = self._last_reading
+        if last is not None and now - last[0] < _MIN_PROGRESS_INTERVAL:
+            return
+        self._last_reading = (now, device_time)
+        if last is None:
+            return
+        running = device_time - last[1] >= (now - last[0]) / 2
+        if not running and self.clock_running is not False:
+            _LOGGER.warning(
+                "Ohmpilot clock did not advance between checks; writing the time every %s seconds",
+                TIME_SYNC_STALLED_INTERVAL,
+            )
+        elif running and self.clock_running is False:
+            _LOGGER.info("Ohmpilot clock advances again; writing the time only when it is off")
+        self.clock_running = running
+
+    def _next_delay(self) -> float:
+        """Return the seconds until the next check."""
+        if self.clock_running is False:
+            delay = TIME_SYNC_STALLED_INTERVAL
+        elif self.error is None:
+            delay = TIME_SYNC_MIN_INTERVAL
+        elif not self.drift:
+            delay = self.interval * 2 if self._baseline is not None else TIME_SYNC_MIN_INTERVAL
+        else:
+            margin = self.max_error / 2 - abs(self.error) if self._baseline is not None else self.max_error / 2
+            delay = max(margin, 0.0) / abs(self.drift)
+        self.interval = min(max(delay, TIME_SYNC_MIN_INTERVAL), TIME_SYNC_MAX_INTERVAL)
+
+        now = dt_util.utcnow()
+        if (change := next_offset_change(now, now + timedelta(seconds=self.interval))) is not None:
+            return (change - now).total_seconds() + _OFFSET_CHANGE_MARGIN
+        return self.interval
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the synchronisation state."""
+        return {
+            "checks": self.checks,
+            "writes": self.writes,
+            "failures": self.failures,
+            "clock_running": self.clock_running,
+            "error": self.error,
+            "round_trip": self.round_trip,
+            "drift_ppm": self.drift * 1e6 if self.drift is not None else None,
+            "interval": self.interval,
+            "next_check": self.next_check.isoformat() if self.next_check else None,
+        }
@@ -0,0 +1,282 @@
+"""Modbus TCP clients used by the gateway connection."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+import contextlib
+from dataclasses import dataclass, field
+import itertools
+import logging
+import struct
+import time
+from typing import Any
+
+from .connection import ConnectionDropped, ModbusTransportError, UnitTimeout
+from .const import DEFAULT_MAX_IN_FLIGHT, MODBUS_RESPONSE_TIMEOUT
+
+_LOGGER = logging.getLogger(__package__)
+
+# Transaction ID, protocol ID, length of unit ID and PDU, unit ID
+MBAP = struct.Struct(">HHHB")
+
+_READ_HOLDING_REGISTERS = 0x03
+_WRITE_MULTIPLE_REGISTERS = 0x10
+_READ_WRITE_MULTIPLE_REGISTERS = 0x17
+_EXCEPTION_FLAG = 0x80
+
+
+def _import_pymodbus() -> tuple[type, type[Exception], type[Exception]]:
+    """Import pymodbus and return its TCP client class, no-response error and base error."""
+    from pymodbus.client import AsyncModbusTcpClient  # noqa: PLC0415
+    from pymodbus.exceptions import ModbusException, ModbusIOException  # noqa: PLC0415
+
+    return AsyncModbusTcpClient, ModbusIOException, ModbusException
+
+
+class PymodbusTcpClient:
+    """pymodbus' AsyncModbusTcpClient, imported on first connect.
+
+    pymodbus takes about a tenth of a second to import, so it is loaded in the
+    executor when the first request needs a connection instead of with the
+    integration. Its errors are translated like those of PipelinedModbusTcpClient:
+    a request without a response raises TimeoutError, any other failure
+    ModbusTransportError.
+    """
+
+    def __init__(self, host: str, port: int, *, timeout: float = MODBUS_RESPONSE_TIMEOUT) -> None:
+        """Initialize the client."""
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._client: Any = None
+        self._no_response: tuple[type[Exception], ...] = ()
+        self._errors: tuple[type[Exception], ...] = ()
+
+    @property
+    def connected(self) -> bool:
+        """Return True while the socket is open."""
+        return self._client is not None and self._client.connected
+
+    async def connect(self) -> bool:
+        """Open the socket, importing pymodbus first if needed, and return True on success."""
+        if self._client is None:
+            client_class, no_response, error = await asyncio.get_running_loop().run_in_executor(None, _import_pymodbus)
+            self._no_response = (no_response,)
+            self._errors = (error,)
+            # Reconnects and retries are driven by the connection manager, not by pymodbus itself
+            self._client = client_class(self.host, port=self.port, reconnect_delay=0, timeout=self.timeout, retries=0)
+        return await self._client.connect()
+
+    def close(self) -> None:
+        """Close the socket."""
+        if self._client is not None:
+            self._client.close()
+
+    async def read_holding_registers(self, address: int, *, count: int = 1, device_id: int = 1) -> Any:
+        """Read count holding registers starting at address."""
+        return await self._async_call(self._method("read_holding_registers"), address, count=count, device_id=device_id)
+
+    async def write_registers(self, address: int, values: list[int], *, device_id: int = 1) -> Any:
+        """Write values to consecutive holding registers starting at address."""
+        return await self._async_call(self._method("write_registers"), address, values, device_id=device_id)
+
+    async def readwrite_registers(self, **kwargs: Any) -> Any:
+        """Write values, then read registers, in a single request (FC23)."""
+        return await self._async_call(self._method("readwrite_registers"), **kwargs)
+
+    def _method(self, name: str) -> Callable[..., Awaitable[Any]]:
+        if self._client is None:
+            raise ConnectionDropped("Modbus TCP connection not opened yet")
+        return getattr(self._client, name)
+
+    async def _async_call(self, method: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any) -> Any:
+        try:
+            return await method(*args, **kwargs)
+        except self._no_response as err:
+            raise TimeoutError(str(err)) from err
+        except self._errors as err:
+            raise ModbusTransportError(str(err)) from err
+
+
+@dataclass(slots=True)
+class ModbusResponse:
+    """Decoded response PDU, with the parts of the pymodbus response API the integration uses."""
+
+    function_code: int
+    registers: list[int] = field(default_factory=list)
+    exception_code: int | None = None
+
+    def isError(self) -> bool:
+        """Return True for a Modbus exception response."""
+        return self.exception_code is not None
+
+
+class PipelinedModbusTcpClient:
+    """Send requests without waiting for earlier responses and match them by MBAP transaction ID.
+
+    Up to max_in_flight requests share the socket. Requests to the same unit ID
+    are sent one after the other, each after the previous response, so a write
+    is always seen by the unit before the next read. Requests to different units
+    overlap, which is what a gateway in front of several devices can make use of.
+
+    The methods mirror the subset of pymodbus' AsyncModbusTcpClient that the
+    integration calls, so the connection manager and API client work with
+    either. A missing response raises UnitTimeout, a TimeoutError, and leaves
+    the socket open for the other units. A lost or closed socket raises
+    ConnectionDropped in every request waiting on it, so the connection manager
+    counts the outage once rather than per request.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        *,
+        timeout: float = MODBUS_RESPONSE_TIMEOUT,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+    ) -> None:
+        """Initialize the client."""
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self.max_in_flight_seen = 0
+        self._window = asyncio.Semaphore(max_in_flight)
+        self._unit_locks: dict[int, asyncio.Lock] = {}
+        self._pending: dict[int, asyncio.Future[ModbusResponse]] = {}
+        self._transaction_ids = itertools.cycle(range(1, 0x10000))
+        self._last_received = 0.0
+        self._writer: asyncio.StreamWriter | None = None
+        self._reader_task: asyncio.Task[None] | None = None
+
+    @property
+    def connected(self) -> bool:
+        """Return True while the socket is open."""
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def connect(self) -> bool:
+        """Open the socket, closing any previous one, and return True on success."""
+        self.close()
+        try:
+            async with asyncio.timeout(self.timeout):
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+        except (OSError, TimeoutError) as err:
+            _LOGGER.debug("Failed to connect to %s:%s - %s", self.host, self.port, err)
+            return False
+        self._writer = writer
+        self._last_received = time.monotonic()
+        self._reader_task = asyncio.create_task(self._async_read_responses(reader, writer))
+        return True
+
+    def close(self) -> None:
+        """Close the socket and fail every request still waiting for a response."""
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            self._reader_task = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        self._fail_pending("Modbus TCP connection closed")
+
+    async def read_holding_registers(self, address: int, *, count: int = 1, device_id: int = 1) -> ModbusResponse:
+        """Read count holding registers starting at address."""
+        return await self._async_execute(device_id, struct.pack(">BHH", _READ_HOLDING_REGISTERS, address, count))
+
+    async def write_registers(self, address: int, values: list[int], *, device_id: int = 1) -> ModbusResponse:
+        """Write values to consecutive holding registers starting at address."""
+        pdu = struct.pack(
+            f">BHHB{len(values)}H", _WRITE_MULTIPLE_REGISTERS, address, len(values), len(values) * 2, *values
+        )
+        return await self._async_execute(device_id, pdu)
+
+    async def readwrite_registers(
+        self,
+        *,
+        read_address: int,
+        read_count: int,
+        write_address: int,
+        values: list[int],
+        device_id: int = 1,
+    ) -> ModbusResponse:
+        """Write values, then read registers, in a single request (FC23)."""
+        pdu = struct.pack(
+            f">BHHHHB{len(values)}H",
+            _READ_WRITE_MULTIPLE_REGISTERS,
+            read_address,
+            read_count,
+            write_address,
+            len(values),
+            len(values) * 2,
+            *values,
+        )
+        return await self._async_execute(device_id, pdu)
+
+    async def _async_execute(self, unit: int, pdu: bytes) -> ModbusResponse:
+        """Send one request PDU and wait for the response with the same transaction ID."""
+        lock = self._unit_locks.get(unit)
+        if lock is None:
+            lock = self._unit_locks[unit] = asyncio.Lock()
+        async with lock, self._window:
+            if not self.connected:
+                raise ConnectionDropped("Modbus TCP connection lost before the request was sent")
+            tid = self._next_transaction_id()
+            future: asyncio.Future[ModbusResponse] = asyncio.get_running_loop().create_future()
+            self._pending[tid] = future
+            self.max_in_flight_seen = max(self.max_in_flight_seen, len(self._pending))
+            try:
+                self._writer.write(MBAP.pack(tid, 0, len(pdu) + 1, unit) + pdu)
+                async with asyncio.timeout(self.timeout):
+                    return await future
+            except TimeoutError:
+                raise UnitTimeout(
+                    f"No response to transaction {tid} from unit {unit}", unit, time.monotonic() - self._last_received
+                ) from None
+            finally:
+                self._pending.pop(tid, None)
+
+    def _next_transaction_id(self) -> int:
+        """Return a transaction ID no request in flight is using."""
+        while (tid := next(self._transaction_ids)) in self._pending:
+            pass
+        return tid
+
+    async def _async_read_responses(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Hand every response frame to the request waiting for its transaction ID."""
+        try:
+            while True:
+                tid, _protocol, length, _unit = MBAP.unpack(await reader.readexactly(MBAP.size))
+                pdu = await reader.readexactly(length - 1)
+                self._last_received = time.monotonic()
+                future = self._pending.get(tid)
+                if future is None or future.done():
+                    # The request already gave up; its response is of no use to anyone else
+                    _LOGGER.debug("Discarding response to unknown transaction %s", tid)
+                    continue
+                future.set_result(_decode(pdu))
+        except (asyncio.IncompleteReadError, ConnectionError, struct.error, IndexError) as err:
+            _LOGGER.debug("Modbus TCP connection to %s:%s lost: %s", self.host, self.port, err)
+        # Only drop the socket if it was not replaced in the meantime
+        if self._writer is writer:
+            self._reader_task = None
+            with contextlib.suppress(Exception):
+                writer.close()
+            self._writer = None
+            self._fail_pending("Modbus TCP connection lost")
+
+    def _fail_pending(self, reason: str) -> None:
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionDropped(reason))
+        self._pending.clear()
+
+
+def _decode(pdu: bytes) -> ModbusResponse:
+    """Decode a response PDU."""
+    function_code = pdu[0]
+    if function_code & _EXCEPTION_FLAG:
+        return ModbusResponse(function_code & ~_EXCEPTION_FLAG, exception_code=pdu[1])
+    if function_code in (_READ_HOLDING_REGISTERS, _READ_WRITE_MULTIPLE_REGISTERS):
+        count = pdu[1] // 2
+        return ModbusResponse(function_code, list(struct.unpack_from(f">{count}H", pdu, 2)))
+    return ModbusResponse(function_code)
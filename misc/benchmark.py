@@ -0,0 +1,213 @@
+"""Load benchmarks for the Fronius Ohmpilot integration against the simulator.
+
+Runs the real API client, power limit writer and coordinator polling path against
+an in-process simulator and reports poll latency, power write throughput and
+connection churn. Results can be written as JSON and compared against a baseline
+run to judge a performance change without hardware.
+
+Usage:
+    python misc/benchmark.py --latency 20 --jitter 5 --loss 0.01 --json baseline.json
+    python misc/benchmark.py --latency 20 --jitter 5 --loss 0.01 --compare baseline.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+from pathlib import Path
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from simulator import FaultProfile, OhmpilotModel, OhmpilotSimulator
+
+from custom_components.fronius_ohmpilot.api import FroniusOhmpilotApiClient
+from custom_components.fronius_ohmpilot.gateway import ModbusGatewayPool
+from custom_components.fronius_ohmpilot.power_limit import PowerLimitWriter
+from homeassistant import loader
+from homeassistant.core import HomeAssistant
+from homeassistant.setup import async_setup_component
+
+HOST = "127.0.0.1"
+
+
+def _percentiles(samples: list[float]) -> dict[str, float]:
+    """Summarize latencies in milliseconds."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "mean": round(statistics.fmean(ordered) * 1000, 2),
+        "p50": round(ordered[len(ordered) // 2] * 1000, 2),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 2),
+        "max": round(ordered[-1] * 1000, 2),
+    }
+
+
+async def bench_poll(clients: list[FroniusOhmpilotApiClient], polls: int) -> dict[str, Any]:
+    """Poll every device like its coordinator would, all devices at once."""
+    latencies: list[float] = []
+    errors = 0
+
+    async def poll(client: FroniusOhmpilotApiClient) -> None:
+        nonlocal errors
+        for _ in range(polls):
+            start = time.perf_counter()
+            try:
+                data = await client.async_get_data()
+            except Exception:  # noqa: BLE001
+                data = {}
+            latencies.append(time.perf_counter() - start)
+            if data.get("power") is None:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(poll(client) for client in clients))
+    elapsed = time.perf_counter() - start
+    return {"latency_ms": _percentiles(latencies), "errors": errors, "polls_per_s": round(len(latencies) / elapsed, 1)}
+
+
+async def bench_power_loop(clients: list[FroniusOhmpilotApiClient], ticks: int, rate: float) -> dict[str, Any]:
+    """Run the power loop at rate ticks per second with a slowly changing setpoint."""
+    writers = [PowerLimitWriter(client, keepalive=20) for client in clients]
+    latencies: list[float] = []
+
+    async def loop(writer: PowerLimitWriter) -> None:
+        for tick in range(ticks):
+            # Surplus changes every few ticks, as with a passing cloud
+            power = 500 + (tick // 5 % 6) * 400
+            start = time.perf_counter()
+            await writer.async_write(power)
+            latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(1 / rate)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(loop(writer) for writer in writers))
+    elapsed = time.perf_counter() - start
+    sent = sum(writer.sent for writer in writers)
+    return {
+        "tick_ms": _percentiles(latencies),
+        "sent": sent,
+        "skipped": sum(writer.skipped for writer in writers),
+        "failed": sum(writer.failed for writer in writers),
+        "writes_per_s": round(sent / elapsed, 1),
+    }
+
+
+async def bench_mixed(clients: list[FroniusOhmpilotApiClient], seconds: float, rate: float) -> dict[str, Any]:
+    """Poll and run the power loop concurrently, as in normal operation."""
+    polls = max(1, int(seconds * rate / 5))
+    ticks = max(1, int(seconds * rate))
+    poll, power = await asyncio.gather(bench_poll(clients, polls), bench_power_loop(clients, ticks, rate))
+    return {"poll": poll, "power": power}
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    """Start the simulator and Home Assistant core, then run every scenario."""
+    units = {unit: OhmpilotModel(serial=f"2813600000{unit}") for unit in range(1, args.devices + 1)}
+    faults = FaultProfile(args.latency / 1000, args.jitter / 1000, args.loss, args.max_connections)
+    simulator = OhmpilotSimulator(units, faults)
+    await simulator.start(HOST, 0, None)
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        # The shared aiohttp session resolves hosts through the network integration
+        loader.async_setup(hass)
+        await async_setup_component(hass, "network", {})
+        pool = ModbusGatewayPool()
+        clients = [
+            FroniusOhmpilotApiClient(
+                hass,
+                HOST,
+                simulator.modbus_port,
+                0,
+                unit_id=unit,
+                gateway=pool.acquire(HOST, simulator.modbus_port, args.window),
+            )
+            for unit in units
+        ]
+        results: dict[str, Any] = {}
+        try:
+            for name, scenario in (
+                ("poll", bench_poll(clients, args.polls)),
+                ("power_loop", bench_power_loop(clients, args.ticks, args.rate)),
+                ("mixed", bench_mixed(clients, args.seconds, args.rate)),
+            ):
+                connections = simulator.stats.connections
+                requests = simulator.stats.requests
+                results[name] = await scenario
+                results[name]["connections"] = simulator.stats.connections - connections
+                results[name]["requests"] = simulator.stats.requests - requests
+        finally:
+            for client in clients:
+                await client.async_close()
+                pool.release(client.gateway)
+            await simulator.stop()
+            await hass.async_stop(force=True)
+
+    results["simulator"] = {
+        "connections": simulator.stats.connections,
+        "refused": simulator.stats.refused,
+        "requests": simulator.stats.requests,
+        "dropped": simulator.stats.dropped,
+        "bytes_in": simulator.stats.bytes_in,
+        "bytes_out": simulator.stats.bytes_out,
+    }
+    return results
+
+
+def _flatten(results: dict[str, Any], prefix: str = "") -> dict[str, float]:
+    flat: dict[str, float] = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def report(results: dict[str, Any], baseline: dict[str, Any] | None) -> None:
+    """Print the results, with the change against a baseline if given."""
+    previous = _flatten(baseline) if baseline else {}
+    for key, value in _flatten(results).items():
+        line = f"{key:<32} {value:>12}"
+        if (old := previous.get(key)) is not None and old != 0:
+            line += f" {(value - old) / old:+8.1%}"
+        print(line)  # noqa: T201
+
+
+def main() -> None:
+    """Run the benchmark suite."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--devices", type=int, default=1, help="Ohmpilots sharing the simulated gateway")
+    parser.add_argument("--polls", type=int, default=200, help="polls per device in the poll scenario")
+    parser.add_argument("--ticks", type=int, default=200, help="power loop ticks per device")
+    parser.add_argument("--rate", type=float, default=50, help="power loop ticks per second, 1 in production")
+    parser.add_argument("--seconds", type=float, default=5, help="duration of the mixed scenario")
+    parser.add_argument("--latency", type=float, default=0.0, help="response latency in ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="latency jitter in ms")
+    parser.add_argument("--loss", type=float, default=0.0, help="probability of losing a response")
+    parser.add_argument("--window", type=int, default=1, help="requests in flight on the gateway connection")
+    parser.add_argument("--max-connections", type=int, default=0, help="concurrent sockets accepted, 0 = unlimited")
+    parser.add_argument("--json", type=Path, help="write the results to this file")
+    parser.add_argument("--compare", type=Path, help="baseline results to compare against")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.CRITICAL)
+    results = asyncio.run(run(args))
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    report(results, baseline)
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
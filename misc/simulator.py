@@ -0,0 +1,370 @@
+"""Fronius Ohmpilot simulator for development and benchmarking without hardware.
+
+Serves the Ohmpilot's Modbus TCP register map (40004-40808) and the set.cgi HTTP
+endpoint. Latency, lost responses and a connection limit can be injected to mimic
+a congested network and the device's small embedded TCP stack.
+
+The Modbus side is a minimal asyncio server rather than a pymodbus server, so
+faults can be injected per request and per socket regardless of pymodbus version.
+
+Usage:
+    python misc/simulator.py --modbus-port 5020 --http-port 8081 --latency 30 --loss 0.01 --max-connections 2
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+from dataclasses import dataclass, field
+import logging
+import random
+import struct
+import time
+
+from aiohttp import web
+
+_LOGGER = logging.getLogger("ohmpilot_simulator")
+
+ADDR_MANUFACTURER = 40004
+ADDR_MODEL = 40009
+ADDR_SERIAL = 40023
+ADDR_FIRMWARE = 40041
+ADDR_TIME = 40399
+ADDR_SET_POWER = 40599
+ADDR_STATUS = 40799
+ADDR_POWER = 40800
+ADDR_ENERGY = 40804
+ADDR_TEMPERATURE = 40808
+
+ILLEGAL_FUNCTION = 0x01
+ILLEGAL_ADDRESS = 0x02
+GATEWAY_TARGET_FAILED = 0x0B
+
+MBAP = struct.Struct(">HHHB")
+
+
+def _string_registers(text: str, count: int) -> list[int]:
+    raw = text.encode("ascii").ljust(count * 2, b"\x00")[: count * 2]
+    return list(struct.unpack(f">{count}H", raw))
+
+
+@dataclass
+class FaultProfile:
+    """Network faults applied to every response."""
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    loss: float = 0.0
+    max_connections: int = 0
+    # Unit IDs whose requests are never answered, like a device switched off behind a gateway
+    silent_units: set[int] = field(default_factory=set)
+
+    async def delay(self) -> None:
+        """Wait for the configured latency."""
+        if self.latency or self.jitter:
+            await asyncio.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+    def drop(self) -> bool:
+        """Return True if this response should be lost."""
+        return self.loss > 0 and random.random() < self.loss
+
+
+@dataclass
+class SimulatorStats:
+    """Counters describing the load the simulator has seen."""
+
+    connections: int = 0
+    refused: int = 0
+    requests: int = 0
+    dropped: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    http_requests: int = 0
+    writes: dict[int, int] = field(default_factory=dict)
+
+
+class OhmpilotModel:
+    """Register state of one simulated Ohmpilot with a simple heater model."""
+
+    # Phase-angle control settles towards the power limit with this time constant
+    RAMP_TIME_CONSTANT = 2.0
+    MAX_POWER = 3700
+    # Boiler heat capacity in Wh per kelvin and heat loss in W per kelvin
+    HEAT_CAPACITY = 233.0
+    HEAT_LOSS = 2.0
+    AMBIENT = 20.0
+
+    def __init__(self, serial: str = "28136000001", clock_drift_ppm: float = 0.0) -> None:
+        """Initialize the model."""
+        self.registers: dict[int, int] = {}
+        self.config: dict[str, str] = {
+            "name": "Ohmpilot",
+            "H1Auto": "manually",
+            "H1Ph": "3 phasig",
+            "H1Power": "3709",
+            "tempInst": "on",
+            "legCyc": "0",
+            "maxTempUsed": "on",
+            "maxTempCyc": "55",
+            "H2Ph": "aus",
+            "H2Power": "0",
+            "H2ThModeOn": "Einspeisung",
+            "H2ThOn": "4000",
+            "H2ThModeOff": "Einspeisung",
+            "H2ThOff": "0",
+        }
+        self.set_power = 0
+        self.power = 0.0
+        self.energy = 0.0
+        self.temperature = 40.0
+        self.clock_drift = clock_drift_ppm / 1e6
+        self._clock_offset = 0.0
+        self._clock_set_at = time.time()
+        self._utc_offset = 0
+        self._updated = time.monotonic()
+        # Registers between the documented values read as zero, as on the device
+        for start, end in ((40000, 40050), (ADDR_TIME, ADDR_TIME + 5), (ADDR_SET_POWER, ADDR_SET_POWER + 2)):
+            self._store(start, [0] * (end - start))
+        self._store(ADDR_STATUS, [0] * 10)
+        for address, text, count in (
+            (ADDR_MANUFACTURER, "Fronius", 5),
+            (ADDR_MODEL, "Ohmpilot", 14),
+            (ADDR_SERIAL, serial, 16),
+            (ADDR_FIRMWARE, "1.0.29-1", 8),
+        ):
+            self._store(address, _string_registers(text, count))
+
+    def _store(self, address: int, values: list[int]) -> None:
+        for offset, value in enumerate(values):
+            self.registers[address + offset] = value
+
+    def device_time(self) -> float:
+        """Return the device clock in seconds since the epoch, drifting from when it was last set."""
+        now = time.time()
+        return now + self._clock_offset + (now - self._clock_set_at) * self.clock_drift
+
+    def advance(self) -> None:
+        """Move the heater model forward to the current time."""
+        now = time.monotonic()
+        elapsed, self._updated = now - self._updated, now
+        max_temp = float(self.config.get("maxTempCyc", 55))
+        target = min(self.set_power, self.MAX_POWER) if self.temperature < max_temp else 0
+        self.power += (target - self.power) * min(1.0, elapsed / self.RAMP_TIME_CONSTANT)
+        self.energy += self.power * elapsed / 3600
+        loss = self.HEAT_LOSS * (self.temperature - self.AMBIENT)
+        self.temperature += (self.power - loss) * elapsed / 3600 / self.HEAT_CAPACITY
+
+        power = round(self.power)
+        self._store(ADDR_STATUS, [1 if power > 0 else 0])
+        self._store(ADDR_POWER, list(struct.unpack(">2H", struct.pack(">I", power))))
+        self._store(ADDR_ENERGY, list(struct.unpack(">4H", struct.pack(">Q", round(self.energy)))))
+        self._store(ADDR_TEMPERATURE, [round(self.temperature * 10)])
+        self._store(ADDR_SET_POWER, list(struct.unpack(">2H", struct.pack(">I", self.set_power))))
+        seconds = int(self.device_time())
+        self._store(ADDR_TIME, [*struct.unpack(">4H", struct.pack(">Q", seconds)), self._utc_offset & 0xFFFF])
+
+    def read(self, address: int, count: int) -> list[int] | None:
+        """Return holding registers, or None if any of them is not mapped."""
+        self.advance()
+        values = [self.registers.get(a) for a in range(address, address + count)]
+        if any(value is None for value in values):
+            return None
+        return values  # type: ignore[return-value]
+
+    def write(self, address: int, values: list[int]) -> bool:
+        """Write holding registers, returning False for unmapped addresses."""
+        self.advance()
+        if any(a not in self.registers for a in range(address, address + len(values))):
+            return False
+        self._store(address, values)
+        if address <= ADDR_SET_POWER < address + len(values):
+            high, low = self.registers[ADDR_SET_POWER], self.registers[ADDR_SET_POWER + 1]
+            self.set_power = (high << 16) | low
+        if address <= ADDR_TIME + 3 < address + len(values):
+            words = [self.registers[ADDR_TIME + i] for i in range(4)]
+            seconds = struct.unpack(">Q", struct.pack(">4H", *words))[0]
+            self._clock_set_at = time.time()
+            self._clock_offset = seconds - self._clock_set_at
+            self._utc_offset = struct.unpack(">h", struct.pack(">H", self.registers[ADDR_TIME + 4]))[0]
+        return True
+
+
+class OhmpilotSimulator:
+    """Modbus TCP and HTTP front end for one or more simulated Ohmpilots."""
+
+    def __init__(self, units: dict[int, OhmpilotModel], faults: FaultProfile) -> None:
+        """Initialize the simulator."""
+        self.units = units
+        self.faults = faults
+        self.stats = SimulatorStats()
+        self._active = 0
+        self._servers: list[asyncio.AbstractServer] = []
+        self._http_runner: web.AppRunner | None = None
+
+    async def start(self, host: str, modbus_port: int, http_port: int | None) -> None:
+        """Start listening for Modbus and, if a port is given, HTTP requests."""
+        self._servers.append(await asyncio.start_server(self._handle_connection, host, modbus_port))
+        if http_port is not None:
+            app = web.Application()
+            app.router.add_get("/set.cgi", self._handle_set_cgi)
+            app.router.add_get("/get.cgi", self._handle_get_cgi)
+            self._http_runner = web.AppRunner(app)
+            await self._http_runner.setup()
+            await web.TCPSite(self._http_runner, host, http_port).start()
+
+    async def stop(self) -> None:
+        """Stop all servers."""
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        if self._http_runner is not None:
+            await self._http_runner.cleanup()
+
+    @property
+    def modbus_port(self) -> int:
+        """Return the bound Modbus port, useful when started on port 0."""
+        return self._servers[0].sockets[0].getsockname()[1]
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        if self.faults.max_connections and self._active >= self.faults.max_connections:
+            # The embedded TCP stack has no socket left and drops the connection
+            self.stats.refused += 1
+            writer.close()
+            return
+        self._active += 1
+        self.stats.connections += 1
+        # Requests are processed in arrival order, but like a gateway in front of
+        # several devices, responses are sent as each one's latency has passed,
+        # so pipelined requests overlap and may be answered out of order.
+        responses: set[asyncio.Task[None]] = set()
+        try:
+            while True:
+                header = await reader.readexactly(MBAP.size)
+                tid, pid, length, unit = MBAP.unpack(header)
+                pdu = await reader.readexactly(length - 1)
+                self.stats.requests += 1
+                self.stats.bytes_in += len(header) + len(pdu)
+                if unit in self.faults.silent_units:
+                    self.stats.dropped += 1
+                    continue
+                response = self._process(unit, pdu)
+                task = asyncio.create_task(
+                    self._respond(writer, MBAP.pack(tid, pid, len(response) + 1, unit) + response)
+                )
+                responses.add(task)
+                task.add_done_callback(responses.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for task in responses:
+                task.cancel()
+            self._active -= 1
+            writer.close()
+
+    async def _respond(self, writer: asyncio.StreamWriter, frame: bytes) -> None:
+        await self.faults.delay()
+        if self.faults.drop():
+            self.stats.dropped += 1
+            return
+        self.stats.bytes_out += len(frame)
+        writer.write(frame)
+        with contextlib.suppress(ConnectionError):
+            await writer.drain()
+
+    def _process(self, unit: int, pdu: bytes) -> bytes:
+        function = pdu[0]
+        if (model := self.units.get(unit)) is None:
+            return bytes((function | 0x80, GATEWAY_TARGET_FAILED))
+
+        if function == 0x03:
+            address, count = struct.unpack_from(">HH", pdu, 1)
+            if (values := model.read(address, count)) is None:
+                return bytes((function | 0x80, ILLEGAL_ADDRESS))
+            return struct.pack(f">BB{count}H", function, count * 2, *values)
+
+        if function == 0x06:
+            address, value = struct.unpack_from(">HH", pdu, 1)
+            if not model.write(address, [value]):
+                return bytes((function | 0x80, ILLEGAL_ADDRESS))
+            self.stats.writes[address] = self.stats.writes.get(address, 0) + 1
+            return pdu[:5]
+
+        if function == 0x10:
+            address, count, _ = struct.unpack_from(">HHB", pdu, 1)
+            values = list(struct.unpack_from(f">{count}H", pdu, 6))
+            if not model.write(address, values):
+                return bytes((function | 0x80, ILLEGAL_ADDRESS))
+            self.stats.writes[address] = self.stats.writes.get(address, 0) + 1
+            return pdu[:5]
+
+        if function == 0x17:
+            read_address, read_count, write_address, write_count, _ = struct.unpack_from(">HHHHB", pdu, 1)
+            values = list(struct.unpack_from(f">{write_count}H", pdu, 10))
+            if not model.write(write_address, values):
+                return bytes((function | 0x80, ILLEGAL_ADDRESS))
+            self.stats.writes[write_address] = self.stats.writes.get(write_address, 0) + 1
+            if (result := model.read(read_address, read_count)) is None:
+                return bytes((function | 0x80, ILLEGAL_ADDRESS))
+            return struct.pack(f">BB{read_count}H", function, read_count * 2, *result)
+
+        return bytes((function | 0x80, ILLEGAL_FUNCTION))
+
+    async def _handle_set_cgi(self, request: web.Request) -> web.Response:
+        self.stats.http_requests += 1
+        await self.faults.delay()
+        for model in self.units.values():
+            model.config.update(request.query)
+        return web.Response(text="OK")
+
+    async def _handle_get_cgi(self, request: web.Request) -> web.Response:
+        self.stats.http_requests += 1
+        await self.faults.delay()
+        model = next(iter(self.units.values()))
+        return web.json_response(model.config)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Return the command line parser."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--modbus-port", type=int, default=5020)
+    parser.add_argument("--http-port", type=int, default=8081)
+    parser.add_argument("--units", default="1", help="comma separated Modbus unit IDs to simulate")
+    parser.add_argument("--latency", type=float, default=0.0, help="response latency in ms")
+    parser.add_argument("--jitter", type=float, default=0.0, help="latency jitter in ms")
+    parser.add_argument("--loss", type=float, default=0.0, help="probability of losing a response")
+    parser.add_argument("--max-connections", type=int, default=0, help="concurrent sockets accepted, 0 = unlimited")
+    parser.add_argument("--silent-units", default="", help="comma separated unit IDs that never answer")
+    parser.add_argument("--clock-drift", type=float, default=0.0, help="device clock drift in ppm")
+    return parser
+
+
+def simulator_from_args(args: argparse.Namespace) -> OhmpilotSimulator:
+    """Create a simulator from parsed command line arguments."""
+    units = {
+        int(unit): OhmpilotModel(serial=f"2813600000{int(unit)}", clock_drift_ppm=args.clock_drift)
+        for unit in args.units.split(",")
+    }
+    silent_units = {int(unit) for unit in args.silent_units.split(",") if unit}
+    faults = FaultProfile(args.latency / 1000, args.jitter / 1000, args.loss, args.max_connections, silent_units)
+    return OhmpilotSimulator(units, faults)
+
+
+async def main() -> None:
+    """Run the simulator until interrupted."""
+    args = build_parser().parse_args()
+    logging.basicConfig(level=logging.INFO)
+    simulator = simulator_from_args(args)
+    await simulator.start(args.host, args.modbus_port, args.http_port)
+    _LOGGER.info("Simulating units %s on modbus port %s, http port %s", args.units, args.modbus_port, args.http_port)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await simulator.stop()
+        _LOGGER.info("%s", simulator.stats)
+
+
+if __name__ == "__main__":
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(main())
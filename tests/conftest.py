@@ -0,0 +1,29 @@
+"""Shared fixtures for the Fronius Ohmpilot tests."""
+
+from __future__ import annotations
+
+from collections.abc import AsyncIterator
+from pathlib import Path
+import sys
+
+import pytest
+
+# The simulator lives with the other development scripts rather than in a package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "misc"))
+
+from simulator import FaultProfile, OhmpilotModel, OhmpilotSimulator
+
+HOST = "127.0.0.1"
+
+
+@pytest.fixture
+async def simulator() -> AsyncIterator[OhmpilotSimulator]:
+    """Run a simulator with Ohmpilots at unit IDs 1 and 2 on a free port.
+
+    Tests inject network faults by changing simulator.faults.
+    """
+    units = {1: OhmpilotModel(serial="28136000001"), 2: OhmpilotModel(serial="28136000002")}
+    sim = OhmpilotSimulator(units, FaultProfile())
+    await sim.start(HOST, 0, None)
+    yield sim
+    await sim.stop()
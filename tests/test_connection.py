@@ -0,0 +1,60 @@
+"""Tests for the connection manager on a pipelined gateway socket."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from simulator import OhmpilotSimulator
+
+from custom_components.fronius_ohmpilot.connection import ModbusConnectionManager, UnitTimeout
+from custom_components.fronius_ohmpilot.transport import PipelinedModbusTcpClient
+
+pytestmark = pytest.mark.integration
+
+HOST = "127.0.0.1"
+
+
+async def _read(connection: ModbusConnectionManager, unit: int) -> bool:
+    """Read one register from unit like the API client does, returning True on success."""
+    await connection.async_ensure_connected()
+    try:
+        await connection.client.read_holding_registers(40799, count=1, device_id=unit)
+    except TimeoutError as err:
+        connection.mark_failed(err)
+        return False
+    connection.record_success()
+    return True
+
+
+async def test_silent_unit_leaves_the_shared_socket_alone(simulator: OhmpilotSimulator) -> None:
+    """Timeouts of one unit are counted for it and do not drop the socket or open the circuit."""
+    simulator.faults.silent_units = {2}
+    connection = ModbusConnectionManager(PipelinedModbusTcpClient(HOST, simulator.modbus_port, timeout=0.2))
+
+    for _ in range(connection.failure_threshold + 1):
+        results = await asyncio.gather(_read(connection, 1), _read(connection, 2))
+        assert results == [True, False]
+
+    assert connection.client.connected
+    assert connection.circuit_state == "closed"
+    assert connection.as_dict()["unit_timeouts"] == {2: connection.failure_threshold + 1}
+    assert connection.connects == 1
+    connection.close()
+
+
+async def test_silent_socket_counts_against_the_connection(simulator: OhmpilotSimulator) -> None:
+    """Once the socket has received nothing for the probe interval, a timeout drops it."""
+    simulator.faults.silent_units = {1, 2}
+    connection = ModbusConnectionManager(
+        PipelinedModbusTcpClient(HOST, simulator.modbus_port, timeout=0.2), probe_interval=0.1
+    )
+    await connection.async_ensure_connected()
+
+    with pytest.raises(UnitTimeout) as err:
+        await connection.client.read_holding_registers(40799, count=1, device_id=2)
+    connection.mark_failed(err.value)
+
+    assert not connection.client.connected
+    assert connection.unit_timeouts == {}
+    connection.close()
@@ -0,0 +1,73 @@
+"""Tests for the high-resolution energy total."""
+
+from __future__ import annotations
+
+import pytest
+
+from custom_components.fronius_ohmpilot.energy import EnergyAccumulator
+
+pytestmark = pytest.mark.unit
+
+
+def test_power_is_integrated_between_counter_ticks() -> None:
+    """Between whole Wh ticks, the total follows the integrated power."""
+    accumulator = EnergyAccumulator()
+
+    assert accumulator.update(0, 1800, 100) == 100
+    # 1800 W for 1 s is 0.5 Wh
+    assert accumulator.update(1, 1800, 100) == pytest.approx(100.5)
+    assert accumulator.integrated == pytest.approx(0.5)
+
+
+def test_counter_tick_absorbs_integrated_energy() -> None:
+    """When the counter ticks, the energy it now accounts for is no longer added on top."""
+    accumulator = EnergyAccumulator()
+    accumulator.update(0, 1800, 100)
+    accumulator.update(1, 1800, 100)
+
+    assert accumulator.update(2, 1800, 101) == pytest.approx(101)
+    assert accumulator.update(3, 1800, 101) == pytest.approx(101.5)
+
+
+def test_partial_is_capped_below_a_whole_wh() -> None:
+    """Integrated energy never adds a whole Wh the counter has not shown."""
+    accumulator = EnergyAccumulator()
+    accumulator.update(0, 3600, 100)
+
+    assert accumulator.update(10, 3600, 100) == pytest.approx(100.999)
+
+
+def test_missing_power_is_bridged_by_the_next_reading() -> None:
+    """A failed poll leaves a gap that the trapezoid rule covers."""
+    accumulator = EnergyAccumulator()
+    accumulator.update(0, 0, 100)
+    accumulator.update(1, None, None)
+
+    assert accumulator.update(2, 1800, 100) == pytest.approx(100.5)
+
+
+def test_total_waits_for_the_counter() -> None:
+    """No total is reported until the counter has been read once."""
+    accumulator = EnergyAccumulator()
+
+    assert accumulator.update(0, 1000, None) is None
+    assert accumulator.update(1, 1000, None) is None
+    assert accumulator.update(2, 1000, 50) == 50
+
+
+def test_counter_reset_continues_from_previous_total() -> None:
+    """A counter that restarts from zero does not make the total drop."""
+    accumulator = EnergyAccumulator()
+    accumulator.update(0, 0, 500)
+
+    assert accumulator.update(1, 0, 3) == 503
+    assert accumulator.counter_resets == 1
+
+
+def test_total_never_decreases() -> None:
+    """The total is monotonic even if the counter lags the integrated power."""
+    accumulator = EnergyAccumulator()
+    accumulator.update(0, 3600, 100)
+    before = accumulator.update(0.5, 3600, 100)
+
+    assert accumulator.update(1, 0, 100) >= before
@@ -0,0 +1,144 @@
+"""Tests for the write-on-change power limit writer."""
+
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+
+from custom_components.fronius_ohmpilot import power_limit
+from custom_components.fronius_ohmpilot.power_limit import PowerLimitWriter
+
+pytestmark = pytest.mark.unit
+
+KEEPALIVE = 30
+
+
+class FakeApi:
+    """API client recording power limit writes."""
+
+    def __init__(self) -> None:
+        """Initialize the fake."""
+        self.writes: list[int] = []
+        self.fail = False
+
+    async def async_set_power_limit(self, power: int) -> int | None:
+        """Record the write and return the applied limit, or None if it failed."""
+        self.writes.append(power)
+        return None if self.fail else power
+
+
+class Clock:
+    """Monotonic clock advanced by hand."""
+
+    def __init__(self) -> None:
+        """Start at an arbitrary time."""
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        """Return the current time."""
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    """Replace the writer's monotonic clock, leaving the event loop's alone."""
+    clock = Clock()
+    monkeypatch.setattr(power_limit, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+@pytest.fixture
+def api() -> FakeApi:
+    """Return a fake API client."""
+    return FakeApi()
+
+
+async def test_unchanged_limit_is_skipped_until_keepalive(api: FakeApi, clock: Clock) -> None:
+    """The same limit is only rewritten once the keep-alive interval has passed."""
+    writer = PowerLimitWriter(api, KEEPALIVE)
+
+    assert await writer.async_write(1000)
+    clock.now += KEEPALIVE - 1
+    assert not await writer.async_write(1000)
+    clock.now += 1
+    assert await writer.async_write(1000)
+
+    assert api.writes == [1000, 1000]
+    assert writer.as_dict() == {
+        "acknowledged": 1000,
+        "applied": 1000,
+        "sent": 2,
+        "skipped": 1,
+        "held_back": 0,
+        "failed": 0,
+    }
+
+
+async def test_changed_limit_is_written_immediately(api: FakeApi, clock: Clock) -> None:
+    """A new limit does not wait for the keep-alive interval."""
+    writer = PowerLimitWriter(api, KEEPALIVE)
+
+    await writer.async_write(1000)
+    clock.now += 1
+    await writer.async_write(1500)
+
+    assert api.writes == [1000, 1500]
+
+
+async def test_force_rewrites_an_acknowledged_limit(api: FakeApi, clock: Clock) -> None:
+    """force writes even a fresh, unchanged limit."""
+    writer = PowerLimitWriter(api, KEEPALIVE)
+
+    await writer.async_write(1000)
+    assert await writer.async_write(1000, force=True)
+
+    assert api.writes == [1000, 1000]
+
+
+async def test_failed_write_is_retried(api: FakeApi, clock: Clock) -> None:
+    """A failed write leaves no acknowledged limit, so the next call writes again."""
+    applied: list[int] = []
+    writer = PowerLimitWriter(api, KEEPALIVE, on_applied=applied.append)
+    api.fail = True
+
+    assert not await writer.async_write(1000)
+    assert writer.acknowledged is None
+
+    api.fail = False
+    assert await writer.async_write(1000)
+    assert api.writes == [1000, 1000]
+    assert applied == [1000]
+    assert writer.failed == 1
+
+
+async def test_hold_keeps_the_step_and_restores_the_previous_limit(api: FakeApi, clock: Clock) -> None:
+    """While a limit is held, other writes keep it alive; the previous limit is restored afterwards."""
+    writer = PowerLimitWriter(api, KEEPALIVE)
+    await writer.async_write(1000)
+
+    async with writer.async_hold(3000) as accepted:
+        assert accepted
+        assert writer.held
+        # The power loop a second later, then after the keep-alive interval
+        clock.now += 1
+        assert not await writer.async_write(1000)
+        clock.now += KEEPALIVE
+        assert await writer.async_write(1000)
+
+    assert not writer.held
+    assert api.writes == [1000, 3000, 3000, 1000]
+    assert writer.acknowledged == 1000
+    assert writer.held_back == 2
+
+
+async def test_forced_write_during_hold_is_not_undone(api: FakeApi, clock: Clock) -> None:
+    """A forced write, like switching the device off, replaces the held limit and is kept."""
+    writer = PowerLimitWriter(api, KEEPALIVE)
+    await writer.async_write(1000)
+
+    async with writer.async_hold(3000):
+        await writer.async_write(0, force=True)
+
+    assert api.writes == [1000, 3000, 0]
+    assert writer.acknowledged == 0
@@ -0,0 +1,120 @@
+"""Tests for the declarative register map."""
+
+from __future__ import annotations
+
+import struct
+
+import pytest
+
+from custom_components.fronius_ohmpilot.registers import (
+    IDENTITY_BLOCKS,
+    LITTLE_ENDIAN,
+    POLL_BLOCKS,
+    ReadBlock,
+    RegisterField,
+    RegisterType,
+    plan_reads,
+)
+
+pytestmark = pytest.mark.unit
+
+
+def _words(fmt: str, *values: object) -> list[int]:
+    """Pack values big-endian and split them into register words."""
+    raw = struct.pack(f">{fmt}", *values)
+    return list(struct.unpack(f">{len(raw) // 2}H", raw))
+
+
+def test_adjacent_and_nearby_fields_share_a_block() -> None:
+    """Fields within the gap are merged, including the unused registers between them."""
+    (block,) = plan_reads((RegisterField("b", 110), RegisterField("a", 100, RegisterType.UINT32)), max_gap=8)
+
+    assert block.address == 100
+    assert block.count == 11
+    assert block.keys == ("a", "b")
+
+
+def test_distant_fields_are_split() -> None:
+    """A gap wider than max_gap starts a new read."""
+    blocks = plan_reads((RegisterField("a", 100), RegisterField("b", 110)), max_gap=5)
+
+    assert [(block.address, block.count) for block in blocks] == [(100, 1), (110, 1)]
+
+
+def test_blocks_respect_max_count() -> None:
+    """No block is larger than a single read request may return."""
+    fields = [RegisterField(f"f{i}", 100 + i * 4, RegisterType.UINT64) for i in range(10)]
+
+    blocks = plan_reads(fields, max_count=12)
+
+    assert len(blocks) > 1
+    assert all(block.count <= 12 for block in blocks)
+    assert sum(len(block.fields) for block in blocks) == 10
+
+
+def test_poll_fields_are_read_in_one_request() -> None:
+    """Status, power, energy and temperature are polled in a single read."""
+    (block,) = POLL_BLOCKS
+
+    assert block.address == 40799
+    assert block.count == 10
+
+
+def test_decode_types_scale_and_gaps() -> None:
+    """Integers and scaled values are decoded, skipping the registers between them."""
+    (block,) = POLL_BLOCKS
+    registers = [*_words("H", 1), *_words("I", 2500), 0, 0, *_words("Q", 123456789), *_words("H", 553)]
+
+    assert block.decode(registers) == {"status": 1, "power": 2500, "energy": 123456789, "temperature": 55.3}
+
+
+def test_decode_strings() -> None:
+    """Strings are stripped of their padding."""
+    (block,) = IDENTITY_BLOCKS
+    registers = [0] * block.count
+    offset = 40023 - block.address
+    registers[offset : offset + 16] = _words("32s", b"28136000001")
+
+    data = block.decode(registers)
+
+    assert data["serial_number"] == "28136000001"
+    assert data["manufacturer"] == ""
+
+
+def test_decode_signed_and_little_endian() -> None:
+    """Signed values are sign-extended and word-swapped fields keep their own byte order."""
+    block = ReadBlock(
+        0,
+        3,
+        (
+            RegisterField("offset", 0, RegisterType.INT16),
+            RegisterField("swapped", 1, RegisterType.UINT32, byteorder=LITTLE_ENDIAN),
+        ),
+    )
+    swapped = list(struct.unpack(">2H", struct.pack("<I", 70000)))
+
+    assert block.decode([0xFFC4, *swapped]) == {"offset": -60, "swapped": 70000}
+
+
+def test_encode_round_trips_decode() -> None:
+    """Encoding field values gives registers that decode to the same values, with gaps zero-filled."""
+    (block,) = plan_reads(
+        (
+            RegisterField("time", 40399, RegisterType.UINT64),
+            RegisterField("utc_offset", 40403, RegisterType.INT16),
+            RegisterField("temperature", 40405, scale=-1),
+        )
+    )
+    values = {"time": 1_760_000_000, "utc_offset": -120, "temperature": 42.5}
+
+    registers = block.encode(values)
+
+    assert len(registers) == block.count
+    assert registers[40404 - block.address] == 0
+    assert block.decode(registers) == values
+
+
+def test_overlapping_fields_are_rejected() -> None:
+    """Two fields claiming the same register are a mistake in the map."""
+    with pytest.raises(ValueError, match="overlaps"):
+        plan_reads((RegisterField("a", 100, RegisterType.UINT32), RegisterField("b", 101)))
@@ -0,0 +1,125 @@
+"""Tests for the priority scheduling of Modbus requests."""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from custom_components.fronius_ohmpilot.scheduler import IoPriority, IoScheduler, RequestExpired
+
+pytestmark = pytest.mark.unit
+
+
+async def _hold(scheduler: IoScheduler, priority: IoPriority, order: list[IoPriority]) -> None:
+    """Take a slot, record the order it was granted in and give it back."""
+    async with scheduler.request(priority):
+        order.append(priority)
+
+
+async def test_waiters_are_granted_by_priority() -> None:
+    """Once the slot is released, the most urgent waiter goes first, then arrival order."""
+    scheduler = IoScheduler(1)
+    order: list[IoPriority] = []
+    blocker = scheduler.request(IoPriority.POLL)
+    await blocker.acquire()
+
+    tasks = [
+        asyncio.create_task(_hold(scheduler, priority, order))
+        for priority in (IoPriority.DIAGNOSTIC, IoPriority.POLL, IoPriority.CONTROL, IoPriority.TIME_SYNC)
+    ]
+    await asyncio.sleep(0)
+    assert scheduler.waiting == 4
+
+    blocker.release()
+    await asyncio.gather(*tasks)
+
+    assert order == [IoPriority.CONTROL, IoPriority.TIME_SYNC, IoPriority.POLL, IoPriority.DIAGNOSTIC]
+    assert scheduler.waiting == 0
+
+
+async def test_slots_limit_requests_in_flight() -> None:
+    """Only as many requests as there are slots hold one at the same time."""
+    scheduler = IoScheduler(2)
+    active = peak = 0
+
+    async def request() -> None:
+        nonlocal active, peak
+        async with scheduler.request(IoPriority.POLL):
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+    await asyncio.gather(*(request() for _ in range(6)))
+
+    assert peak == 2
+    assert scheduler.granted[IoPriority.POLL] == 6
+
+
+async def test_waiter_past_its_deadline_expires() -> None:
+    """A request that cannot start before its deadline is dropped and counted."""
+    scheduler = IoScheduler(1)
+    blocker = scheduler.request(IoPriority.CONTROL)
+    await blocker.acquire()
+
+    with pytest.raises(RequestExpired):
+        await scheduler.request(IoPriority.POLL, timeout=0.01).acquire()
+
+    assert scheduler.expired[IoPriority.POLL] == 1
+    assert scheduler.waiting == 0
+    blocker.release()
+
+    # The expired request did not take the slot with it
+    async with asyncio.timeout(1), scheduler.request(IoPriority.POLL, timeout=0.01):
+        pass
+
+
+async def test_cancelled_waiter_does_not_leak_the_slot() -> None:
+    """Cancelling a waiter leaves the slot to the requests still waiting."""
+    scheduler = IoScheduler(1)
+    order: list[IoPriority] = []
+    blocker = scheduler.request(IoPriority.POLL)
+    await blocker.acquire()
+
+    cancelled = asyncio.create_task(_hold(scheduler, IoPriority.CONTROL, order))
+    waiting = asyncio.create_task(_hold(scheduler, IoPriority.DIAGNOSTIC, order))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    blocker.release()
+    await waiting
+
+    assert order == [IoPriority.DIAGNOSTIC]
+    assert cancelled.cancelled()
+
+
+async def test_yield_lets_more_urgent_request_go_first() -> None:
+    """A multi-PDU request hands the slot to a waiting control write between PDUs."""
+    scheduler = IoScheduler(1)
+    order: list[str] = []
+
+    async def control() -> None:
+        async with scheduler.request(IoPriority.CONTROL):
+            order.append("control")
+
+    async with scheduler.request(IoPriority.DIAGNOSTIC) as request:
+        order.append("first PDU")
+        task = asyncio.create_task(control())
+        await asyncio.sleep(0)
+        await request.async_yield()
+        order.append("second PDU")
+    await task
+
+    assert order == ["first PDU", "control", "second PDU"]
+    assert scheduler.preempted[IoPriority.DIAGNOSTIC] == 1
+
+
+async def test_yield_without_waiters_keeps_the_slot() -> None:
+    """Yielding with nobody more urgent waiting is free."""
+    scheduler = IoScheduler(1)
+
+    async with scheduler.request(IoPriority.POLL) as request:
+        await request.async_yield()
+        assert request.held
+
+    assert scheduler.preempted[IoPriority.POLL] == 0
@@ -0,0 +1,44 @@
+"""Tests for the sensor significance filter."""
+
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+
+from custom_components.fronius_ohmpilot.sensor import OhmpilotEnergySensor, OhmpilotEnergyTotalSensor
+
+pytestmark = pytest.mark.unit
+
+
+def _sensor(sensor_class: type, data: dict) -> tuple[object, list]:
+    """Return a sensor on a fake coordinator, and the values it writes to its state."""
+    coordinator = SimpleNamespace(data=data, serial_number="28136000001", device_info=None, last_update_success=True)
+    sensor = sensor_class(coordinator, SimpleNamespace(entry_id="entry", data={}))
+    written: list = []
+    sensor.async_write_ha_state = lambda: written.append(sensor.native_value)
+    return sensor, written
+
+
+def test_precise_energy_writes_sub_wh_increments() -> None:
+    """A 0.5 Wh increment of the precise energy total reaches the state."""
+    data = {"energy_total": 1000.0}
+    sensor, written = _sensor(OhmpilotEnergyTotalSensor, data)
+    sensor._handle_coordinator_update()  # noqa: SLF001
+
+    data["energy_total"] = 1000.5
+    sensor._handle_coordinator_update()  # noqa: SLF001
+
+    assert written == [1000.0, 1000.5]
+
+
+def test_energy_counter_drops_small_increments() -> None:
+    """The whole-Wh counter still keeps back changes below its threshold."""
+    data = {"energy": 1000}
+    sensor, written = _sensor(OhmpilotEnergySensor, data)
+    sensor._handle_coordinator_update()  # noqa: SLF001
+
+    data["energy"] = 1005
+    sensor._handle_coordinator_update()  # noqa: SLF001
+
+    assert written == [1000]
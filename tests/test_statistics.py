@@ -0,0 +1,104 @@
+"""Tests for the rolling heater statistics."""
+
+from __future__ import annotations
+
+from array import array
+
+import pytest
+
+from custom_components.fronius_ohmpilot.statistics import PollStatistics, RollingWindow
+
+pytestmark = pytest.mark.unit
+
+
+def _sample(
+    *,
+    duration: float = 0.0,
+    on_time: float = 0.0,
+    energy: float = 0.0,
+    temperature_rise: float = 0.0,
+    grid_known_energy: float = 0.0,
+    pv_energy: float = 0.0,
+) -> array:
+    return array("d", (duration, on_time, energy, temperature_rise, grid_known_energy, pv_energy))
+
+
+def test_window_sums_samples() -> None:
+    """Samples within the window add up in the running sums."""
+    window = RollingWindow(10, 3)
+    window.add(0, _sample(duration=5, on_time=5, energy=100))
+    window.add(12, _sample(duration=5, energy=50))
+
+    assert list(window.sums) == [10, 5, 150, 0, 0, 0]
+    assert window.aggregates()["duty_cycle"] == 50
+
+
+def test_buckets_fall_out_of_the_window() -> None:
+    """A bucket older than the window is subtracted when its slot is reused."""
+    window = RollingWindow(10, 3)
+    window.add(0, _sample(energy=1))
+    window.add(15, _sample(energy=2))
+    window.add(25, _sample(energy=4))
+
+    window.add(35, _sample(energy=8))
+
+    assert window.sums[2] == 14
+
+
+def test_long_gap_clears_the_whole_window() -> None:
+    """After a gap longer than the window, only the new sample remains."""
+    window = RollingWindow(10, 3)
+    for now in range(0, 30, 5):
+        window.add(now, _sample(duration=5, energy=10))
+
+    window.add(1000, _sample(duration=5, energy=1))
+
+    assert list(window.sums) == [5, 0, 1, 0, 0, 0]
+
+
+def test_sums_stay_exact_over_many_rotations() -> None:
+    """Rounding errors do not accumulate in the running sums."""
+    window = RollingWindow(1, 4)
+    for now in range(10_000):
+        window.add(now, _sample(duration=1, energy=0.1))
+
+    assert window.sums[2] == pytest.approx(0.4, abs=1e-9)
+
+
+def test_aggregates_need_enough_data() -> None:
+    """Ratios are only reported once their denominator is meaningful."""
+    window = RollingWindow(10, 3)
+
+    assert window.aggregates() == {
+        "energy": 0.0,
+        "duty_cycle": None,
+        "temperature_rise_per_kwh": None,
+        "pv_share": None,
+    }
+
+    window.add(
+        0, _sample(duration=10, on_time=10, energy=500, temperature_rise=2, grid_known_energy=500, pv_energy=400)
+    )
+
+    assert window.aggregates() == {
+        "energy": 500,
+        "duty_cycle": 100,
+        "temperature_rise_per_kwh": 4,
+        "pv_share": 80,
+    }
+
+
+def test_poll_statistics_attribute_heater_energy_to_pv() -> None:
+    """Heater energy beyond the grid import over an interval is counted as PV."""
+    statistics = PollStatistics({"hour": (60, 60)})
+    statistics.grid_power = 1000
+    statistics.update(0, {"power": 3000, "energy_total": 0.0, "temperature": 40.0})
+    statistics.update(3600, {"power": 3000, "energy_total": 3000.0, "temperature": 52.0})
+
+    # An hour between polls is too long a gap to count as heater on time
+    assert statistics.aggregates("hour") == {
+        "energy": 3000,
+        "duty_cycle": 0,
+        "temperature_rise_per_kwh": 4,
+        "pv_share": pytest.approx(66.67, abs=0.01),
+    }
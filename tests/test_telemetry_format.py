@@ -0,0 +1,56 @@
+"""Tests for the telemetry file format."""
+
+from __future__ import annotations
+
+from array import array
+import gzip
+import math
+from pathlib import Path
+
+import pytest
+
+from custom_components.fronius_ohmpilot.telemetry_format import COLUMNS, encode_batch, new_columns, read_telemetry
+
+pytestmark = pytest.mark.unit
+
+
+def _batch(start: int, count: int) -> dict:
+    columns = new_columns()
+    for index in range(start, start + count):
+        for name, _, missing in COLUMNS:
+            columns[name].append(missing if name == "temperature" and index % 2 else index)
+    return columns
+
+
+def test_batches_are_read_back_in_order(tmp_path: Path) -> None:
+    """Every batch appended to a file is read back as one sequence of columns."""
+    path = tmp_path / "telemetry_2025-07-11.bin.gz"
+    for start in (0, 3):
+        with gzip.open(path, "ab") as file:
+            file.write(encode_batch(_batch(start, 3)))
+
+    columns = read_telemetry(path)
+
+    assert list(columns["time"]) == [0, 1, 2, 3, 4, 5]
+    assert list(columns["status"]) == [0, 1, 2, 3, 4, 5]
+    assert [math.isnan(value) for value in columns["temperature"]] == [False, True] * 3
+
+
+def test_status_round_trips_the_full_register_range(tmp_path: Path) -> None:
+    """Status values above the signed 16-bit range are written and read back."""
+    path = tmp_path / "telemetry_2025-07-11.bin.gz"
+    columns = _batch(0, 3)
+    columns["status"] = array("H", [0, 32768, 65535])
+    with gzip.open(path, "ab") as file:
+        file.write(encode_batch(columns))
+
+    assert list(read_telemetry(path)["status"]) == [0, 32768, 65535]
+
+
+def test_unknown_batch_is_rejected(tmp_path: Path) -> None:
+    """A file that is not in the telemetry format raises ValueError."""
+    path = tmp_path / "telemetry_2025-07-11.bin.gz"
+    path.write_bytes(gzip.compress(b"\x00" * 16))
+
+    with pytest.raises(ValueError, match="Unsupported telemetry batch"):
+        read_telemetry(path)
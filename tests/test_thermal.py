@@ -0,0 +1,103 @@
+"""Tests for the fitted boiler thermal model."""
+
+from __future__ import annotations
+
+import pytest
+
+from custom_components.fronius_ohmpilot.const import THERMAL_MIN_SAMPLE_INTERVAL, THERMAL_MIN_SAMPLES
+from custom_components.fronius_ohmpilot.thermal import ThermalModel
+
+pytestmark = pytest.mark.unit
+
+# Boiler the samples are generated from: dT/dt = A * P - B * T + C, per hour and kW
+A, B, C = 4.0, 0.5, 10.0
+
+
+def _train(model: ThermalModel, intervals: int) -> float:
+    """Feed the model readings of the boiler heated on and off, returning the last temperature."""
+    temperature, energy, now = 40.0, 0.0, 0.0
+    model.update(now, temperature, energy)
+    for interval in range(intervals):
+        power = 2000 if interval // 4 % 2 == 0 else 0
+        for _ in range(THERMAL_MIN_SAMPLE_INTERVAL):
+            temperature += (A * power / 1000 - B * temperature + C) / 3600
+            energy += power / 3600
+            now += 1
+        # The sensor and counter resolution of the device
+        model.update(now, round(temperature, 1), round(energy))
+    return temperature
+
+
+def test_untrained_model_gives_no_limit() -> None:
+    """Until enough intervals are fitted, the model does not cap the power."""
+    model = ThermalModel()
+    _train(model, THERMAL_MIN_SAMPLES - 1)
+
+    assert not model.ready
+    assert model.max_power(50, 60, 900) is None
+    assert model.time_to_target(50, 2000, 60) is None
+
+
+def test_short_intervals_are_accumulated() -> None:
+    """Readings closer together than the minimum interval do not count as samples."""
+    model = ThermalModel()
+    model.update(0, 40, 0)
+    model.update(THERMAL_MIN_SAMPLE_INTERVAL / 2, 40.1, 100)
+
+    assert model.samples == 0
+
+    model.update(THERMAL_MIN_SAMPLE_INTERVAL, 40.2, 200)
+    assert model.samples == 1
+
+
+def test_counter_reset_interval_is_skipped() -> None:
+    """An interval over which the energy counter went backwards is not fitted."""
+    model = ThermalModel()
+    model.update(0, 40, 1000)
+    model.update(THERMAL_MIN_SAMPLE_INTERVAL, 40, 10)
+
+    assert model.samples == 0
+
+
+def test_fit_recovers_the_boiler() -> None:
+    """The fitted parameters and predictions match the boiler the readings came from."""
+    model = ThermalModel()
+    _train(model, 48)
+
+    assert model.ready
+    parameters = model.as_dict()
+    assert parameters["heating_rate"] == pytest.approx(A, rel=0.05)
+    assert parameters["loss_rate"] == pytest.approx(B, rel=0.05)
+    assert parameters["ambient"] == pytest.approx(C / B, abs=0.5)
+
+    expected = 30.0
+    for _ in range(900):
+        expected += (A * 3 - B * expected + C) / 3600
+    assert model.predict(30, 3000, 900) == pytest.approx(expected, abs=0.1)
+
+
+def test_max_power_keeps_below_target() -> None:
+    """Heating at the returned power reaches the target at the end of the horizon, not before."""
+    model = ThermalModel()
+    _train(model, 48)
+
+    power = model.max_power(30, 32, 900)
+
+    assert power is not None
+    assert power > 0
+    assert model.predict(30, power, 900) == pytest.approx(32, abs=0.01)
+    assert model.max_power(40, 32, 900) == 0
+
+
+def test_time_to_target() -> None:
+    """The time to target is zero once reached and None if the power can never reach it."""
+    model = ThermalModel()
+    _train(model, 48)
+
+    seconds = model.time_to_target(30, 3000, 35)
+
+    assert seconds is not None
+    assert model.predict(30, 3000, seconds) == pytest.approx(35, abs=0.01)
+    assert model.time_to_target(35, 3000, 35) == 0
+    # Steady state at 1 kW is 28 °C
+    assert model.time_to_target(25, 1000, 35) is None
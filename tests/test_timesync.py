@@ -0,0 +1,147 @@
+"""Tests for the drift-aware clock synchronisation."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+
+import pytest
+
+from custom_components.fronius_ohmpilot import timesync
+from custom_components.fronius_ohmpilot.const import TIME_SYNC_MIN_INTERVAL, TIME_SYNC_STALLED_INTERVAL
+from custom_components.fronius_ohmpilot.timesync import TimeSyncManager
+
+pytestmark = pytest.mark.unit
+
+START = 1_760_000_000.0
+
+
+class FakeClockApi:
+    """API client backed by a simulated device clock, in seconds since the epoch."""
+
+    def __init__(self, *, running: bool = True, offset: float = 0.0) -> None:
+        """Start the local and device clocks."""
+        self.now = START
+        self.running = running
+        self.device_time = START + offset
+        self.device_set_at = START
+        self.written: list[float] = []
+        self.fail_writes = False
+
+    def advance(self, seconds: float) -> None:
+        """Let local time pass."""
+        self.now += seconds
+
+    def device_clock(self) -> int:
+        """Return the device clock register."""
+        elapsed = self.now - self.device_set_at if self.running else 0
+        return int(self.device_time + elapsed)
+
+    async def async_read_time(self) -> tuple[float, float, dict[str, int]]:
+        """Return the device clock, read with a 20 ms round trip."""
+        return self.now - 0.01, self.now + 0.01, {"time": self.device_clock(), "utc_offset": 0}
+
+    async def async_set_time(self, utc_offset: int, latency: float = 0.0) -> bool:
+        """Set the device clock to local time."""
+        if self.fail_writes:
+            return False
+        self.written.append(self.now)
+        self.device_time = self.device_set_at = self.now
+        return True
+
+
+async def test_accurate_clock_is_not_written() -> None:
+    """A clock within the allowed error is left alone and checked less often."""
+    api = FakeClockApi()
+    manager = TimeSyncManager(None, api)
+
+    for _ in range(3):
+        await manager.async_check()
+        api.advance(manager._next_delay())  # noqa: SLF001
+
+    assert api.written == []
+    assert manager.clock_running is True
+    assert manager.interval > TIME_SYNC_MIN_INTERVAL
+
+
+async def test_clock_off_is_written() -> None:
+    """A clock beyond the allowed error is corrected."""
+    api = FakeClockApi(offset=-30)
+    manager = TimeSyncManager(None, api)
+
+    await manager.async_check()
+
+    assert api.written == [START]
+    assert manager.writes == 1
+
+
+async def test_failed_write_is_not_counted() -> None:
+    """A write the device did not accept counts as a failure, not as a write."""
+    api = FakeClockApi(offset=-30)
+    api.fail_writes = True
+    manager = TimeSyncManager(None, api)
+
+    await manager.async_check()
+
+    assert manager.writes == 0
+    assert manager.failures == 1
+
+
+async def test_stalled_clock_falls_back_to_periodic_writes() -> None:
+    """A clock register that does not advance is written on every check at a fixed interval."""
+    api = FakeClockApi(running=False)
+    manager = TimeSyncManager(None, api)
+
+    await manager.async_check()
+    assert manager.clock_running is None
+    api.advance(manager._next_delay())  # noqa: SLF001
+
+    for _ in range(3):
+        await manager.async_check()
+        assert manager._next_delay() == TIME_SYNC_STALLED_INTERVAL  # noqa: SLF001
+        api.advance(TIME_SYNC_STALLED_INTERVAL)
+
+    assert manager.clock_running is False
+    assert len(api.written) == 3
+    assert manager.drift is None
+
+
+async def test_clock_that_runs_again_is_trusted_again() -> None:
+    """Once the register advances again, the clock is only written when it is off."""
+    api = FakeClockApi(running=False)
+    manager = TimeSyncManager(None, api)
+    await manager.async_check()
+    api.advance(TIME_SYNC_STALLED_INTERVAL)
+    await manager.async_check()
+    assert manager.clock_running is False
+
+    api.running = True
+    api.advance(TIME_SYNC_STALLED_INTERVAL)
+    await manager.async_check()
+
+    assert manager.clock_running is True
+    assert len(api.written) == 1
+
+
+async def test_stop_during_check_schedules_nothing(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Stopping while a check waits for the device cancels it without arming another one."""
+    scheduled: list[float] = []
+    monkeypatch.setattr(timesync, "async_call_later", lambda _hass, delay, _action: scheduled.append(delay))
+    reading = asyncio.Event()
+
+    class BlockedApi(FakeClockApi):
+        async def async_read_time(self) -> tuple[float, float, dict[str, int]]:
+            await reading.wait()
+            return await super().async_read_time()
+
+    manager = TimeSyncManager(None, BlockedApi())
+    stop = manager.async_start()
+    check = asyncio.create_task(manager._async_check(None))  # noqa: SLF001
+    await asyncio.sleep(0)
+
+    stop()
+    with contextlib.suppress(asyncio.CancelledError):
+        await check
+
+    assert check.cancelled()
+    assert len(scheduled) == 1
@@ -0,0 +1,117 @@
+"""Tests for the pipelined Modbus TCP client against the simulator."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator
+import time
+
+import pytest
+from simulator import OhmpilotSimulator
+
+from custom_components.fronius_ohmpilot.connection import ConnectionDropped
+from custom_components.fronius_ohmpilot.registers import IDENTITY_BLOCKS, SET_POWER_BLOCK
+from custom_components.fronius_ohmpilot.transport import PipelinedModbusTcpClient
+
+pytestmark = pytest.mark.integration
+
+HOST = "127.0.0.1"
+
+
+@pytest.fixture
+async def client(simulator: OhmpilotSimulator) -> AsyncIterator[PipelinedModbusTcpClient]:
+    """Return a client connected to the simulator, allowing four requests in flight."""
+    client = PipelinedModbusTcpClient(HOST, simulator.modbus_port, timeout=0.5, max_in_flight=4)
+    assert await client.connect()
+    yield client
+    client.close()
+
+
+async def _read_serial(client: PipelinedModbusTcpClient, unit: int) -> str:
+    (block,) = IDENTITY_BLOCKS
+    response = await client.read_holding_registers(block.address, count=block.count, device_id=unit)
+    assert not response.isError()
+    return block.decode(response.registers)["serial_number"]
+
+
+async def test_responses_are_matched_to_their_unit(client: PipelinedModbusTcpClient) -> None:
+    """Concurrent reads from different units each get their own unit's registers."""
+    serials = await asyncio.gather(*(_read_serial(client, unit) for unit in (1, 2, 1, 2)))
+
+    assert serials == ["28136000001", "28136000002", "28136000001", "28136000002"]
+
+
+async def test_requests_to_different_units_overlap(
+    simulator: OhmpilotSimulator, client: PipelinedModbusTcpClient
+) -> None:
+    """Requests to different units are in flight together, those to one unit one after the other."""
+    simulator.faults.latency = 0.1
+
+    start = time.monotonic()
+    await asyncio.gather(_read_serial(client, 1), _read_serial(client, 2))
+    overlapped = time.monotonic() - start
+
+    start = time.monotonic()
+    await asyncio.gather(_read_serial(client, 1), _read_serial(client, 1))
+    serialized = time.monotonic() - start
+
+    assert client.max_in_flight_seen == 2
+    assert overlapped < 0.18
+    assert serialized >= 0.2
+
+
+async def test_write_then_read_back(simulator: OhmpilotSimulator, client: PipelinedModbusTcpClient) -> None:
+    """A write is applied before the next request to the same unit, and FC23 returns the read-back."""
+    registers = SET_POWER_BLOCK.encode({"set_power": 1500})
+
+    written = await client.write_registers(SET_POWER_BLOCK.address, registers, device_id=2)
+    read = await client.read_holding_registers(SET_POWER_BLOCK.address, count=SET_POWER_BLOCK.count, device_id=2)
+    combined = await client.readwrite_registers(
+        read_address=SET_POWER_BLOCK.address,
+        read_count=SET_POWER_BLOCK.count,
+        write_address=SET_POWER_BLOCK.address,
+        values=SET_POWER_BLOCK.encode({"set_power": 2000}),
+        device_id=2,
+    )
+
+    assert not written.isError()
+    assert SET_POWER_BLOCK.decode(read.registers) == {"set_power": 1500}
+    assert SET_POWER_BLOCK.decode(combined.registers) == {"set_power": 2000}
+    assert simulator.units[2].set_power == 2000
+    assert simulator.units[1].set_power == 0
+
+
+async def test_exception_response(client: PipelinedModbusTcpClient) -> None:
+    """A Modbus exception is returned as an error response, not raised."""
+    response = await client.read_holding_registers(40000, count=1, device_id=3)
+
+    assert response.isError()
+    assert response.exception_code == 0x0B
+
+
+async def test_lost_response_times_out_and_keeps_the_socket(
+    simulator: OhmpilotSimulator, client: PipelinedModbusTcpClient
+) -> None:
+    """A response that never arrives raises TimeoutError without closing the connection."""
+    simulator.faults.loss = 1.0
+    with pytest.raises(TimeoutError, match="unit 1"):
+        await _read_serial(client, 1)
+
+    simulator.faults.loss = 0.0
+    assert client.connected
+    assert await _read_serial(client, 1) == "28136000001"
+
+
+async def test_closed_socket_fails_every_waiting_request(
+    simulator: OhmpilotSimulator, client: PipelinedModbusTcpClient
+) -> None:
+    """Requests waiting when the connection closes raise ConnectionDropped."""
+    simulator.faults.latency = 0.2
+    requests = asyncio.gather(_read_serial(client, 1), _read_serial(client, 2), return_exceptions=True)
+    await asyncio.sleep(0.05)
+
+    client.close()
+
+    assert [type(result) for result in await requests] == [ConnectionDropped, ConnectionDropped]
+    with pytest.raises(ConnectionDropped):
+        await _read_serial(client, 1)